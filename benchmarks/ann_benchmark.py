@@ -0,0 +1,124 @@
+"""
+ANN Index Benchmark
+
+Compares recall@k and query latency of ChromaDB's HNSW index with the
+local IVF index (int8 and binary codes) and the brute-force exact index
+on the same embeddings. Ground truth is exact brute-force search.
+
+Usage:
+    # Synthetic clustered unit vectors
+    python -m benchmarks.ann_benchmark --num-vectors 100000 --dim 384
+
+    # Embeddings of an existing collection (queries are perturbed chunks)
+    python -m benchmarks.ann_benchmark --db-path ./chroma_db --collection ml_documents
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import chromadb
+
+from src import ann_index, embeddings, exact_index
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    vectors = centres[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load_collection(client, vectors: np.ndarray):
+    collection = client.create_collection("ann-benchmark")
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(ids=[str(i) for i in range(start, start + len(batch))], embeddings=batch)
+    return collection
+
+
+def run(name: str,
+        search: Callable[[np.ndarray], List[str]],
+        queries: np.ndarray,
+        truth: List[set],
+        k: int
+) -> Dict[str, float]:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected & set(found[:k]))
+
+    latencies = np.array(latencies) * 1000
+    result = {
+        "recall": hits / (k * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95))
+    }
+    print(f"{name:<14} recall@{k}={result['recall']:.3f}  p50={result['p50_ms']:.2f}ms  p95={result['p95_ms']:.2f}ms")
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the local ANN index against ChromaDB")
+    parser.add_argument("--num-vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--db-path", default=None, help="Benchmark an existing persistent database instead")
+    parser.add_argument("--collection", default=None)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if args.db_path:
+        collection = chromadb.PersistentClient(path=args.db_path).get_collection(args.collection)
+        vectors = np.asarray(collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+        ids = collection.get(include=[])["ids"]
+    else:
+        vectors = synthetic_vectors(args.num_vectors, args.dim)
+        collection = load_collection(chromadb.EphemeralClient(), vectors)
+        ids = [str(i) for i in range(len(vectors))]
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries)] + 0.05 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = queries.astype(np.float32)
+
+    space = embeddings.collection_space(collection)
+    truth = [
+        {ids[i] for i in np.argsort(embeddings.distance(vectors, query, space))[:args.k]}
+        for query in queries
+    ]
+
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {args.queries} queries")
+    run("chroma-hnsw", lambda q: collection.query(query_embeddings=[q], n_results=args.k, include=[])["ids"][0],
+        queries, truth, args.k)
+
+    index = exact_index.build(collection)
+    run("exact", lambda q: index.search(q, args.k)[0], queries, truth, args.k)
+    started = time.perf_counter()
+    index.search_batch(queries, args.k)
+    print(f"{'exact-batch':<14} {len(queries)} queries in one matmul: "
+          f"{(time.perf_counter() - started) * 1000 / len(queries):.3f}ms per query")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for quantization in ann_index.QUANTIZATIONS:
+            path = os.path.join(tmp, quantization)
+            started = time.perf_counter()
+            ann_index.build(collection, path, quantization=quantization)
+            index = ann_index.open_current(path)
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in ("codes.npy", "scales.npy"))
+            print(f"{quantization} index built in {time.perf_counter() - started:.1f}s, codes {size / 1e6:.1f}MB "
+                  f"(float32 {vectors.nbytes / 1e6:.1f}MB)")
+            run(f"ivf-{quantization}", lambda q: index.search(q, args.k, nprobe=args.nprobe)[0],
+                queries, truth, args.k)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
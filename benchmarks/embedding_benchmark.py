@@ -0,0 +1,70 @@
+"""
+Embedding Throughput Benchmark
+
+Measures chunks/sec of the ONNX embedding provider across batch sizes
+and intra-op thread counts, using the chunks of a real PDF (or synthetic
+paragraphs) so text lengths are representative.
+
+Usage:
+    python -m benchmarks.embedding_benchmark --pdf test_document.pdf
+    python -m benchmarks.embedding_benchmark --batch-sizes 1 16 64 --threads 1 4 0
+    python -m benchmarks.embedding_benchmark --model-path ./models/bge-small --model-id bge-small
+"""
+
+import argparse
+import time
+from typing import List
+
+from src import config, document_processor
+from src.onnx_embeddings import OnnxEmbeddingFunction, DEFAULT_MODEL_ID
+
+
+def synthetic_chunks(n: int) -> List[str]:
+    words = "total defence civil military economic social digital psychological resilience".split()
+    return [" ".join(words[(i + j) % len(words)] for j in range(40 + i % 60)) for i in range(n)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput")
+    parser.add_argument("--pdf", default=None, help="Embed this PDF's chunks (synthetic text if omitted)")
+    parser.add_argument("--num-chunks", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0])
+    parser.add_argument("--model-id", default=config.EMBEDDING_MODEL or DEFAULT_MODEL_ID)
+    parser.add_argument("--model-path", default=config.EMBEDDING_MODEL_PATH or None)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.pdf:
+        texts = [chunk["text"] for chunk in document_processor.chunk_pdf_by_pages(args.pdf)]
+        texts = (texts * (args.num_chunks // max(len(texts), 1) + 1))[:args.num_chunks]
+    else:
+        texts = synthetic_chunks(args.num_chunks)
+
+    print(f"{len(texts)} chunks, model {args.model_id}")
+    print(f"{'threads':>8} {'batch':>6} {'chunks/sec':>12}")
+
+    for threads in args.threads:
+        for batch_size in args.batch_sizes:
+            function = OnnxEmbeddingFunction(
+                model_id=args.model_id,
+                model_path=args.model_path,
+                batch_size=batch_size,
+                threads=threads,
+                max_tokens=config.EMBEDDING_MAX_TOKENS
+            )
+            function(texts[:batch_size])   # load the model outside the timing
+
+            best = 0.0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                function(texts)
+                best = max(best, len(texts) / (time.perf_counter() - started))
+
+            print(f"{threads or 'auto':>8} {batch_size:>6} {best:>12.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+"""
+API Worker Scaling Benchmark
+
+Starts the API with an increasing number of uvicorn workers and measures
+/search (retrieval only) or /query throughput and latency under
+concurrent load, to show how request handling scales past one core.
+
+Only 200 responses count towards throughput and latency; errors (e.g.
+/query without GEMINI_API_KEY, or 429/503 from admission control) are
+reported as an error rate. Use --distinct to control how often questions
+repeat, i.e. how much the answer cache (CACHE_BACKEND) can help /query.
+
+Usage:
+    python -m benchmarks.worker_benchmark --workers 1 2 4 --requests 400 --concurrency 32
+    CACHE_BACKEND=sqlite python -m benchmarks.worker_benchmark --endpoint query --workers 1 4 --distinct 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+QUESTIONS = [
+    "What is Total Defence?",
+    "What are the pillars of Total Defence?",
+    "How does civil defence protect the population?",
+    "What is digital defence?",
+    "What is psychological defence?",
+]
+
+
+def post(url: str, body: Dict) -> Tuple[float, int]:
+    """
+    Send one request
+
+    Returns:
+        tuple: (latency in seconds, HTTP status)
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    return time.perf_counter() - started, status
+
+
+def wait_ready(base_url: str, timeout: float = 300) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"API at {base_url} did not become ready")
+
+
+def run(workers: int, port: int, args) -> Dict[str, float]:
+    env = {**os.environ, "API_WORKERS": str(workers)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        wait_ready(base_url)
+        size = "page_size" if args.endpoint == "search" else "n_results"
+        bodies: List[Dict] = [
+            {"question": f"{QUESTIONS[i % len(QUESTIONS)]} ({i % args.distinct})", size: 3}
+            for i in range(args.requests)
+        ]
+        url = f"{base_url}/{args.endpoint}"
+
+        # Warm every worker (model load, collection open) outside the timing
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda body: post(url, body), bodies[:workers * 4]))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            responses = list(pool.map(lambda body: post(url, body), bodies))
+        elapsed = time.perf_counter() - started
+
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = np.array([latency for latency, status in responses if status == 200]) * 1000
+    errors = len(responses) - len(latencies)
+    result = {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else float("nan"),
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else float("nan"),
+        "error_rate": errors / len(responses)
+    }
+    print(f"{workers:>8} {result['requests_per_second']:>10.1f} {result['p50_ms']:>10.1f} "
+          f"{result['p95_ms']:>10.1f} {result['error_rate']:>8.1%}")
+    if errors:
+        counts = {}
+        for _, status in responses:
+            if status != 200:
+                counts[status] = counts.get(status, 0) + 1
+        print(f"{'':>8} non-200 responses: {counts}")
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /search or /query throughput by worker count")
+    parser.add_argument("--endpoint", choices=["search", "query"], default="search")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=10**9, help="Distinct questions (repeats hit the answer cache)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    print(f"/{args.endpoint}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"cache {os.getenv('CACHE_BACKEND', 'none')}")
+    print(f"{'workers':>8} {'ok req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+
+    results = {}
+    for i, workers in enumerate(args.workers):
+        results[workers] = run(workers, args.port + i, args)
+
+    baseline = results[args.workers[0]]["requests_per_second"]
+    for workers, result in results.items():
+        if baseline:
+            print(f"{workers} workers: {result['requests_per_second'] / baseline:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+"""
+Admission Control Module
+
+Per-endpoint concurrency limits with a bounded wait queue, and
+per-client token-bucket rate limiting, so that the API sheds load
+quickly under bursts instead of timing out across the board.
+"""
+
+import asyncio
+import logging
+import math
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted
+
+    Attributes:
+        status_code: HTTP status to return (429 rate limited, 503 saturated)
+        reason: Short machine-readable reason
+        retry_after: Suggested seconds before retrying
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+
+class ConcurrencyLimiter:
+    """
+    Limit in-flight requests for one endpoint
+
+    At most `max_concurrency` requests run at once. Up to `max_queue`
+    further requests wait for a slot, each for at most `max_wait` seconds.
+    Anything beyond that is rejected immediately.
+
+    Slots are handed directly from a finishing request to the oldest
+    waiter, so waiters are served in FIFO order.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_concurrency: int,
+                 max_queue: int,
+                 max_wait: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._active = 0
+        self._waiters: deque = deque()
+
+        # Metrics
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.max_queue_depth_seen = 0
+
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.max_wait))
+
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(503, f"{self.name}_queue_full", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.max_queue_depth_seen = max(self.max_queue_depth_seen, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.rejected_timeout += 1
+            raise AdmissionRejected(503, f"{self.name}_wait_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            # Slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+        self.admitted += 1
+
+
+    def release(self) -> None:
+        """
+        Release a slot, handing it to the oldest live waiter if any
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self._active -= 1
+
+
+    def _discard(self, waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth_seen": self.max_queue_depth_seen,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout
+        }
+
+
+
+class TokenBucketRateLimiter:
+    """
+    In-memory per-client token bucket
+
+    Each client gets a bucket of `burst` tokens refilled at `rate` tokens
+    per second. Buckets are kept in an LRU capped at `max_clients` so
+    memory stays bounded under many distinct clients.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+
+    def check(self, client_id: str, now: Optional[float] = None) -> None:
+        """
+        Consume one token for client_id
+
+        Raises:
+            AdmissionRejected: With 429 if the client has no tokens left
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets[client_id] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client_id)
+
+            tokens, last = bucket
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+
+            if tokens < 1.0:
+                bucket[0], bucket[1] = tokens, now
+                self.rejected += 1
+                retry_after = max(1, math.ceil((1.0 - tokens) / self.rate))
+                raise AdmissionRejected(429, "rate_limited", retry_after)
+
+            bucket[0], bucket[1] = tokens - 1.0, now
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+            "rejected": self.rejected
+        }
@@ -0,0 +1,614 @@
+"""
+ANN Index Module
+
+Optional local retrieval backend for large collections. Embeddings are
+copied out of ChromaDB into memory-mapped NumPy arrays. Layout of a
+collection's index directory:
+
+    CURRENT            name of the live version directory
+    build.lock         serialises builds across processes
+    v<time>-<pid>/     one index:
+
+    vectors.npy        float32 originals, only touched for re-scoring
+    codes.npy          int8 codes (per-row scale) or packed sign bits
+    scales.npy         float32 dequantisation scale per row
+    centroids.npy      IVF coarse centroids
+    list_offsets.npy   rows are ordered by IVF list; list i is
+                       rows list_offsets[i]:list_offsets[i + 1]
+    ids.bin / id_offsets.npy   chunk id per row
+    manifest.json      size, dimension, quantisation, space, build time
+                       and write generation
+
+A search scans the nprobe closest IVF lists with the quantised codes and
+re-scores the best candidates exactly against the float vectors, so
+distances match what ChromaDB would return.
+
+A build writes a new version directory and then replaces CURRENT with a
+rename, so other processes load either the old or the new index, never a
+half-written one; the previous version is kept for readers still using it.
+
+The index is a snapshot at one write generation (cache.generation).
+Writes in this process mark it stale and a rebuild is started in the
+background; until it finishes queries go to ChromaDB. An index behind
+the collection's generation (a write by any process sharing the cache
+backend) is stale as well. Every config.ANN_INDEX_RECHECK_SECONDS each
+process also reloads a version another process built and compares its
+size with the collection, which catches writes the generation misses
+(CACHE_BACKEND=none). Queries with a where filter always go to ChromaDB.
+
+Usage:
+    python -m src.ann_index build --collection ml_documents
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src import cache
+from src import config
+from src import embeddings
+
+if TYPE_CHECKING:
+    import chromadb
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("int8", "binary")
+
+# Version directories kept per collection (the live one and its predecessor)
+KEEP_VERSIONS = 2
+
+
+
+def quantize(vectors: "np.ndarray", quantization: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Quantise float32 rows
+
+    Args:
+        vectors: float32 array (n, dim)
+        quantization: 'int8' (symmetric, one scale per row) or 'binary'
+            (sign bits packed 8 per byte)
+
+    Returns:
+        tuple: (codes, scales); scales are all 1 for binary codes
+    """
+    import numpy as np
+
+    if quantization == "binary":
+        return np.packbits(vectors > 0, axis=1), np.ones(len(vectors), dtype=np.float32)
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def kmeans(vectors: "np.ndarray", num_clusters: int, iterations: int = 10, seed: int = 0) -> "np.ndarray":
+    """
+    Plain Lloyd's k-means for the IVF coarse quantiser
+
+    Args:
+        vectors: float32 training sample (n, dim)
+        num_clusters: Number of centroids
+        iterations: Lloyd iterations
+        seed: Random seed for the initial centroids
+
+    Returns:
+        np.ndarray: float32 centroids (num_clusters, dim)
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        for cluster in range(num_clusters):
+            members = vectors[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+            else:
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+    return centroids
+
+
+def assign(vectors: "np.ndarray", centroids: "np.ndarray", batch_size: int = 65536) -> "np.ndarray":
+    """
+    Nearest centroid (squared L2) for each row
+    """
+    import numpy as np
+
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+        out[start:start + batch_size] = np.argmin(centroid_norms - 2.0 * batch @ centroids.T, axis=1)
+    return out
+
+
+
+class IVFIndex:
+    """
+    Memory-mapped IVF index over quantised embeddings
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.vectors = load("vectors.npy")
+        self.codes = load("codes.npy")
+        self.scales = load("scales.npy")
+        self.centroids = np.asarray(load("centroids.npy"))
+        self.list_offsets = np.asarray(load("list_offsets.npy"))
+        self._id_offsets = load("id_offsets.npy")
+        with open(os.path.join(path, "ids.bin"), "rb") as f:
+            self._ids = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.quantization = self.manifest["quantization"]
+        self.space = self.manifest["space"]
+
+
+    def __len__(self) -> int:
+        return int(self.manifest["num_vectors"])
+
+
+    @property
+    def generation(self) -> Optional[int]:
+        """
+        Collection write generation the index was built at
+        """
+        return self.manifest.get("generation")
+
+
+    def chunk_id(self, row: int) -> str:
+        return self._ids[self._id_offsets[row]:self._id_offsets[row + 1]].decode("utf-8")
+
+
+    def search(self,
+               query: "np.ndarray",
+               k: int,
+               nprobe: Optional[int] = None,
+               rescore: Optional[int] = None
+    ) -> Tuple[List[str], List[float], "np.ndarray"]:
+        """
+        Approximate nearest neighbours of a query embedding
+
+        Args:
+            query: float32 query embedding (dim,)
+            k: Number of results
+            nprobe: IVF lists scanned (config.ANN_NPROBE if None)
+            rescore: Shortlist size re-scored exactly
+                (k * config.ANN_RESCORE_MULTIPLIER if None)
+
+        Returns:
+            tuple: (chunk ids, distances, float32 embeddings), closest first
+        """
+        import numpy as np
+
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or config.ANN_NPROBE, len(self.centroids))
+        rescore = rescore or k * config.ANN_RESCORE_MULTIPLIER
+
+        # Closest lists to the query
+        centroid_dist = np.einsum("ij,ij->i", self.centroids, self.centroids) - 2.0 * self.centroids @ query
+        lists = np.argpartition(centroid_dist, nprobe - 1)[:nprobe]
+        rows = np.concatenate([
+            np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists
+        ])
+        if len(rows) == 0:
+            return [], [], np.empty((0, len(query)), dtype=np.float32)
+
+        # Approximate scores from the codes (higher is closer)
+        codes = self.codes[rows]
+        if self.quantization == "binary":
+            query_bits = np.packbits(query > 0)
+            approx = -np.unpackbits(codes ^ query_bits, axis=1).sum(axis=1, dtype=np.int32)
+        else:
+            codes = codes.astype(np.float32)
+            scales = self.scales[rows]
+            approx = (codes @ query) * scales
+            if self.space != "ip":
+                sq_norms = np.einsum("ij,ij->i", codes, codes) * scales ** 2
+                if self.space == "cosine":
+                    approx /= np.sqrt(np.maximum(sq_norms, 1e-12))
+                else:
+                    approx -= 0.5 * sq_norms
+
+        if len(rows) > rescore:
+            rows = rows[np.argpartition(-approx, rescore - 1)[:rescore]]
+        rows = np.sort(rows)
+
+        # Exact re-scoring against the float vectors
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        distances = embeddings.distance(vectors, query, self.space)
+        order = np.argsort(distances)[:k]
+
+        return (
+            [self.chunk_id(int(rows[i])) for i in order],
+            [float(distances[i]) for i in order],
+            vectors[order]
+        )
+
+
+
+def build(collection: "chromadb.Collection",
+          path: str,
+          quantization: Optional[str] = None,
+          num_lists: Optional[int] = None,
+          batch_size: int = 1000
+) -> int:
+    """
+    Build an IVF index from a collection's stored embeddings
+
+    The index goes into a new version directory under path, which then
+    becomes CURRENT with an atomic rename. Builds of one index run one
+    at a time, across processes.
+
+    Args:
+        collection: ChromaDB collection
+        path: Index directory of the collection
+        quantization: 'int8' or 'binary' (config.ANN_QUANTIZATION if None)
+        num_lists: IVF lists (about sqrt(n) if None)
+        batch_size: Embeddings read from ChromaDB per call
+
+    Returns:
+        int: Number of vectors indexed
+
+    Raises:
+        ValueError: If the quantisation is unknown or the collection is empty
+    """
+    import numpy as np
+
+    quantization = quantization or config.ANN_QUANTIZATION
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "build.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _build_version(collection, path, quantization, num_lists, batch_size)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _build_version(collection: "chromadb.Collection",
+                   path: str,
+                   quantization: str,
+                   num_lists: Optional[int],
+                   batch_size: int
+) -> int:
+    import numpy as np
+
+    # Read before the embeddings: a write during the build leaves the
+    # new version behind the collection's generation, so it is rebuilt again
+    generation = cache.generation(collection.name)
+
+    total = collection.count()
+    if total == 0:
+        raise ValueError(f"Collection {collection.name} is empty")
+
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    tmp_path = os.path.join(path, version)
+    os.makedirs(tmp_path)
+
+    # Copy embeddings to a scratch memmap in collection order
+    ids: List[str] = []
+    scratch = None
+    offset = 0
+    while offset < total:
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings"])
+        if not batch["ids"]:
+            break
+        vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+        if scratch is None:
+            scratch = np.lib.format.open_memmap(
+                os.path.join(tmp_path, "scratch.npy"), mode="w+", dtype=np.float32, shape=(total, vectors.shape[1])
+            )
+        scratch[offset:offset + len(vectors)] = vectors
+        ids.extend(batch["ids"])
+        offset += len(vectors)
+
+    total = len(ids)
+    scratch = scratch[:total]
+    dim = scratch.shape[1]
+
+    # Train the coarse quantiser on a sample and bucket every row
+    num_lists = min(num_lists or max(1, int(np.sqrt(total))), total)
+    rng = np.random.default_rng(0)
+    sample = np.asarray(scratch[np.sort(rng.choice(total, min(total, 256 * num_lists), replace=False))])
+    centroids = kmeans(sample, num_lists)
+    assignment = assign(scratch, centroids)
+    order = np.argsort(assignment, kind="stable")
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=num_lists))])
+
+    # Write rows in list order
+    code_dim = (dim + 7) // 8 if quantization == "binary" else dim
+    code_dtype = np.uint8 if quantization == "binary" else np.int8
+    vectors_out = np.lib.format.open_memmap(
+        os.path.join(tmp_path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(total, dim))
+    codes_out = np.lib.format.open_memmap(
+        os.path.join(tmp_path, "codes.npy"), mode="w+", dtype=code_dtype, shape=(total, code_dim))
+    scales_out = np.empty(total, dtype=np.float32)
+
+    id_offsets = [0]
+    with open(os.path.join(tmp_path, "ids.bin"), "wb") as ids_file:
+        for start in range(0, total, 65536):
+            rows = order[start:start + 65536]
+            vectors = np.asarray(scratch[rows], dtype=np.float32)
+            codes, scales = quantize(vectors, quantization)
+            vectors_out[start:start + len(rows)] = vectors
+            codes_out[start:start + len(rows)] = codes
+            scales_out[start:start + len(rows)] = scales
+            for row in rows:
+                encoded = ids[row].encode("utf-8")
+                ids_file.write(encoded)
+                id_offsets.append(id_offsets[-1] + len(encoded))
+
+    vectors_out.flush()
+    codes_out.flush()
+    del vectors_out, codes_out, scratch
+    os.remove(os.path.join(tmp_path, "scratch.npy"))
+
+    np.save(os.path.join(tmp_path, "scales.npy"), scales_out)
+    np.save(os.path.join(tmp_path, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(tmp_path, "list_offsets.npy"), list_offsets.astype(np.int64))
+    np.save(os.path.join(tmp_path, "id_offsets.npy"), np.array(id_offsets, dtype=np.int64))
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump({
+            "collection": collection.name,
+            "num_vectors": total,
+            "dim": dim,
+            "num_lists": num_lists,
+            "quantization": quantization,
+            "space": embeddings.collection_space(collection),
+            "built_at": time.time(),
+            "generation": generation
+        }, f)
+
+    pointer = os.path.join(path, f"CURRENT.tmp-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, "CURRENT"))
+
+    versions = sorted(name for name in os.listdir(path) if name.startswith("v"))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+    logger.info(f"Built {quantization} IVF index for {collection.name}: {total} vectors, {num_lists} lists")
+    return total
+
+
+
+def current_version(path: str) -> Optional[str]:
+    """
+    Name of the live version directory of an index, or None if none was built
+    """
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def open_current(path: str) -> Optional[IVFIndex]:
+    """
+    Open the live version of an index directory
+
+    Returns:
+        IVFIndex, or None if nothing has been built (or the version was
+        removed while being opened)
+    """
+    version = current_version(path)
+    if version is None:
+        return None
+    try:
+        return IVFIndex(os.path.join(path, version))
+    except FileNotFoundError:
+        return None
+
+
+
+_indexes: Dict[str, IVFIndex] = {}
+_stale: Dict[str, bool] = {}
+_rebuilding: Dict[str, threading.Thread] = {}
+_checked: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def index_path(collection_name: str) -> str:
+    return os.path.join(config.ANN_INDEX_DIR, collection_name)
+
+
+def is_enabled(collection_name: str) -> bool:
+    """
+    Whether a collection is configured to use the local index
+    """
+    names = config.ANN_INDEX_COLLECTIONS
+    return "*" in names or collection_name in names
+
+
+def get_index(collection: "chromadb.Collection") -> Optional[IVFIndex]:
+    """
+    Local index for a collection, if enabled, built and up to date
+
+    An index that is missing, built at an older write generation, whose
+    size no longer matches the collection, or that was marked stale,
+    triggers a background rebuild and None is returned so the caller
+    falls back to ChromaDB. The disk and the collection size are rechecked
+    at most every config.ANN_INDEX_RECHECK_SECONDS, and straight away
+    when the generation moved (see refresh).
+
+    Args:
+        collection: ChromaDB collection
+
+    Returns:
+        IVFIndex, or None
+    """
+    name = collection.name
+    if not is_enabled(name):
+        return None
+
+    generation = cache.generation(name)
+    with _lock:
+        index = _indexes.get(name)
+        stale = _stale.get(name, False)
+        checked = _checked.get(name)
+
+    due = (checked is None or time.monotonic() - checked >= config.ANN_INDEX_RECHECK_SECONDS
+           or (index is not None and index.generation != generation))
+    if not stale and (index is None or due):
+        index, stale = refresh(collection, index, generation)
+
+    if stale:
+        rebuild_in_background(collection)
+        return None
+    return index
+
+
+def refresh(collection: "chromadb.Collection",
+            index: Optional[IVFIndex],
+            generation: int
+) -> Tuple[Optional[IVFIndex], bool]:
+    """
+    Pick up changes made by other processes
+
+    Loads the CURRENT version from disk if it is not the one this process
+    has loaded, and checks it against the collection's write generation
+    and size.
+
+    Args:
+        collection: ChromaDB collection
+        index: Index loaded in this process, or None
+        generation: Collection's current write generation
+
+    Returns:
+        tuple: (index or None, whether it is stale)
+    """
+    name = collection.name
+    path = index_path(name)
+    version = current_version(path)
+
+    if version is not None and (index is None or os.path.basename(index.path) != version):
+        try:
+            index = IVFIndex(os.path.join(path, version))
+            logger.info(f"Loaded index {version} for {name}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load index for {name}: {e}")
+
+    count = collection.count()
+    if index is None:
+        stale = count > 0
+    else:
+        stale = len(index) != count or index.generation != generation
+
+    with _lock:
+        if index is not None:
+            _indexes[name] = index
+        # A write marked during the check wins
+        stale = _stale.get(name, False) or stale
+        _stale[name] = stale
+        _checked[name] = time.monotonic()
+    return index, stale
+
+
+def rebuild(collection: "chromadb.Collection") -> IVFIndex:
+    """
+    Rebuild a collection's index and swap it in for this process
+    """
+    name = collection.name
+    with _lock:
+        _stale[name] = False
+
+    path = index_path(name)
+    build(collection, path)
+    index = open_current(path)
+
+    with _lock:
+        _indexes[name] = index
+    return index
+
+
+def rebuild_in_background(collection: "chromadb.Collection") -> None:
+    """
+    Start a rebuild unless one is already running for the collection
+    """
+    name = collection.name
+    with _lock:
+        running = _rebuilding.get(name)
+        if running is not None and running.is_alive():
+            return
+
+        def run():
+            try:
+                rebuild(collection)
+            except Exception as e:
+                logger.error(f"Index rebuild failed for {name}: {e}")
+
+        thread = threading.Thread(target=run, name=f"ann-rebuild-{name}", daemon=True)
+        _rebuilding[name] = thread
+        thread.start()
+
+
+def mark_stale(collection_name: str) -> None:
+    """
+    Record that a collection changed since its index was built
+
+    Called by the write paths in document_processor. Other processes
+    notice through the write generation, or the periodic size check in
+    get_index (refresh); rebuilds elsewhere are picked up from CURRENT.
+    """
+    if is_enabled(collection_name):
+        with _lock:
+            _stale[collection_name] = True
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Build local ANN indexes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Index a collection's embeddings")
+    build_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    build_parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    build_parser.add_argument("--index-dir", default=config.ANN_INDEX_DIR)
+    build_parser.add_argument("--quantization", choices=QUANTIZATIONS, default=config.ANN_QUANTIZATION)
+    build_parser.add_argument("--num-lists", type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    if args.command == "build":
+        import chromadb
+        client = chromadb.PersistentClient(path=args.db_path)
+        collection = client.get_collection(name=args.collection)
+        path = os.path.join(args.index_dir, args.collection)
+        num_vectors = build(collection, path, args.quantization, args.num_lists)
+        print(f"{args.collection}: {num_vectors} vectors indexed at {path}")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,45 +5,290 @@ A FastAPI application providing document Q&A capabilities using
 Retrieval-Augmented Generation (RAG) with vector search and LLMs.
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Request, Header
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional
-import chromadb
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import multiprocessing
+import hashlib
+import base64
+import json
+import asyncio
 import logging
 import tempfile
+import shutil
 import os
 
+from src import config
 from src import rag_engine
 from src import document_processor
+from src import admission
+from src import cache
+from src import uploads
+from src import ingest
+from src import loaders
+from src import chunk_store
+from src import embeddings
+from src import exact_index
+from src import snapshot
+from src.registry import CollectionRegistry, CollectionEntry, CollectionNotFound
+from src.embeddings import EmbeddingModelMismatch
+from src.config import (
+    COLLECTION_NAME,
+    CHROMA_DB_PATH,
+    MAX_OPEN_COLLECTIONS,
+    CHROMA_MEMORY_LIMIT_BYTES,
+    ALLOW_CREATE_COLLECTIONS,
+    WARMUP_ON_STARTUP,
+    READ_ONLY,
+    QUERY_MAX_CONCURRENCY,
+    QUERY_MAX_QUEUE,
+    QUERY_MAX_WAIT_SECONDS,
+    UPLOAD_MAX_CONCURRENCY,
+    UPLOAD_MAX_QUEUE,
+    UPLOAD_MAX_WAIT_SECONDS,
+    RATE_LIMIT_PER_SECOND,
+    RATE_LIMIT_BURST,
+    INGEST_WORKERS,
+    MAX_UPLOAD_BYTES,
+    MAX_BATCH_UPLOAD_BYTES,
+)
 
 # Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+config.setup_logging()
 logger = logging.getLogger(__name__)
 
-# ChromaDB configuration
-CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "ml_documents")
+
+def create_chroma_client():
+    """
+    Create the persistent ChromaDB client
+
+    With CHROMA_MEMORY_LIMIT_BYTES set, ChromaDB unloads the least
+    recently used collection segments once the limit is reached.
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    if CHROMA_MEMORY_LIMIT_BYTES > 0:
+        settings = Settings(
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=CHROMA_MEMORY_LIMIT_BYTES
+        )
+        return chromadb.PersistentClient(path=CHROMA_DB_PATH, settings=settings)
+    return chromadb.PersistentClient(path=CHROMA_DB_PATH)
+
+
+# Read-only replicas serve a private copy of the published snapshot
+replica: Optional[snapshot.SnapshotReplica] = None
+if READ_ONLY:
+    replica = snapshot.SnapshotReplica(
+        snapshot_dir=config.SNAPSHOT_DIR,
+        local_dir=config.SNAPSHOT_LOCAL_DIR or None,
+        poll_seconds=config.SNAPSHOT_POLL_SECONDS
+    )
 
 # Initialise ChromaDB
-try:
-    chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-
-    try :
-        collection = chroma_client.get_collection(name=COLLECTION_NAME)
-        logger.info(f"Connected to ChromaDB collection: {COLLECTION_NAME}")
-        logger.info(f"Collection has {collection.count()} chunks")
-    except Exception:
-        # Create collection if it doesn't exist
-        collection = chroma_client.create_collection(name=COLLECTION_NAME)
-        logger.info(f"Created new ChromaDB collection: {COLLECTION_NAME}")
-        logger.info(f"Collection is empty - upload documents via /upload endpoint")
-        
-except Exception as e:
-    logger.error(f"Failed to connect to ChromaDB: {e}")
-    collection = None
+registry = CollectionRegistry(
+    client_factory=replica.client if replica else create_chroma_client,
+    default_name=COLLECTION_NAME,
+    max_open=MAX_OPEN_COLLECTIONS,
+    allow_create=ALLOW_CREATE_COLLECTIONS and not READ_ONLY
+)
+
+# Startup state, filled in by warmup()
+startup = {
+    "status": "starting",
+    "error": None,
+    "timings": {}
+}
+
+
+def warmup() -> None:
+    """
+    Open ChromaDB and load the embedding model before traffic arrives
+
+    Each phase is timed into startup["timings"] (seconds). Nothing here is
+    required for serving - the registry opens everything lazily - so a
+    failure is recorded and requests still fall back to lazy init.
+    """
+    timings = startup["timings"]
+    started = time.perf_counter()
+
+    try:
+        phase = time.perf_counter()
+        registry.client
+        timings["chroma_client"] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        entry = registry.get(create=True)
+        timings["open_collection"] = time.perf_counter() - phase
+
+        # A dummy query loads the ONNX embedding model and the vector index
+        phase = time.perf_counter()
+        entry.collection.query(query_texts=["warmup"], n_results=1)
+        timings["embedding_and_index"] = time.perf_counter() - phase
+
+        if config.CHUNK_STORE_ENABLED and not READ_ONLY:
+            phase = time.perf_counter()
+            if chunk_store.get_store(entry.collection, rebuild_stale=False) is None:
+                chunk_store.rebuild(entry.collection)
+            timings["chunk_store"] = time.perf_counter() - phase
+
+        startup["status"] = "ready"
+
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}")
+        startup["status"] = "failed"
+        startup["error"] = str(e)
+
+    timings["warmup_total"] = time.perf_counter() - started
+    logger.info(f"Warmup {startup['status']}: " + ", ".join(f"{k}={v:.3f}s" for k, v in timings.items()))
+
+
+def resolve_collection(name: Optional[str], create: bool) -> CollectionEntry:
+    """
+    Look up the collection a request targets
+
+    Args:
+        name: Collection name from the request (default collection if None)
+        create: Create the collection if it does not exist
+
+    Returns:
+        CollectionEntry for the collection
+
+    Raises:
+        HTTPException: 400 for invalid names, 404 for unknown collections,
+            409 if it was built with another embedding model, 503 if a
+            replica has no snapshot yet, 500 if the database is unavailable
+    """
+    try:
+        # The default collection is always available, created on first use
+        return registry.get(name, create=create or not name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CollectionNotFound:
+        raise HTTPException(status_code=404, detail=f"Collection not found: {name}")
+    except EmbeddingModelMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except snapshot.SnapshotNotFound as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to open collection {name}: {e}")
+        raise HTTPException(status_code=500, detail="Database not initialised")
+
+
+def get_collection(
+        x_collection: Optional[str] = Header(None, description="Target collection (defaults to COLLECTION_NAME)")
+) -> CollectionEntry:
+    """
+    Dependency: collection selected by the X-Collection header
+    """
+    return resolve_collection(x_collection, create=False)
+
+
+def get_writable_collection(
+        x_collection: Optional[str] = Header(None, description="Target collection (created if missing)")
+) -> CollectionEntry:
+    """
+    Dependency: collection selected by the X-Collection header, created on first write
+    """
+    return resolve_collection(x_collection, create=True)
+
+
+def require_writable() -> None:
+    """
+    Dependency: refuse writes on a read-only replica or a multi-worker instance
+
+    Workers of one instance share a PersistentClient directory but not its
+    in-process write state (locks, indexes, stores), so only a single-worker
+    instance accepts writes.
+
+    Raises:
+        HTTPException: 403 in READ_ONLY mode or with API_WORKERS > 1
+    """
+    if READ_ONLY:
+        raise HTTPException(
+            status_code=403,
+            detail="This instance serves a read-only snapshot; send writes to the ingestion node"
+        )
+    if config.API_WORKERS > 1:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Writes are disabled with API_WORKERS={config.API_WORKERS}; "
+                   "send them to a single-worker instance"
+        )
+
+
+# Process pool for CPU-bound PDF extraction, created on first upload
+_ingest_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_ingest_pool() -> ProcessPoolExecutor:
+    """
+    Get the shared ingestion process pool, creating it if needed
+
+    Workers are spawned rather than forked so they do not inherit
+    the ChromaDB client or ONNX runtime threads of the API process.
+    
+    Returns:
+        ProcessPoolExecutor: Pool running document_processor functions
+    """
+    global _ingest_pool
+    if _ingest_pool is None:
+        _ingest_pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Started ingestion pool with {INGEST_WORKERS} workers")
+    return _ingest_pool
+
+
+def _reset_after_fork() -> None:
+    # A worker forked from a process that already started the pool
+    # (e.g. gunicorn --preload) must start its own
+    global _ingest_pool
+    _ingest_pool = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: warm up in the background on startup (and on a
+    read-only replica, poll for newer snapshots), release the ingestion
+    pool on shutdown
+
+    Warmup runs in a worker thread so /health answers immediately while
+    /ready reports 503 until the model and collection are loaded.
+    """
+    startup["timings"]["import"] = _IMPORT_FINISHED - _IMPORT_STARTED
+
+    if WARMUP_ON_STARTUP:
+        app.state.warmup_task = asyncio.create_task(run_in_threadpool(warmup))
+    else:
+        startup["status"] = "ready"
+
+    if replica is not None:
+        replica.start(registry)
+
+    yield
+
+    if replica is not None:
+        replica.stop()
+
+    global _ingest_pool
+    if _ingest_pool is not None:
+        _ingest_pool.shutdown(wait=False, cancel_futures=True)
+        _ingest_pool = None
+        logger.info("Stopped ingestion pool")
 
 
 # Initialise FastAPI
@@ -52,10 +297,76 @@ app = FastAPI(
     description= "API for document Q&A using Retrieval-Augmented Generation",
     version= "1.0.0",
     docs_url='/docs',
-    redoc_url='/redoc'
+    redoc_url='/redoc',
+    lifespan=lifespan
+)
+
+
+def upload_body_limit(path: str) -> Optional[int]:
+    """
+    Largest request body accepted on a path (None for no limit)
+    """
+    if path == "/upload/batch":
+        return MAX_BATCH_UPLOAD_BYTES
+    if path == "/upload" or path.startswith("/documents/"):
+        return MAX_UPLOAD_BYTES + uploads.MULTIPART_OVERHEAD_BYTES
+    return None
+
+
+app.add_middleware(uploads.BodySizeLimit, limit_for=upload_body_limit)
+
+
+# Initialise admission control
+query_limiter = admission.ConcurrencyLimiter(
+    name="query",
+    max_concurrency=QUERY_MAX_CONCURRENCY,
+    max_queue=QUERY_MAX_QUEUE,
+    max_wait=QUERY_MAX_WAIT_SECONDS
+)
+upload_limiter = admission.ConcurrencyLimiter(
+    name="upload",
+    max_concurrency=UPLOAD_MAX_CONCURRENCY,
+    max_queue=UPLOAD_MAX_QUEUE,
+    max_wait=UPLOAD_MAX_WAIT_SECONDS
+)
+rate_limiter = admission.TokenBucketRateLimiter(
+    rate=RATE_LIMIT_PER_SECOND,
+    burst=RATE_LIMIT_BURST
 )
 
 
+def admit(limiter: admission.ConcurrencyLimiter):
+    """
+    Build a dependency that applies rate limiting and a concurrency slot
+    
+    Args:
+        limiter: Concurrency limiter for the endpoint
+        
+    Returns:
+        Async generator dependency holding the slot for the request lifetime
+    """
+    async def dependency(request: Request):
+        client_id = request.client.host if request.client else "unknown"
+
+        try:
+            rate_limiter.check(client_id)
+            await limiter.acquire()
+        except admission.AdmissionRejected as e:
+            logger.warning(f"Rejected {request.url.path} from {client_id}: {e.reason}")
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"Server busy ({e.reason}), retry later",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return dependency
+
+
 
 class InfoResponse(BaseModel):
     """
@@ -105,14 +416,146 @@ def health_check():
     }
 
 
+@app.get(
+        "/ready",
+        summary="Readiness endpoint",
+        description="Returns 200 once warmup has loaded the collection and embedding model, 503 before"
+)
+def readiness_check():
+    """
+    Readiness check, separate from the /health liveness check
+
+    Returns:
+        dict: Startup status and per-phase timings (503 until ready)
+    """
+    body = {
+        "status": startup["status"],
+        "error": startup["error"],
+        "startup_seconds": startup["timings"]
+    }
+    if startup["status"] != "ready":
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get(
+        "/metrics",
+        summary="Metrics endpoint",
+        description="Returns admission control queue depths, rejection counts, query embedding batching and cache hits"
+)
+def metrics():
+    """
+    Runtime metrics
+
+    Returns:
+        dict: Per-endpoint limiter and rate limiter counters, collection
+            usage, query embedding and exact search batch sizes and queueing
+            latency, and cache hit/miss counts of this worker
+    """
+    return {
+        "admission": {
+            "query": query_limiter.snapshot(),
+            "upload": upload_limiter.snapshot(),
+            "rate_limit": rate_limiter.snapshot()
+        },
+        "query_embedding": embeddings.batcher_metrics(),
+        "exact_search": exact_index.batcher_metrics(),
+        "cache": cache.metrics(),
+        "collections": registry.snapshot(),
+        "snapshot": replica.snapshot() if replica else None,
+        "startup": startup
+    }
+
+
+@app.get(
+        "/collections",
+        summary="List collections",
+        description="Returns the names of all collections and which are currently open"
+)
+def list_collections():
+    """
+    List collections
+
+    Returns:
+        dict: All collection names, open handles and the default collection
+    """
+    try:
+        names = registry.list_collections()
+    except Exception as e:
+        logger.error(f"Failed to list collections: {e}")
+        raise HTTPException(status_code=500, detail="Database not initialised")
+
+    return {
+        "collections": names,
+        "open": registry.snapshot()["open_handles"],
+        "default": registry.default_name
+    }
+
+
+@app.get(
+        "/collections/{name}/stats",
+        summary="Collection stats",
+        description="Returns chunk count and usage counters for one collection"
+)
+def collection_stats(name: str):
+    """
+    Per-collection statistics
+
+    Args:
+        name: Collection name
+
+    Returns:
+        dict: Chunk count, query/upload/delete counters and last use time
+    """
+    entry = resolve_collection(name, create=False)
+    return registry.stats(entry.name)
+
 
 # Request/Response models
+class PageRange(BaseModel):
+    """
+    Inclusive page range filter
+    """
+    start : int
+    end : int
+
+
 class QueryRequest(BaseModel):
     """
     Request model for /query endpoint
+
+    sources, page_range and metadata restrict the search to matching
+    chunks before ranking (metadata values are matched exactly, e.g.
+    {"doc_hash": "...", "section": "Civil Defence"}). mmr_lambda trades
+    relevance (1.0) against diversity (0.0) of the chunks returned.
     """
     question : str
     n_results: Optional[int] = 3
+    sources : Optional[list[str]] = None
+    page_range : Optional[PageRange] = None
+    metadata : Optional[dict[str, str | int | float | bool]] = None
+    mmr_lambda : Optional[float] = None
+
+
+class CitationSpan(BaseModel):
+    """
+    One cited chunk: its page and character span within the page text
+    """
+    chunk_id : Optional[str] = None
+    page : Optional[int] = None
+    char_start : Optional[int] = None
+    char_end : Optional[int] = None
+    relevance : Optional[float] = None
+
+
+class Citation(BaseModel):
+    """
+    The chunks cited from one document, most relevant first
+    """
+    source : str
+    relevance : Optional[float] = None
+    pages : list[int]
+    spans : list[CitationSpan]
 
 
 class QueryResponse(BaseModel):
@@ -122,6 +565,7 @@ class QueryResponse(BaseModel):
     question: str
     answer: str
     sources : list[str]
+    citations : list[Citation] = []
     num_chunks_used : int
 
 class UploadResponse(BaseModel):
@@ -131,19 +575,140 @@ class UploadResponse(BaseModel):
     filename : str
     num_chunks : int
     status : str
+    doc_hash : Optional[str] = None
+    format : Optional[str] = None
+
+class DeleteResponse(BaseModel):
+    """
+    Response model for DELETE /documents/{document_id}
+    """
+    document_id : str
+    num_chunks_deleted : int
+    status : str
+
+class FileResult(BaseModel):
+    """
+    Per-file result within a batch upload
+    """
+    filename : str
+    num_chunks : int
+    status : str
+    doc_hash : Optional[str] = None
+    error : Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    """
+    Response model for /upload/batch endpoint
+    """
+    num_files : int
+    num_chunks : int
+    results : list[FileResult]
+
+class SearchRequest(BaseModel):
+    """
+    Request model for /search endpoint
+
+    Filters work as in QueryRequest. Pass the next_cursor of a response
+    as cursor to get the following page. A cursor stops being valid (400)
+    once the collection has been written to or the replica has moved to
+    another snapshot, since its offset would skip or repeat results.
+    """
+    question : str
+    page_size : int = 10
+    cursor : Optional[str] = None
+    sources : Optional[list[str]] = None
+    page_range : Optional[PageRange] = None
+    metadata : Optional[dict[str, str | int | float | bool]] = None
+
+
+class SearchResult(BaseModel):
+    """
+    One ranked chunk
+    """
+    id : str
+    text : str
+    source : str
+    page : Optional[int] = None
+    distance : float
+    metadata : dict
+
+
+class SearchResponse(BaseModel):
+    """
+    Response model for /search endpoint
+    """
+    question : str
+    results : list[SearchResult]
+    sources : list[str]
+    citations : list[Citation] = []
+    next_cursor : Optional[str] = None
+
+
+def build_request_filter(request) -> Optional[dict]:
+    """
+    Validate the filters of a query or search request
+
+    Args:
+        request: QueryRequest or SearchRequest
+
+    Returns:
+        dict: ChromaDB where clause, or None without filters
+
+    Raises:
+        HTTPException: 400 for an invalid page range or metadata key
+    """
+    page_range = None
+    if request.page_range:
+        page_range = (request.page_range.start, request.page_range.end)
+        if page_range[0] < 1 or page_range[1] < page_range[0]:
+            raise HTTPException(status_code=400, detail="page_range must satisfy 1 <= start <= end")
+
+    if request.metadata and any(key.startswith("$") for key in request.metadata):
+        raise HTTPException(status_code=400, detail="metadata filter keys cannot start with '$'")
+
+    return rag_engine.build_where_filter(
+        sources= request.sources,
+        page_range= page_range,
+        metadata= request.metadata
+    )
+
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    payload = json.dumps({"offset": offset, "search": fingerprint}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """
+    Offset stored in a search cursor
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or belongs to another search
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(payload["offset"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("search") != fingerprint or offset < 0:
+        raise HTTPException(status_code=400, detail="Cursor does not belong to this search")
+    return offset
+
 
 @app.post(
         "/query",
         response_model=QueryResponse,
         summary="Query endpoint",
-        description="Accepts a QueryRequest with question and n_results and Returns Query Response with answer and sources"
+        description="Accepts a QueryRequest with question and n_results and Returns Query Response with answer and sources",
+        dependencies=[Depends(admit(query_limiter))]
 )
-def query_documents(request: QueryRequest):
+def query_documents(request: QueryRequest, entry: CollectionEntry = Depends(get_collection)):
     """
     Query the RAG system
     
     Args:
         request: QueryRequest with question and n_results
+        entry: Collection selected by the X-Collection header
         
     Returns:
         QueryResponse with question, answer, sources and num_chunks
@@ -153,86 +718,271 @@ def query_documents(request: QueryRequest):
 
     logger.info(f"Received question: {request.question}")
 
-    if not collection:
-        raise HTTPException(status_code=500, detail="Database not initialised")
-    
     if not request.question or request.question.strip() == "":
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
     if request.n_results < 1 or request.n_results > 10:
         raise HTTPException(status_code=400, detail="n_results must be between 1 and 10")
+
+    if request.mmr_lambda is not None and not 0.0 <= request.mmr_lambda <= 1.0:
+        raise HTTPException(status_code=400, detail="mmr_lambda must be between 0 and 1")
+
+    where = build_request_filter(request)
     
+    # Answers are cached per collection write generation (and snapshot)
+    version = f"{cache.generation(entry.name)}:{replica.snapshot_id if replica else ''}"
+    cache_key = cache.answer_key(entry.name, version, {
+        "question": request.question,
+        "n_results": request.n_results,
+        "where": where,
+        "mmr_lambda": request.mmr_lambda
+    })
+    cached = cache.get_answer(cache_key)
+    if cached is not None:
+        entry.stats.queries += 1
+        return QueryResponse(**cached)
+
     try:
-        logger.info(f"Querying RAG system")
+        logger.info(f"Querying RAG system (filter: {where})")
         reply = rag_engine.query_rag_system(
             question= request.question, 
-            collection= collection, 
-            n_results= request.n_results)
+            collection= entry.collection, 
+            n_results= request.n_results,
+            where= where,
+            mmr_lambda= request.mmr_lambda)
+        entry.stats.queries += 1
         
-        return QueryResponse(
+        response = QueryResponse(
             question= request.question,
             answer = reply["answer"],
             sources= reply["sources"],
+            citations= reply.get("citations", []),
             num_chunks_used = len(reply["context_chunks"])
         )
 
+        # Only answers grounded in retrieved chunks are worth keeping;
+        # failures and empty results are cheap to recompute
+        if reply["sources"]:
+            cache.set_answer(cache_key, response.model_dump())
+        return response
+
     except Exception as e:
         logger.error(f"Query Failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/upload",
-        response_model=UploadResponse,
-        summary="Upload PDF endpoint",
-        description="Accepts a PDF file, Returns an Upload response"
+@app.post(
+        "/search",
+        response_model=SearchResponse,
+        summary="Search endpoint",
+        description="Returns ranked chunks and sources for a question without generating an answer, one page at a time",
+        dependencies=[Depends(admit(query_limiter))]
 )
-async def upload_document(file: UploadFile = File(...)):
+def search_documents(request: SearchRequest, entry: CollectionEntry = Depends(get_collection)):
     """
-    Upload and process a PDF document
-    
+    Retrieval only: the chunks /query would use, ranked by relevance
+
     Args:
-        file: PDF file upload
-        
+        request: SearchRequest with question, filters, page_size and cursor
+        entry: Collection selected by the X-Collection header
+
     Returns:
-        UploadResponse with filename, num_chunks and status
-        
+        SearchResponse with one page of results and the cursor of the next
     """
+    if not request.question or request.question.strip() == "":
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
 
-    logger.info(f"Received file: {file.filename}")
+    if request.page_size < 1 or request.page_size > config.SEARCH_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {config.SEARCH_MAX_PAGE_SIZE}")
 
-    if not collection:
-        raise HTTPException(status_code=500, detail="Database not initialised")
-    
-    if not file.filename.endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files allowed")
-    
-    content = await file.read()
+    where = build_request_filter(request)
 
-    if len(content) == 0:
-        raise HTTPException(status_code=400, detail="File is empty")
-    
-    logger.info(f"Processing {file.filename} ({len(content)} bytes)")
-    
+    # A cursor is only valid for the search that produced it, over the
+    # same data: write generation (shared cache backends), chunk count
+    # (this process's writes without one) and served snapshot
+    data_version = [
+        cache.generation(entry.name),
+        entry.collection.count(),
+        replica.snapshot_id if replica else None
+    ]
+    fingerprint = hashlib.sha256(
+        json.dumps([entry.name, request.question, where, data_version], sort_keys=True).encode()
+    ).hexdigest()[:16]
+    offset = decode_cursor(request.cursor, fingerprint) if request.cursor else 0
+
+    page_size = min(request.page_size, config.SEARCH_MAX_RESULTS - offset)
+    if page_size <= 0:
+        return SearchResponse(question=request.question, results=[], sources=[])
+
+    try:
+        # One extra chunk tells whether there is a next page
+        retrieved = rag_engine.retrieve_chunks(
+            request.question,
+            entry.collection,
+            n_results= page_size + 1,
+            where= where,
+            mmr_lambda= 1.0,
+            offset= offset
+        )
+    except Exception as e:
+        logger.error(f"Search Failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    entry.stats.queries += 1
+
+    has_more = len(retrieved["ids"]) > page_size and offset + page_size < config.SEARCH_MAX_RESULTS
+    rows = list(zip(retrieved["ids"], retrieved["documents"], retrieved["metadatas"], retrieved["distances"]))[:page_size]
+    citations = rag_engine.extract_citations([meta for _, _, meta, _ in rows])
+
+    return SearchResponse(
+        question= request.question,
+        results= [
+            SearchResult(
+                id= chunk_id,
+                text= document,
+                source= meta.get("source", "Unknown"),
+                page= meta.get("page_num"),
+                distance= distance,
+                metadata= meta
+            )
+            for chunk_id, document, meta, distance in rows
+        ],
+        sources= rag_engine.extract_sources([meta for _, _, meta, _ in rows], citations),
+        citations= citations,
+        next_cursor= encode_cursor(offset + page_size, fingerprint) if has_more else None
+    )
+
+
+async def ingest_upload(file: UploadFile,
+                        source: str,
+                        entry: CollectionEntry,
+                        replace: bool = False
+) -> UploadResponse:
+    """
+    Stream an uploaded document to disk, chunk it in the process pool and store it
+
+    The upload is streamed to a temp file in chunks while being hashed,
+    so the file is never held in memory and re-uploads of identical
+    content are detected without re-processing.
+
+    Args:
+        file: Document file upload
+        source: Document id the chunks are stored under
+        entry: Collection to store the chunks in
+        replace: Replace any chunks already stored for source
+
+    Returns:
+        UploadResponse with filename, num_chunks, status and doc_hash
+
+    Raises:
+        HTTPException: 400 for empty files or unsupported formats, 413 for oversized ones,
+            422 when a replacement yields no chunks, 500 on failure
+    """
     temp_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete= False, suffix=".pdf") as temp_file:
-            temp_file.write(content)
-            temp_path = temp_file.name
+        try:
+            temp_path, size, doc_hash = await uploads.stream_upload_to_tempfile(
+                file,
+                max_bytes=MAX_UPLOAD_BYTES
+                )
+        except uploads.UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+
+        # The format comes from the content; the name only tells text formats apart
+        try:
+            file_format = await run_in_threadpool(loaders.detect_format, temp_path, file.filename)
+        except loaders.UnsupportedFormat as e:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {e}")
 
-        logger.info(f"Saved to temp file: {temp_path}")
+        logger.info(f"Processing {file.filename} as {file_format} ({size} bytes, sha256 {doc_hash[:12]})")
 
-        num_chunks = document_processor.process_and_store_pdf(
-            pdf_path= temp_path,
-            collection= collection,
+        if replace:
+            stored_hash = await run_in_threadpool(
+                document_processor.get_document_hash,
+                source,
+                entry.collection
+                )
+            if stored_hash == doc_hash:
+                logger.info(f"Skipping {source}: content unchanged")
+                stored_ids = await run_in_threadpool(
+                    document_processor.list_document_ids,
+                    source,
+                    entry.collection
+                    )
+                return UploadResponse(
+                    filename = source,
+                    num_chunks= len(stored_ids),
+                    status= "unchanged",
+                    doc_hash= doc_hash,
+                    format= file_format
+                )
+        else:
+            existing = await run_in_threadpool(
+                document_processor.find_document_by_hash,
+                doc_hash,
+                entry.collection
+                )
+            if existing:
+                logger.info(f"Skipping {file.filename}: identical document already stored")
+                return UploadResponse(
+                    filename = source,
+                    num_chunks= existing,
+                    status= "duplicate",
+                    doc_hash= doc_hash,
+                    format= file_format
+                )
+
+        # Extraction and chunking are CPU-bound: run them in the process
+        # pool (only the temp path crosses the process boundary), then
+        # embed and store from a thread so the event loop stays free
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(
+            get_ingest_pool(),
+            partial(
+                document_processor.chunk_document,
+                temp_path,
+                overlap=100,
+                source=source,
+                file_format=file_format
+                )
             )
+
+        if replace:
+            num_chunks = await run_in_threadpool(
+                entry.write,
+                document_processor.replace_document,
+                source,
+                chunks,
+                entry.collection,
+                {"doc_hash": doc_hash}
+                )
+            if num_chunks == 0:
+                # Nothing was stored, so the old chunks were left in place
+                raise HTTPException(status_code=422, detail=f"No text could be extracted from {file.filename}")
+        else:
+            num_chunks = await run_in_threadpool(
+                entry.write,
+                document_processor.store_chunks,
+                chunks,
+                entry.collection,
+                {"doc_hash": doc_hash}
+                )
         
-        logger.info(f"Processed {file.filename} : {num_chunks} chunks")
+        entry.stats.uploads += 1
+        logger.info(f"Processed {source} : {num_chunks} chunks")
 
         return UploadResponse(
-            filename = file.filename,
+            filename = source,
             num_chunks= num_chunks,
-            status= "success"
+            status= "replaced" if replace else "success",
+            doc_hash= doc_hash,
+            format= file_format
         )
-        
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error(f"Upload Failed: {e}")
         raise HTTPException(status_code=500, detail= f"Processing failed: {e}")
@@ -243,7 +993,196 @@ async def upload_document(file: UploadFile = File(...)):
             logger.info("Cleaned up temp file")    
 
 
+@app.post("/upload",
+        response_model=UploadResponse,
+        summary="Upload document endpoint",
+        description="Accepts a PDF, TXT, Markdown, HTML or DOCX file, Returns an Upload response",
+        dependencies=[Depends(require_writable), Depends(admit(upload_limiter))]
+)
+async def upload_document(file: UploadFile = File(...),
+                          entry: CollectionEntry = Depends(get_writable_collection)):
+    """
+    Upload and process a document (any format in src.loaders)
+    
+    Args:
+        file: Document file upload
+        entry: Collection selected by the X-Collection header
+        
+    Returns:
+        UploadResponse with filename, num_chunks, status and doc_hash
+        
+    """
+
+    logger.info(f"Received file: {file.filename}")
+
+    return await ingest_upload(file, source=file.filename, entry=entry)
+
+
+@app.put("/documents/{document_id:path}",
+        response_model=UploadResponse,
+        summary="Replace document endpoint",
+        description="Replaces all chunks of a document with a newly uploaded file",
+        dependencies=[Depends(require_writable), Depends(admit(upload_limiter))]
+)
+async def replace_document(document_id: str,
+                           file: UploadFile = File(...),
+                           entry: CollectionEntry = Depends(get_writable_collection)):
+    """
+    Replace (or create) a document from an uploaded file
+
+    New chunks are stored before stale ones are deleted, so queries never
+    see the document missing while it is being replaced.
+    
+    Args:
+        document_id: Document id (the source name chunks are stored under)
+        file: Document file upload
+        entry: Collection selected by the X-Collection header
+        
+    Returns:
+        UploadResponse with status 'replaced' or 'unchanged'
+
+    Raises:
+        HTTPException: 422 if the new file yields no chunks (the old ones are kept)
+        
+    """
+
+    logger.info(f"Replacing {document_id} with {file.filename}")
+
+    return await ingest_upload(file, source=document_id, entry=entry, replace=True)
+
+
+@app.delete("/documents/{document_id:path}",
+        response_model=DeleteResponse,
+        summary="Delete document endpoint",
+        description="Deletes all chunks stored for a document",
+        dependencies=[Depends(require_writable), Depends(admit(upload_limiter))]
+)
+def delete_document(document_id: str, entry: CollectionEntry = Depends(get_collection)):
+    """
+    Delete a document and all of its chunks
+    
+    Args:
+        document_id: Document id (the source name chunks are stored under)
+        entry: Collection selected by the X-Collection header
+        
+    Returns:
+        DeleteResponse with number of chunks deleted
+        
+    """
+
+    logger.info(f"Deleting {document_id}")
+
+    try:
+        num_deleted = entry.write(document_processor.delete_document, document_id, entry.collection)
+    except Exception as e:
+        logger.error(f"Delete Failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Delete failed: {e}")
+
+    if num_deleted == 0:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+
+    entry.stats.deletes += 1
+
+    return DeleteResponse(
+        document_id= document_id,
+        num_chunks_deleted= num_deleted,
+        status= "deleted"
+    )
+
+
+@app.post("/upload/batch",
+        response_model=BatchUploadResponse,
+        summary="Batch upload endpoint",
+        description="Accepts multiple documents and/or zip/tar archives of them, Returns per-file results",
+        dependencies=[Depends(require_writable), Depends(admit(upload_limiter))]
+)
+async def upload_batch(files: list[UploadFile] = File(...),
+                       entry: CollectionEntry = Depends(get_writable_collection)):
+    """
+    Upload and process many documents in one request
+
+    All files share the ingestion process pool and one chunk batcher, so
+    embedding and ChromaDB writes are amortized across the whole set.
+    
+    Args:
+        files: Documents and/or .zip, .tar, .tar.gz, .tgz archives
+        entry: Collection selected by the X-Collection header
+        
+    Returns:
+        BatchUploadResponse with totals and per-file results
+        
+    """
+
+    logger.info(f"Received batch of {len(files)} files")
+
+    work_dir = tempfile.mkdtemp(prefix="rag_batch_")
+    try:
+        inputs = []
+        rejected = []
+        for file in files:
+            if not (ingest.is_document(file.filename) or ingest.is_archive(file.filename)):
+                rejected.append(FileResult(
+                    filename= file.filename,
+                    num_chunks= 0,
+                    status= "skipped",
+                    error= "Only PDF, TXT, Markdown, HTML, DOCX files and zip/tar archives allowed"
+                ))
+                continue
+
+            try:
+                temp_path, _, _ = await uploads.stream_upload_to_tempfile(
+                    file,
+                    max_bytes= MAX_UPLOAD_BYTES,
+                    suffix= os.path.splitext(file.filename)[1],
+                    directory= work_dir
+                    )
+            except uploads.UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+
+            inputs.append((file.filename, temp_path))
+
+        pdfs, skipped = await run_in_threadpool(ingest.collect_files, inputs, work_dir)
+        rejected.extend(
+            FileResult(filename= name, num_chunks= 0, status= "skipped", error= "Invalid archive")
+            for name in skipped
+        )
+
+        # Extraction runs unlocked; only the ChromaDB writes take the
+        # collection's write lock, as in /upload
+        results = await run_in_threadpool(
+            partial(
+                ingest.ingest_files,
+                pdfs,
+                entry.collection,
+                get_ingest_pool(),
+                write=entry.write
+                )
+            )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Batch upload failed: {e}")
+        raise HTTPException(status_code=500, detail= f"Processing failed: {e}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    entry.stats.uploads += sum(1 for r in results if r["status"] == "success")
+    file_results = [FileResult(**r) for r in results] + rejected
+
+    return BatchUploadResponse(
+        num_files= len(file_results),
+        num_chunks= sum(r.num_chunks for r in file_results),
+        results= file_results
+    )
+
+
+
+
 
+_IMPORT_FINISHED = time.perf_counter()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+Micro-batching Module
+
+Coalesces single-item calls arriving from concurrent threads into one
+batched call. The first caller opens a short window; everything that
+arrives before it closes (or until the batch is full) is processed
+together and each caller gets its own result back.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+
+class MicroBatcher:
+    """
+    Collects items for up to window_ms and hands them to func as one list
+
+    Args:
+        func: Called with a list of items, returns one result per item
+        window_ms: How long the first item of a batch waits for company
+        max_batch: Batch is processed as soon as it has this many items
+        name: Name used in logs and metrics
+    """
+
+    def __init__(self,
+                 func: Callable[[List[Any]], List[Any]],
+                 window_ms: float = 5.0,
+                 max_batch: int = 32,
+                 name: str = "batcher"):
+        self.func = func
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.failures = 0
+        self.size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS + (None,)}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+
+    def submit(self, item: Any) -> Any:
+        """
+        Process one item as part of the next batch and wait for its result
+
+        Raises:
+            Exception: Whatever func raised for the batch
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][2] + self.window
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                results = self.func([item for item, _, _ in batch])
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+            except Exception as e:
+                logger.error(f"{self.name}: batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                failed = True
+
+            self._record(batch, started, failed)
+
+
+    def _record(self, batch: list, started: float, failed: bool) -> None:
+        waits = [started - submitted for _, _, submitted in batch]
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), None)
+
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.failures += int(failed)
+            self.size_histogram[bucket] += 1
+            self.wait_seconds_total += sum(waits)
+            self.wait_seconds_max = max(self.wait_seconds_max, max(waits))
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "failures": self.failures,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": {
+                    (f"<={bucket}" if bucket else f">{BATCH_SIZE_BUCKETS[-1]}"): count
+                    for bucket, count in self.size_histogram.items()
+                },
+                "mean_queue_wait_ms": 1000.0 * self.wait_seconds_total / self.items if self.items else 0.0,
+                "max_queue_wait_ms": 1000.0 * self.wait_seconds_max
+            }
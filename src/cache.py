@@ -0,0 +1,356 @@
+"""
+Cache Module
+
+Answer and query-embedding caches with a pluggable backend, so that
+several API workers can share one cache:
+
+    memory   per-process LRU (each worker has its own)
+    sqlite   one SQLite file shared by every worker and process on a host
+    redis    any Redis-compatible server (needs the redis package)
+
+Answers are keyed by the collection's generation, a counter bumped on
+every write to the collection. With a shared backend a write from any
+worker, the watcher or the ingest CLI invalidates the cached answers of
+all workers; with the memory backend other workers may serve answers up
+to ANSWER_CACHE_TTL_SECONDS old.
+
+Backends are created lazily and again after a fork, so nothing opened in
+a preloading parent process is shared with its workers.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from src import config
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKENDS = ("none", "memory", "sqlite", "redis")
+
+# Backends every process on the host (or cluster) sees
+SHARED_BACKENDS = ("sqlite", "redis")
+
+
+
+class MemoryCache:
+    """
+    In-process LRU with per-entry expiry
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires and expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+
+    def set(self, key: str, value: bytes, ttl: float = 0) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl else 0)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._entries.get(key, (b"0", 0))[0]) + 1
+            self._entries[key] = (str(value).encode(), 0)
+            return value
+
+
+
+class SQLiteCache:
+    """
+    Cache table in a SQLite file, safe to share between processes
+
+    Expired entries are removed every prune_every writes; past
+    max_entries the entries closest to expiry are dropped.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, prune_every: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires = 0 OR expires > ?)",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        # Counters are stored as text by incr
+        return row[0].encode() if isinstance(row[0], str) else bytes(row[0])
+
+
+    def set(self, key: str, value: bytes, ttl: float = 0) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else 0)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache VALUES (?, '1', 0)"
+                " ON CONFLICT(key) DO UPDATE SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT)",
+                (key,)
+            )
+            self._conn.commit()
+            return int(self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()[0])
+
+
+    def _prune(self) -> None:
+        self._conn.execute("DELETE FROM cache WHERE expires != 0 AND expires < ?", (time.time(),))
+        excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN"
+                " (SELECT key FROM cache WHERE expires != 0 ORDER BY expires LIMIT ?)",
+                (excess,)
+            )
+        self._conn.commit()
+
+
+
+class RedisCache:
+    """
+    Redis (or any server speaking its protocol)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("CACHE_BACKEND=redis needs the redis package: pip install redis")
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+
+    def set(self, key: str, value: bytes, ttl: float = 0) -> None:
+        self._client.set(key, value, ex=int(ttl) if ttl else None)
+
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+
+_cache = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+# Hit/miss counters of this process, per kind ('answer', 'embedding')
+_stats: Dict[str, Dict[str, int]] = {}
+
+# Last generation read per collection, used while the backend is failing
+_generations: Dict[str, int] = {}
+
+
+def get_cache() -> Optional[Any]:
+    """
+    Cache backend selected by CACHE_BACKEND, created once per process
+
+    Returns:
+        MemoryCache, SQLiteCache or RedisCache, or None if caching is off
+    """
+    global _cache, _cache_pid
+
+    if config.CACHE_BACKEND == "none":
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            if config.CACHE_BACKEND == "memory":
+                _cache = MemoryCache(config.CACHE_MAX_ENTRIES)
+            elif config.CACHE_BACKEND == "sqlite":
+                _cache = SQLiteCache(config.CACHE_PATH, config.CACHE_MAX_ENTRIES)
+            elif config.CACHE_BACKEND == "redis":
+                _cache = RedisCache(config.CACHE_URL)
+            else:
+                raise ValueError(f"Unknown CACHE_BACKEND {config.CACHE_BACKEND}, expected one of {CACHE_BACKENDS}")
+            _cache_pid = os.getpid()
+            logger.info(f"Opened {config.CACHE_BACKEND} cache in process {_cache_pid}")
+        return _cache
+
+
+def is_shared() -> bool:
+    """
+    Whether writes in one process are seen by the others through the cache
+    """
+    return config.CACHE_BACKEND in SHARED_BACKENDS
+
+
+def _count(kind: str, hit: bool) -> None:
+    counters = _stats.setdefault(kind, {"hits": 0, "misses": 0})
+    counters["hits" if hit else "misses"] += 1
+
+
+def metrics() -> Dict[str, Any]:
+    """
+    Backend and hit/miss counts of this process
+    """
+    return {"backend": config.CACHE_BACKEND, **{kind: dict(counts) for kind, counts in _stats.items()}}
+
+
+
+def generation(collection_name: str) -> int:
+    """
+    Write generation of a collection (0 if never written while cached)
+
+    If the backend fails, the last generation this process read is
+    returned, as if no cache were configured since then.
+    """
+    try:
+        cache = get_cache()
+        if cache is None:
+            return 0
+        value = cache.get(f"gen:{collection_name}")
+    except Exception as e:
+        logger.warning(f"Failed to read the write generation of {collection_name}: {e}")
+        return _generations.get(collection_name, 0)
+    _generations[collection_name] = int(value) if value else 0
+    return _generations[collection_name]
+
+
+def invalidate(collection_name: str) -> None:
+    """
+    Bump a collection's generation so its cached answers are not used
+
+    Called by every write path in document_processor.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(f"gen:{collection_name}")
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached answers for {collection_name}: {e}")
+
+
+def answer_key(collection_name: str, version: str, request: Dict[str, Any]) -> str:
+    """
+    Cache key of an answer
+
+    Args:
+        collection_name: Collection queried
+        version: Generation (and snapshot) the answer was computed from
+        request: Question and every parameter that changes the answer
+    """
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"answer:{collection_name}:{version}:{digest}"
+
+
+def get_answer(key: str) -> Optional[Dict[str, Any]]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Answer cache read failed: {e}")
+        return None
+    _count("answer", value is not None)
+    return json.loads(value) if value is not None else None
+
+
+def set_answer(key: str, answer: Dict[str, Any]) -> None:
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, json.dumps(answer).encode("utf-8"), config.ANSWER_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Answer cache write failed: {e}")
+
+
+def _embedding_key(model_id: str, text: str) -> str:
+    return f"embedding:{model_id}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+def get_embeddings(model_id: str, texts: List[str]) -> List[Optional["np.ndarray"]]:
+    """
+    Cached query embeddings, None where a text is not cached
+    """
+    import numpy as np
+
+    cache = get_cache()
+    if cache is None:
+        return [None] * len(texts)
+
+    vectors = []
+    for text in texts:
+        try:
+            value = cache.get(_embedding_key(model_id, text))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            value = None
+        _count("embedding", value is not None)
+        vectors.append(np.frombuffer(value, dtype=np.float32) if value is not None else None)
+    return vectors
+
+
+def set_embeddings(model_id: str, texts: List[str], vectors: "np.ndarray") -> None:
+    import numpy as np
+
+    cache = get_cache()
+    if cache is None:
+        return
+    for text, vector in zip(texts, vectors):
+        try:
+            cache.set(_embedding_key(model_id, text), np.asarray(vector, dtype=np.float32).tobytes(),
+                      config.EMBEDDING_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+            return
@@ -0,0 +1,518 @@
+"""
+Chunk Store Module
+
+Read-only, memory-mapped copy of a collection's chunk text and metadata.
+Retrieval asks ChromaDB only for ids and distances and resolves the ids
+here in O(1), avoiding the per-row dicts ChromaDB builds for documents
+and metadatas and keeping the text out of the Python heap.
+
+Layout of a collection's store directory:
+    CURRENT                        name of the live version directory
+    WRITTEN                        write stamp, replaced on every write
+    build.lock                     serialises builds across processes
+    v<time>-<pid>/                 one snapshot:
+
+    text.bin / text_offsets.npy    UTF-8 chunk texts and row offsets
+    ids.bin / id_offsets.npy       chunk ids (to confirm hash matches)
+    meta.bin / meta_offsets.npy    remaining metadata as JSON per row
+    pages.npy                      page_num column (int32)
+    source_codes.npy + sources.json  source column, integer coded
+    table_keys.npy / table_rows.npy  open-addressing hash table id -> row
+    manifest.json                  row count, build time, generation and stamp
+
+A build writes a new version directory and then replaces CURRENT with a
+rename, so readers in other processes see either the old or the new
+snapshot, never a half-written one. The previous version is kept for
+readers still opening it.
+
+The store is a snapshot of the collection at one write generation
+(cache.generation) and write stamp. The write paths in document_processor
+replace the WRITTEN stamp (mark_stale), so writes from other processes
+are seen through the shared store directory even with CACHE_BACKEND=none;
+every config.CHUNK_STORE_RECHECK_SECONDS the collection size is also
+compared, for writes that bypassed both. Once the collection has been
+written since, the store is not used: retrieval falls back to ChromaDB
+while a rebuild runs in the background, and a version rebuilt by another
+worker is picked up from CURRENT.
+
+Usage:
+    python -m src.chunk_store build --collection ml_documents
+
+Run the build while the API is stopped, or let the API build it during
+warmup with CHUNK_STORE_ENABLED=true.
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+import threading
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src import cache
+from src import config
+
+# numpy and chromadb are imported on first use so the write paths in
+# document_processor can import this module cheaply
+if TYPE_CHECKING:
+    import chromadb
+
+
+logger = logging.getLogger(__name__)
+
+# Version directories kept per collection (the live one and its predecessor)
+KEEP_VERSIONS = 2
+
+
+
+def hash_id(chunk_id: str) -> int:
+    """
+    64-bit hash of a chunk id for the lookup table (never 0)
+    """
+    value = int.from_bytes(hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1
+
+
+def _map_file(path: str):
+    size = os.path.getsize(path)
+    if size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+
+class ChunkStore:
+    """
+    Memory-mapped chunk snapshot of one collection
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "sources.json")) as f:
+            self.sources: List[str] = json.load(f)
+
+        import numpy as np
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self._text = _map_file(os.path.join(path, "text.bin"))
+        self._ids = _map_file(os.path.join(path, "ids.bin"))
+        self._meta = _map_file(os.path.join(path, "meta.bin"))
+        self._text_offsets = load("text_offsets.npy")
+        self._id_offsets = load("id_offsets.npy")
+        self._meta_offsets = load("meta_offsets.npy")
+        self._pages = load("pages.npy")
+        self._source_codes = load("source_codes.npy")
+        self._table_keys = load("table_keys.npy")
+        self._table_rows = load("table_rows.npy")
+        self._mask = len(self._table_rows) - 1
+
+
+    def __len__(self) -> int:
+        return int(self.manifest["num_chunks"])
+
+
+    @property
+    def generation(self) -> Optional[int]:
+        """
+        Collection write generation the snapshot was taken at
+        """
+        return self.manifest.get("generation")
+
+
+    @property
+    def write_stamp(self) -> int:
+        """
+        WRITTEN stamp of the store directory the snapshot was taken at
+        """
+        return int(self.manifest.get("write_stamp", 0))
+
+
+    def lookup(self, chunk_id: str) -> int:
+        """
+        Row of a chunk id
+
+        Returns:
+            int: Row number, or -1 if the id is not in the snapshot
+        """
+        key = hash_id(chunk_id)
+        slot = key & self._mask
+        while True:
+            row = int(self._table_rows[slot]) - 1
+            if row < 0:
+                return -1
+            if int(self._table_keys[slot]) == key and self._id_at(row) == chunk_id:
+                return row
+            slot = (slot + 1) & self._mask
+
+
+    def _id_at(self, row: int) -> str:
+        return self._ids[self._id_offsets[row]:self._id_offsets[row + 1]].decode("utf-8")
+
+
+    def text(self, row: int) -> str:
+        return self._text[self._text_offsets[row]:self._text_offsets[row + 1]].decode("utf-8")
+
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        meta = {
+            "source": self.sources[self._source_codes[row]],
+            "page_num": int(self._pages[row])
+        }
+        blob = self._meta[self._meta_offsets[row]:self._meta_offsets[row + 1]]
+        if blob:
+            meta.update(json.loads(blob))
+        return meta
+
+
+    def resolve(self, ids: List[str]) -> Tuple[List[Optional[str]], List[Optional[Dict[str, Any]]]]:
+        """
+        Look up text and metadata for chunk ids
+
+        Args:
+            ids: Chunk ids (e.g. from collection.query)
+
+        Returns:
+            tuple: (documents, metadatas), None where the id is missing from
+                the snapshot
+        """
+        documents, metadatas = [], []
+        for chunk_id in ids:
+            row = self.lookup(chunk_id)
+            if row < 0:
+                documents.append(None)
+                metadatas.append(None)
+            else:
+                documents.append(self.text(row))
+                metadatas.append(self.metadata(row))
+        return documents, metadatas
+
+
+
+def build(collection: "chromadb.Collection", path: str, batch_size: int = 1000) -> int:
+    """
+    Write a chunk store snapshot of a collection
+
+    The snapshot goes into a new version directory under path, which
+    then becomes CURRENT with an atomic rename; a store that is open
+    elsewhere keeps working until it is reloaded. Builds of one store
+    run one at a time, across processes.
+
+    Args:
+        collection: ChromaDB collection to snapshot
+        path: Store directory of the collection
+        batch_size: Chunks read from ChromaDB per call
+
+    Returns:
+        int: Number of chunks written
+    """
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "build.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _build_version(collection, path, batch_size)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _build_version(collection: "chromadb.Collection", path: str, batch_size: int) -> int:
+    import numpy as np
+
+    # Read before the chunks: a write during the build leaves the new
+    # version behind the collection's generation, so it is rebuilt again
+    generation = cache.generation(collection.name)
+    write_stamp = read_write_stamp(path)
+
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    tmp_path = os.path.join(path, version)
+    os.makedirs(tmp_path)
+
+    text_offsets, id_offsets, meta_offsets = [0], [0], [0]
+    pages, source_codes, keys = [], [], []
+    sources: Dict[str, int] = {}
+
+    with open(os.path.join(tmp_path, "text.bin"), "wb") as text_file, \
+         open(os.path.join(tmp_path, "ids.bin"), "wb") as ids_file, \
+         open(os.path.join(tmp_path, "meta.bin"), "wb") as meta_file:
+
+        offset = 0
+        while True:
+            batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            offset += len(batch["ids"])
+
+            for chunk_id, document, meta in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                meta = dict(meta or {})
+
+                encoded = (document or "").encode("utf-8")
+                text_file.write(encoded)
+                text_offsets.append(text_offsets[-1] + len(encoded))
+
+                encoded = chunk_id.encode("utf-8")
+                ids_file.write(encoded)
+                id_offsets.append(id_offsets[-1] + len(encoded))
+                keys.append(hash_id(chunk_id))
+
+                source = str(meta.pop("source", "Unknown"))
+                source_codes.append(sources.setdefault(source, len(sources)))
+                pages.append(int(meta.pop("page_num", 0) or 0))
+
+                encoded = json.dumps(meta, separators=(",", ":")).encode("utf-8") if meta else b""
+                meta_file.write(encoded)
+                meta_offsets.append(meta_offsets[-1] + len(encoded))
+
+    np.save(os.path.join(tmp_path, "text_offsets.npy"), np.array(text_offsets, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "id_offsets.npy"), np.array(id_offsets, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "meta_offsets.npy"), np.array(meta_offsets, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "pages.npy"), np.array(pages, dtype=np.int32))
+    np.save(os.path.join(tmp_path, "source_codes.npy"), np.array(source_codes, dtype=np.int32))
+
+    # Open addressing with linear probing at <= 50% load; rows stored +1 so 0 means empty
+    size = 1
+    while size < 2 * max(len(keys), 1):
+        size *= 2
+    table_keys = np.zeros(size, dtype=np.uint64)
+    table_rows = np.zeros(size, dtype=np.int32)
+    mask = size - 1
+    for row, key in enumerate(keys):
+        slot = key & mask
+        while table_rows[slot]:
+            slot = (slot + 1) & mask
+        table_keys[slot] = key
+        table_rows[slot] = row + 1
+    np.save(os.path.join(tmp_path, "table_keys.npy"), table_keys)
+    np.save(os.path.join(tmp_path, "table_rows.npy"), table_rows)
+
+    with open(os.path.join(tmp_path, "sources.json"), "w") as f:
+        json.dump(sorted(sources, key=sources.get), f)
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump({
+            "collection": collection.name,
+            "num_chunks": len(keys),
+            "built_at": time.time(),
+            "generation": generation,
+            "write_stamp": write_stamp
+        }, f)
+
+    pointer = os.path.join(path, f"CURRENT.tmp-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, "CURRENT"))
+
+    versions = sorted(name for name in os.listdir(path) if name.startswith("v"))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+    logger.info(f"Built chunk store for {collection.name}: {len(keys)} chunks at {tmp_path}")
+    return len(keys)
+
+
+def open_current(path: str) -> Optional[ChunkStore]:
+    """
+    Open the live version of a store directory
+
+    Returns:
+        ChunkStore, or None if nothing has been built (or the version
+        was removed while being opened)
+    """
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            version = f.read().strip()
+        return ChunkStore(os.path.join(path, version))
+    except FileNotFoundError:
+        return None
+
+
+
+_stores: Dict[str, ChunkStore] = {}
+_stale: Dict[str, bool] = {}
+_checked: Dict[str, float] = {}
+_rebuilding: Dict[str, threading.Thread] = {}
+_stores_lock = threading.Lock()
+
+
+def store_path(collection_name: str) -> str:
+    return os.path.join(config.CHUNK_STORE_DIR, collection_name)
+
+
+def read_write_stamp(path: str) -> int:
+    """
+    Current WRITTEN stamp of a store directory (0 if never written)
+    """
+    try:
+        with open(os.path.join(path, "WRITTEN")) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def record_write(path: str) -> None:
+    """
+    Replace a store directory's WRITTEN stamp so every process retires
+    snapshots taken before the write
+
+    Nothing is recorded when the collection has no store yet.
+    """
+    if not os.path.isdir(path):
+        return
+    pointer = os.path.join(path, f"WRITTEN.tmp-{os.getpid()}-{threading.get_ident()}")
+    try:
+        with open(pointer, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(pointer, os.path.join(path, "WRITTEN"))
+    except OSError as e:
+        logger.warning(f"Could not record write in {path}: {e}")
+
+
+def get_store(collection: "chromadb.Collection", rebuild_stale: bool = True) -> Optional[ChunkStore]:
+    """
+    Store for a collection, if chunk stores are enabled and it is current
+
+    A store taken at an older write generation or write stamp than the
+    collection's is replaced by the version on disk if another process
+    rebuilt it; otherwise None is returned so the caller reads from
+    ChromaDB. A store whose size no longer matches the collection's is
+    retired the same way.
+
+    Args:
+        collection: ChromaDB collection
+        rebuild_stale: Start a background rebuild when there is no
+            current store
+
+    Returns:
+        ChunkStore, or None
+    """
+    if not config.CHUNK_STORE_ENABLED:
+        return None
+
+    name = collection.name
+    path = store_path(name)
+    now = time.time()
+    generation = cache.generation(name)
+    write_stamp = read_write_stamp(path)
+    with _stores_lock:
+        store = _stores.get(name)
+        stale = _stale.get(name, False)
+        checked = _checked.get(name, 0.0)
+
+    def current(candidate: Optional[ChunkStore]) -> bool:
+        return (candidate is not None and candidate.generation == generation
+                and candidate.write_stamp == write_stamp)
+
+    if not stale and not current(store):
+        store = open_current(path)
+        checked = 0.0
+        if store is not None:
+            with _stores_lock:
+                _stores[name] = store
+
+    if not stale and current(store) and now - checked >= config.CHUNK_STORE_RECHECK_SECONDS:
+        count = collection.count()
+        with _stores_lock:
+            _checked[name] = now
+        if count != len(store):
+            logger.info(f"Chunk store for {name} has {len(store)} chunks, collection has {count}")
+            mark_stale(name)
+            stale = True
+
+    if stale or not current(store):
+        if rebuild_stale:
+            rebuild_in_background(collection)
+        return None
+    return store
+
+
+def rebuild(collection: "chromadb.Collection") -> ChunkStore:
+    """
+    Rebuild a collection's store and swap it in for this process
+    """
+    name = collection.name
+    with _stores_lock:
+        _stale[name] = False
+
+    path = store_path(name)
+    build(collection, path)
+    store = open_current(path)
+
+    with _stores_lock:
+        _stores[name] = store
+    return store
+
+
+def rebuild_in_background(collection: "chromadb.Collection") -> None:
+    """
+    Start a rebuild unless one is already running for the collection
+    """
+    name = collection.name
+    with _stores_lock:
+        running = _rebuilding.get(name)
+        if running is not None and running.is_alive():
+            return
+
+        def run():
+            try:
+                rebuild(collection)
+            except Exception as e:
+                logger.error(f"Chunk store rebuild failed for {name}: {e}")
+
+        thread = threading.Thread(target=run, name=f"chunk-store-rebuild-{name}", daemon=True)
+        _rebuilding[name] = thread
+        thread.start()
+
+
+def mark_stale(collection_name: str) -> None:
+    """
+    Stop using a collection's store until it is rebuilt
+
+    Called by the write paths in document_processor and when a replica
+    swaps to a new snapshot; the WRITTEN stamp it replaces tells other
+    processes to stop using their copy too.
+    """
+    with _stores_lock:
+        _stale[collection_name] = True
+        _stores.pop(collection_name, None)
+    record_write(store_path(collection_name))
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Build memory-mapped chunk stores")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Snapshot a collection into a chunk store")
+    build_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    build_parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    build_parser.add_argument("--store-dir", default=config.CHUNK_STORE_DIR)
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    if args.command == "build":
+        import chromadb
+        client = chromadb.PersistentClient(path=args.db_path)
+        collection = client.get_collection(name=args.collection)
+        path = os.path.join(args.store_dir, args.collection)
+        num_chunks = build(collection, path)
+        print(f"{args.collection}: {num_chunks} chunks written to {path}")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+"""
+Configuration Module
+
+Single place where the environment (and .env file) is read and logging
+is configured. Kept dependency-light so any module can import it cheaply.
+"""
+
+import logging
+import os
+
+from dotenv import load_dotenv
+
+
+# Load environment once for the whole package
+load_dotenv()
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """
+    Read a true/false environment variable
+    """
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# ChromaDB configuration
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./chroma_db")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "ml_documents")
+MAX_OPEN_COLLECTIONS = int(os.getenv("MAX_OPEN_COLLECTIONS", "8"))
+CHROMA_MEMORY_LIMIT_BYTES = int(os.getenv("CHROMA_MEMORY_LIMIT_BYTES", "0"))   # 0 = no limit
+ALLOW_CREATE_COLLECTIONS = env_bool("ALLOW_CREATE_COLLECTIONS", True)
+WARMUP_ON_STARTUP = env_bool("WARMUP_ON_STARTUP", True)
+
+# API worker processes (uvicorn --workers in the Docker image); with more
+# than one the instance only serves queries and refuses writes
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# Answer and query-embedding caches ('none', 'memory', 'sqlite' or 'redis');
+# sqlite and redis are shared by all workers
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "none")
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(CHROMA_DB_PATH, "cache.sqlite3"))
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+
+# Read-replica mode: serve published snapshots read-only (see src.snapshot)
+READ_ONLY = env_bool("READ_ONLY", False)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+SNAPSHOT_LOCAL_DIR = os.getenv("SNAPSHOT_LOCAL_DIR", "")   # per-process copies, system temp dir if empty
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "10"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+# Embedding configuration
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")   # id recorded per collection
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "")   # dir with model.onnx + tokenizer.json, required for other models
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))   # 0 = onnxruntime default
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "256"))
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))   # 0 disables micro-batching
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+
+# Retrieval configuration
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "1.0"))   # 1.0 = rank by relevance only (MMR off); e.g. 0.7 to diversify
+MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "4"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "50"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "200"))   # deepest result /search pages to
+
+# Admission control configuration
+QUERY_MAX_CONCURRENCY = int(os.getenv("QUERY_MAX_CONCURRENCY", "8"))
+QUERY_MAX_QUEUE = int(os.getenv("QUERY_MAX_QUEUE", "32"))
+QUERY_MAX_WAIT_SECONDS = float(os.getenv("QUERY_MAX_WAIT_SECONDS", "10"))
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "2"))
+UPLOAD_MAX_QUEUE = int(os.getenv("UPLOAD_MAX_QUEUE", "4"))
+UPLOAD_MAX_WAIT_SECONDS = float(os.getenv("UPLOAD_MAX_WAIT_SECONDS", "30"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))   # 0 disables
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+
+# Ingestion configuration
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(500 * 1024 * 1024)))   # whole /upload/batch body
+MAX_ARCHIVE_BYTES = int(os.getenv("MAX_ARCHIVE_BYTES", str(500 * 1024 * 1024)))
+LOADER_PAGE_CHARS = int(os.getenv("LOADER_PAGE_CHARS", "4000"))   # page size of TXT/MD/HTML/DOCX sections
+
+# OCR of scanned pages (needs pytesseract, Pillow and the tesseract binary)
+OCR_ENABLED = env_bool("OCR_ENABLED", True)
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "20"))   # pages with less text are OCR'd
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))   # per ingestion process
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "120"))
+
+# Parent-child chunking: embed small children, answer with their parents
+PARENT_CHILD_CHUNKS = env_bool("PARENT_CHILD_CHUNKS", False)
+PARENT_SPAN = os.getenv("PARENT_SPAN", "chunk")   # 'chunk' (paragraph) or 'page'
+CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", "200"))
+CHILD_CHUNK_OVERLAP = int(os.getenv("CHILD_CHUNK_OVERLAP", "40"))
+PARENT_STORE_PATH = os.getenv("PARENT_STORE_PATH", os.path.join(CHROMA_DB_PATH, "parents.sqlite3"))
+
+# Embeddings kept outside ChromaDB for re-indexing (python -m src.embedding_store)
+EMBEDDING_STORE_ENABLED = env_bool("EMBEDDING_STORE_ENABLED", False)
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(CHROMA_DB_PATH, "embeddings"))
+
+# Memory-mapped chunk text/metadata snapshot used to resolve query results
+CHUNK_STORE_ENABLED = env_bool("CHUNK_STORE_ENABLED", False)
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", os.path.join(CHROMA_DB_PATH, "chunk_store"))
+CHUNK_STORE_RECHECK_SECONDS = float(os.getenv("CHUNK_STORE_RECHECK_SECONDS", "5"))   # recheck size for unseen writes
+
+# Local quantised IVF index, per collection ("*" = all collections)
+ANN_INDEX_COLLECTIONS = {name.strip() for name in os.getenv("ANN_INDEX_COLLECTIONS", "").split(",") if name.strip()}
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", os.path.join(CHROMA_DB_PATH, "ann_index"))
+ANN_QUANTIZATION = os.getenv("ANN_QUANTIZATION", "int8")   # 'int8' or 'binary'
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_RESCORE_MULTIPLIER = int(os.getenv("ANN_RESCORE_MULTIPLIER", "4"))
+ANN_INDEX_RECHECK_SECONDS = float(os.getenv("ANN_INDEX_RECHECK_SECONDS", "5"))   # pick up other workers' writes/rebuilds
+
+# Brute-force search for collections up to this many chunks (0 disables)
+EXACT_SEARCH_MAX_CHUNKS = int(os.getenv("EXACT_SEARCH_MAX_CHUNKS", "5000"))
+EXACT_SEARCH_REFRESH_SECONDS = float(os.getenv("EXACT_SEARCH_REFRESH_SECONDS", "30"))
+
+
+def setup_logging() -> None:
+    """
+    Configure root logging for an entry point (API or CLI)
+
+    Library modules only create loggers; the process entry point calls
+    this once. Repeated calls are harmless.
+    """
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
@@ -1,24 +1,33 @@
 """
 Document Processing Module
 
-Handles PDF text extraction, intelligent chunking, and storage 
-in vector database for RAG systems.
+Handles PDF text extraction (other formats through src.loaders),
+intelligent chunking, and storage in vector database for RAG systems.
 """
 
 import logging
 import os
 import hashlib
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from src import config
+from src import ann_index
+from src import cache
+from src import chunk_store
+from src import embedding_store
+from src import embeddings
+from src import exact_index
+from src import loaders
+from src import ocr
+from src import parent_store
+
+# pypdf and chromadb are heavy; they are imported on first use so that
+# chunking helpers and ingestion workers stay cheap to import
+if TYPE_CHECKING:
+    import chromadb
 
-from pypdf import PdfReader
-import chromadb
 
-
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -87,11 +96,64 @@ def chunk_by_paragraphs(text: str) -> List[str]:
     return paragraphs
 
 
+def locate_chunks(text: str, chunks: List[str]) -> List[Optional[Tuple[int, int]]]:
+    """
+    Find the character span of each chunk within the text it came from
+
+    Chunks are stripped substrings of the text in order (possibly
+    overlapping), so each is searched for from just past the start of
+    the previous one, in a single forward scan.
+
+    Args:
+        text: Text that was chunked
+        chunks: Chunks of that text, in order
+
+    Returns:
+        list: (start, end) per chunk, None where a chunk was not found
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start < 0:
+            spans.append(None)
+            continue
+        spans.append((start, start + len(chunk)))
+        cursor = start + 1
+    return spans
+
+
+def is_heading(line: str) -> bool:
+    """
+    Guess whether a line of extracted text is a section heading
+
+    PDF text has no structure, so a heading is taken to be a short line
+    without closing punctuation that starts with a capital or a number
+    (e.g. "3.2 Civil Defence").
+
+    Args:
+        line: A single line of text
+
+    Returns:
+        bool: True if the line looks like a heading
+    """
+    line = line.strip()
+    if not line or len(line) > 80 or len(line.split()) > 12:
+        return False
+    if line[-1] in ".,;:!?)\"'":
+        return False
+    return line[0].isupper() or line[0].isdigit()
+
+
 
 
 def extract_text_from_pdf(pdf_path :str) -> Dict[str, Any]:
     """
     Extract text from PDF file
+
+    Pages with almost no text layer (scans) are sent to the OCR pool as
+    they are found and their OCR text used instead, while the other pages
+    keep being extracted; see src.ocr.
     
     Args:
         pdf_path: Path to PDF file
@@ -101,30 +163,74 @@ def extract_text_from_pdf(pdf_path :str) -> Dict[str, Any]:
             'text': full text from all pages combined,
             'pages': list of text from each page,
             'num_pages': number of pages,
-            'metadata': PDF metadata (title, author, etc.)
+            'metadata': PDF metadata (title, author, etc.),
+            'ocr_pages': numbers of the pages whose text came from OCR,
+            'page_timings': per page {'page', 'method' ('text' or 'ocr'),
+                'seconds', 'chars', 'low_text'}
         }
 
     Raises:
         FileNotFoundError: If PDF file doesn't exist
         Exception: If PDF extraction fails
     """
+    from pypdf import PdfReader
+
     try:
         logger.info(f"Reading text from {pdf_path}")
+        started = time.perf_counter()
         reader = PdfReader(stream= pdf_path)
 
         pages = []
-        for page in reader.pages:
-            text = page.extract_text() 
-            pages.append(text if text else "")
+        timings = []
+        pending = {}
+        for pg_num, page in enumerate(reader.pages, start=1):
+            page_started = time.perf_counter()
+            text = page.extract_text() or ""
+
+            timing = {"page": pg_num, "method": "text", "low_text": ocr.is_low_text(text)}
+            if timing["low_text"]:
+                future = ocr.submit_page(page)
+                if future is not None:
+                    pending[pg_num] = future
+                    timing["method"] = "ocr"
+
+            timing["seconds"] = time.perf_counter() - page_started
+            timing["chars"] = len(text)
+            pages.append(text)
+            timings.append(timing)
+
+        ocr_pages = []
+        for pg_num, future in pending.items():
+            timing = timings[pg_num - 1]
+            try:
+                text, seconds = future.result()
+            except Exception as e:
+                logger.error(f"OCR failed for page {pg_num} of {pdf_path}: {e}")
+                timing["method"] = "text"
+                continue
+            timing["seconds"] += seconds
+            if len(text.strip()) > len(pages[pg_num - 1].strip()):
+                pages[pg_num - 1] = text
+                timing["chars"] = len(text)
+                ocr_pages.append(pg_num)
+            else:
+                timing["method"] = "text"
+
+        skipped = [t["page"] for t in timings if t["low_text"] and t["method"] == "text"]
+        if skipped:
+            logger.warning(f"{len(skipped)} pages of {pdf_path} have little or no text and were not OCR'd: {skipped}")
 
         info = {
             "num_pages": len(reader.pages),
             "metadata": reader.metadata,
             "pages": pages,
-            "text": "\n\n".join(pages)
+            "text": "\n\n".join(pages),
+            "ocr_pages": ocr_pages,
+            "page_timings": timings
         }
 
-        logger.info(f"Successfully extracted {len(pages)} pages")
+        logger.info(f"Successfully extracted {len(pages)} pages ({len(ocr_pages)} by OCR) "
+                    f"in {time.perf_counter() - started:.2f}s")
         return info
         
     
@@ -139,30 +245,71 @@ def extract_text_from_pdf(pdf_path :str) -> Dict[str, Any]:
 def chunk_pdf_by_pages(pdf_path: str,
                     chunk_size: int=500,
                     overlap: int=50,
-                    strategy: str = "paragraph"
+                    strategy: str = "paragraph",
+                    source: Optional[str] = None,
+                    child_size: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     Extract and chunk PDF, tracking which page each chunk came from
+
+    See chunk_document, which this calls for a file known to be a PDF.
+    """
+    return chunk_document(pdf_path, chunk_size, overlap, strategy, source, child_size, file_format="pdf")
+
+
+def chunk_document(path: str,
+                   chunk_size: int=500,
+                   overlap: int=50,
+                   strategy: str = "paragraph",
+                   source: Optional[str] = None,
+                   child_size: Optional[int] = None,
+                   file_format: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Load and chunk a document, tracking which page each chunk came from
+
+    Any format in the loader registry (src.loaders) works; formats without
+    pages are split into sections, which then play the role of pages.
+
+    With parent-child chunking each chunk is further split into children
+    of about child_size characters. Children are what gets embedded; they
+    carry 'parent_id' and 'parent_text' (the whole chunk, or the whole
+    page if config.PARENT_SPAN is 'page') for store_chunks to put in the
+    parent store.
     
     Args:
-        pdf_path: Path to PDF file
+        path: Path to the document
         chunk_size: Size of chunks (only used if strategy='fixed')
         overlap: Overlap between chunks (only used if strategy='fixed')
         strategy: Chunking strategy - 'paragraph' or 'fixed'
+        source: Source name for citations (defaults to the file name)
+        child_size: Child chunk size; None uses config.CHILD_CHUNK_SIZE when
+            config.PARENT_CHILD_CHUNKS is on, 0 disables children
+        file_format: Loader format name; detected from the content if None
         
     Returns:
-        list: List of dicts with 'text', 'page_num', 'chunk_id', 'source'
+        list: List of dicts with 'text', 'page_num', 'chunk_id', 'source',
+            'char_start'/'char_end' (the chunk's span in the page text),
+            plus 'section' (the closest preceding heading) when one was found
+            and 'extraction' = 'ocr' for chunks of OCR'd pages
+
+    Raises:
+        UnsupportedFormat: If the document's format is not supported
     """
+    if child_size is None:
+        child_size = config.CHILD_CHUNK_SIZE if config.PARENT_CHILD_CHUNKS else 0
 
-    source  = os.path.basename(pdf_path)
-    pdf_data = extract_text_from_pdf(pdf_path)
+    source  = source or os.path.basename(path)
+    doc_data = loaders.load(path, file_format, filename=source)
 
-    if not pdf_data:
-        logger.error(f"PDF extraction failed")
+    if not doc_data:
+        logger.error(f"Text extraction failed for {source}")
         return []
     
-    pdf_info = []
-    for pg_num, page in enumerate(pdf_data["pages"], start= 1):
+    doc_chunks = []
+    section = None
+    ocr_pages = set(doc_data.get("ocr_pages", ()))
+    for pg_num, page in enumerate(doc_data["pages"], start= 1):
 
         # Choose chunking strategy
         if strategy == "paragraph":
@@ -171,47 +318,266 @@ def chunk_pdf_by_pages(pdf_path: str,
             page_chunks = chunk_text_simple(page, chunk_size, overlap)
 
         # Add metadata to each chunk
-        for chunk_id, chunk in enumerate(page_chunks):
+        spans = locate_chunks(page, page_chunks)
+        for chunk_id, (chunk, span) in enumerate(zip(page_chunks, spans)):
+            # Section carries over chunks and pages until the next heading
+            headings = [line.strip() for line in chunk.splitlines() if is_heading(line)]
+            lines = chunk.strip().splitlines()
+            if headings and lines and is_heading(lines[0]):
+                section = headings[0]
+
             chunk_info = {
                 "text" : chunk,
                 "page_num": pg_num,
                 "chunk_id" :  f"page{pg_num}_chunk{chunk_id}",
                 "source" : source
             }
-            pdf_info.append(chunk_info)
+            if span:
+                chunk_info["char_start"], chunk_info["char_end"] = span
+            if pg_num in ocr_pages:
+                chunk_info["extraction"] = "ocr"
+            if section:
+                chunk_info["section"] = section
+
+            if child_size:
+                parent_text = page.strip() if config.PARENT_SPAN == "page" else chunk
+                doc_chunks.extend(split_into_children(chunk_info, parent_text, child_size))
+            else:
+                doc_chunks.append(chunk_info)
+
+            if headings:
+                section = headings[-1]
+
+    logger.info(f"Created {len(doc_chunks)} chunks from {doc_data['num_pages']} {doc_data['format']} pages")
+    return doc_chunks
+
+
+def split_into_children(chunk: Dict[str, Any],
+                        parent_text: str,
+                        child_size: int,
+                        overlap: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Split a chunk into small child chunks that point at a parent span
+    
+    Args:
+        chunk: Chunk dict from chunk_pdf_by_pages
+        parent_text: Text returned in place of the children at query time
+        child_size: Target child size (in characters)
+        overlap: Overlap between children (config.CHILD_CHUNK_OVERLAP if None)
+        
+    Returns:
+        list: Child chunk dicts with 'parent_id' and 'parent_text', and
+            'char_start'/'char_end' moved to the child's span in the page
+    """
+    if overlap is None:
+        overlap = config.CHILD_CHUNK_OVERLAP
+
+    parent_key = f"{chunk['source']}-{chunk['page_num']}-{parent_text}"
+    parent_id = hashlib.sha256(parent_key.encode()).hexdigest()
+
+    texts = chunk_text_simple(chunk["text"], child_size, overlap)
+    spans = locate_chunks(chunk["text"], texts)
+
+    children = []
+    for child_num, (text, span) in enumerate(zip(texts, spans)):
+        child = {
+            **chunk,
+            "text": text,
+            "chunk_id": f"{chunk['chunk_id']}_child{child_num}",
+            "parent_id": parent_id,
+            "parent_text": parent_text
+        }
+        child.pop("char_start", None)
+        child.pop("char_end", None)
+        if span and chunk.get("char_start") is not None:
+            child["char_start"] = chunk["char_start"] + span[0]
+            child["char_end"] = chunk["char_start"] + span[1]
+        children.append(child)
+    return children
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Hash a file's contents without reading it into memory at once
+    
+    Args:
+        path: Path to file
+        block_size: Bytes read per iteration
+        
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    logger.info(f"Created {len(pdf_info)} chunks from {pdf_data['num_pages']} pages")
-    return pdf_info
 
+def find_document_by_hash(doc_hash: str, collection: "chromadb.Collection") -> int:
+    """
+    Count chunks already stored for a document with this content hash
+    
+    Args:
+        doc_hash: SHA-256 of the original file
+        collection: ChromaDB collection to search
+        
+    Returns:
+        int: Number of stored chunks (0 if the document is new)
+    """
+    existing = collection.get(where={"doc_hash": doc_hash}, include=[])
+    return len(existing["ids"])
 
-def process_and_store_pdf(
-        pdf_path: str,
-        collection: chromadb.Collection, 
-        chunk_size: int=500, 
-        overlap: int=100,
-        strategy: str = "paragraph"
+
+def make_chunk_id(chunk: Dict[str, Any]) -> str:
+    """
+    Generate the deterministic ChromaDB id for a chunk
+    
+    Args:
+        chunk: Chunk dict with 'text', 'page_num' and 'source'
+        
+    Returns:
+        str: SHA-256 hex id
+    """
+    unique_string = f"{chunk['source']}-{chunk['page_num']}-{chunk['text'][:50]}"
+    return hashlib.sha256(unique_string.encode()).hexdigest()
+
+
+def get_document_hash(source: str, collection: "chromadb.Collection") -> Optional[str]:
+    """
+    Look up the content hash stored for a source document
+    
+    Args:
+        source: Source name the chunks were stored under
+        collection: ChromaDB collection to search
+        
+    Returns:
+        str: doc_hash of the stored document, or None if not stored
+    """
+    existing = collection.get(where={"source": source}, limit=1, include=["metadatas"])
+    if not existing["ids"]:
+        return None
+    return existing["metadatas"][0].get("doc_hash")
+
+
+def delete_document(source: str,
+                    collection: "chromadb.Collection",
+                    batch_size: int = 500
 ) -> int:
     """
-    Complete pipeline: PDF → Chunks → ChromaDB
+    Delete every chunk stored for a source document
+    
+    Chunks are looked up by metadata filter and deleted in batches so
+    large documents do not need all ids in memory at once.
     
     Args:
-        pdf_path: Path to PDF file
-        collection: ChromaDB collection to store chunks
-        chunk_size: Chunk size (only for fixed strategy)
-        overlap: Overlap size (only for fixed strategy)
-        strategy: 'paragraph' (semantic) or 'fixed' (size-based)
+        source: Source name the chunks were stored under
+        collection: ChromaDB collection to delete from
+        batch_size: Number of chunks deleted per call
         
     Returns:
-        int: Number of chunks stored
+        int: Number of chunks deleted
+    """
+    vector_store = embedding_store.collection_store(collection)
+    deleted = 0
+    while True:
+        batch = collection.get(where={"source": source}, limit=batch_size, include=[])
+        if not batch["ids"]:
+            break
+        collection.delete(ids=batch["ids"])
+        if vector_store is not None:
+            vector_store.delete_chunks(collection.name, batch["ids"])
+        deleted += len(batch["ids"])
+
+    chunk_store.mark_stale(collection.name)
+    ann_index.mark_stale(collection.name)
+    exact_index.mark_stale(collection.name)
+    cache.invalidate(collection.name)
+    store = parent_store.get_store(create=False)
+    if store is not None:
+        store.delete_source(collection.name, source)
+
+    logger.info(f"Deleted {deleted} chunks for {source}")
+    return deleted
+
+
+def delete_chunks(ids: List[str],
+                  collection: "chromadb.Collection",
+                  batch_size: int = 500
+) -> int:
+    """
+    Delete chunks by id (e.g. those of a file that was only partly stored)
+    
+    Args:
+        ids: Chunk ids to delete
+        collection: ChromaDB collection to delete from
+        batch_size: Number of chunks deleted per call
         
-    Raises:
-        Exception: If storage fails
+    Returns:
+        int: Number of ids deleted
     """
-    logger.info(f"Processing PDF: {pdf_path}")
+    vector_store = embedding_store.collection_store(collection)
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+        if vector_store is not None:
+            vector_store.delete_chunks(collection.name, ids[start:start + batch_size])
+
+    chunk_store.mark_stale(collection.name)
+    ann_index.mark_stale(collection.name)
+    exact_index.mark_stale(collection.name)
+    cache.invalidate(collection.name)
+
+    logger.info(f"Deleted {len(ids)} chunks")
+    return len(ids)
 
-    # Extract and chunk
-    chunks = chunk_pdf_by_pages(pdf_path, chunk_size, overlap, strategy)
 
+def list_document_ids(source: str,
+                      collection: "chromadb.Collection",
+                      batch_size: int = 500
+) -> List[str]:
+    """
+    List the ids of every chunk stored for a source document
+    
+    Args:
+        source: Source name the chunks were stored under
+        collection: ChromaDB collection to search
+        batch_size: Number of ids fetched per call
+        
+    Returns:
+        list: Chunk ids
+    """
+    ids = []
+    while True:
+        batch = collection.get(where={"source": source}, limit=batch_size, offset=len(ids), include=[])
+        ids.extend(batch["ids"])
+        if len(batch["ids"]) < batch_size:
+            return ids
+
+
+def store_chunks(chunks: List[Dict[str, Any]],
+                 collection: "chromadb.Collection",
+                 metadata: Optional[Dict[str, Any]] = None
+) -> int:
+    """
+    Store chunks produced by chunk_pdf_by_pages in ChromaDB
+    
+    Args:
+        chunks: List of chunk dicts with 'text', 'page_num', 'chunk_id', 'source',
+            optionally 'section', 'char_start'/'char_end', 'extraction',
+            'parent_id'/'parent_text' and 'metadata' (extra metadata for that chunk)
+        collection: ChromaDB collection to store chunks
+        metadata: Extra metadata added to every chunk (e.g. doc_hash)
+
+    Every chunk also records 'ingested_at' (Unix time) so queries can
+    filter on upload time. Parent texts are written once each to the
+    parent store before their children are stored. With
+    EMBEDDING_STORE_ENABLED the vectors are computed (or reused) through
+    the embedding store and the chunks recorded there for re-indexing.
+        
+    Returns:
+        int: Number of chunks stored
+    """
     if not chunks:
         logging.warning("No chunks to store")
         return 0
@@ -220,30 +586,58 @@ def process_and_store_pdf(
     ids = []
     documents = []
     metadatas = []
+    parents = {}
+    ingested_at = int(time.time())
 
     for chunk in chunks:
-        #Generate deterministic ID
-        unique_string = f"{chunk['source']}-{chunk['page_num']}-{chunk['text'][:50]}"
-        doc_id = hashlib.sha256(unique_string.encode()).hexdigest()
-
-        ids.append(doc_id)
+        ids.append(make_chunk_id(chunk))
         documents.append(chunk["text"])
 
         # Store metadata
         meta = {
             "page_num": chunk["page_num"],
             "chunk_id" : chunk["chunk_id"],
-            "source" : chunk["source"]
+            "source" : chunk["source"],
+            "ingested_at": ingested_at
         }
+        if chunk.get("section"):
+            meta["section"] = chunk["section"]
+        if chunk.get("char_start") is not None:
+            meta["char_start"] = chunk["char_start"]
+            meta["char_end"] = chunk["char_end"]
+        if chunk.get("extraction"):
+            meta["extraction"] = chunk["extraction"]
+        if chunk.get("parent_id"):
+            meta["parent_id"] = chunk["parent_id"]
+            parents[chunk["parent_id"]] = (chunk["source"], chunk["parent_text"])
+        if metadata:
+            meta.update(metadata)
+        if chunk.get("metadata"):
+            meta.update(chunk["metadata"])
         metadatas.append(meta)
         
     # Store in ChromaDB
     try:
+        if parents:
+            parent_store.get_store().put_many(collection.name, parents)
+
+        vectors = None
+        store = embedding_store.collection_store(collection)
+        if store is not None:
+            vectors = embedding_store.embed_documents(store, collection, documents)
+
         collection.upsert(
             ids = ids,
             documents = documents,
-            metadatas = metadatas
+            metadatas = metadatas,
+            embeddings = vectors
         )
+        if store is not None:
+            store.put_chunks(collection.name, ids, documents, metadatas)
+        chunk_store.mark_stale(collection.name)
+        ann_index.mark_stale(collection.name)
+        exact_index.mark_stale(collection.name)
+        cache.invalidate(collection.name)
         logger.info(f"Successfully stored {len(chunks)} chunks")
         return len(chunks)
 
@@ -252,11 +646,130 @@ def process_and_store_pdf(
         return 0
 
 
+def replace_document(source: str,
+                     chunks: List[Dict[str, Any]],
+                     collection: "chromadb.Collection",
+                     metadata: Optional[Dict[str, Any]] = None,
+                     batch_size: int = 500
+) -> int:
+    """
+    Replace a source document's chunks with a new set
+    
+    New chunks are stored first and only then are the old chunks that
+    were not re-used deleted, so queries never see the document missing.
+    If storing fails the old chunks are left untouched.
+    
+    Args:
+        source: Source name the chunks are stored under
+        chunks: New chunks (their 'source' must equal source)
+        collection: ChromaDB collection to update
+        metadata: Extra metadata added to every new chunk
+        batch_size: Number of chunks deleted per call
+        
+    Returns:
+        int: Number of chunks stored
+    """
+    old_ids = set(list_document_ids(source, collection, batch_size))
+
+    num_stored = store_chunks(chunks, collection, metadata)
+    if num_stored == 0:
+        return 0
+
+    stale = sorted(old_ids - {make_chunk_id(chunk) for chunk in chunks})
+    vector_store = embedding_store.collection_store(collection)
+    for start in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[start:start + batch_size])
+        if vector_store is not None:
+            vector_store.delete_chunks(collection.name, stale[start:start + batch_size])
+    chunk_store.mark_stale(collection.name)
+    ann_index.mark_stale(collection.name)
+    exact_index.mark_stale(collection.name)
+    cache.invalidate(collection.name)
+
+    store = parent_store.get_store(create=False)
+    if store is not None:
+        store.delete_source(collection.name, source, keep={chunk.get("parent_id") for chunk in chunks})
+
+    logger.info(f"Replaced {source}: {num_stored} chunks stored, {len(stale)} stale chunks deleted")
+    return num_stored
+
+
+def process_and_store_pdf(
+        pdf_path: str,
+        collection: "chromadb.Collection", 
+        chunk_size: int=500, 
+        overlap: int=100,
+        strategy: str = "paragraph",
+        source: Optional[str] = None
+) -> int:
+    """
+    Complete pipeline: PDF → Chunks → ChromaDB
+    
+    Args:
+        pdf_path: Path to PDF file
+        collection: ChromaDB collection to store chunks
+        chunk_size: Chunk size (only for fixed strategy)
+        overlap: Overlap size (only for fixed strategy)
+        strategy: 'paragraph' (semantic) or 'fixed' (size-based)
+        source: Source name for citations (defaults to the file name)
+        
+    Returns:
+        int: Number of chunks stored
+        
+    Raises:
+        Exception: If storage fails
+    """
+    logger.info(f"Processing PDF: {pdf_path}")
+
+    # Extract and chunk
+    chunks = chunk_pdf_by_pages(pdf_path, chunk_size, overlap, strategy, source)
+
+    return store_chunks(chunks, collection, {"doc_hash": file_sha256(pdf_path)})
+
+
+def process_and_store_document(
+        path: str,
+        collection: "chromadb.Collection",
+        chunk_size: int=500,
+        overlap: int=100,
+        strategy: str = "paragraph",
+        source: Optional[str] = None,
+        file_format: Optional[str] = None
+) -> int:
+    """
+    Complete pipeline for any supported format: Document → Chunks → ChromaDB
+
+    Args:
+        path: Path to the document
+        collection: ChromaDB collection to store chunks
+        chunk_size: Chunk size (only for fixed strategy)
+        overlap: Overlap size (only for fixed strategy)
+        strategy: 'paragraph' (semantic) or 'fixed' (size-based)
+        source: Source name for citations (defaults to the file name)
+        file_format: Loader format name; detected from the content if None
+
+    Returns:
+        int: Number of chunks stored
+
+    Raises:
+        UnsupportedFormat: If the document's format is not supported
+    """
+    logger.info(f"Processing document: {path}")
+
+    chunks = chunk_document(path, chunk_size, overlap, strategy, source, file_format=file_format)
+
+    return store_chunks(chunks, collection, {"doc_hash": file_sha256(path)})
+
+
 
 # Test PDF functions
 
 if __name__ == "__main__":
     """Test document processing pipeline"""
+    import chromadb
+    from src import config
+
+    config.setup_logging()
     
     pdf_path = "test_document.pdf"
     
@@ -293,7 +806,7 @@ if __name__ == "__main__":
     
     # Create ChromaDB
     client = chromadb.Client()
-    collection = client.create_collection(name="ml_documents")
+    collection = embeddings.open_collection(client, "ml_documents", create=True)
     
     # Store with paragraph chunking (recommended)
     num_stored = process_and_store_pdf(
@@ -0,0 +1,616 @@
+"""
+Embedding Store Module
+
+Keeps a copy of every embedding outside ChromaDB so a collection can be
+rebuilt (new distance metric, new HNSW parameters, new collection name)
+from stored vectors and text, without re-reading PDFs or running the
+embedding model.
+
+Layout of a store directory (one per embedding model):
+    vectors.f32        float32 rows, append-only, memory-mapped for reads
+    hashes.bin         32-byte SHA-256 of the chunk text per row
+    manifest.json      model id and vector dimension
+    chunks.sqlite3     chunk id, text, metadata and content hash per collection
+
+Vectors are keyed by content hash + model, so identical text is embedded
+once across documents and collections, and re-ingesting an unchanged
+document does not call the model at all. Vectors are never removed: the
+file is a cache and rows of deleted chunks are simply no longer referenced.
+
+Several processes (API workers, the watcher, the ingest CLI) may append
+to one store: appends hold an exclusive flock on store.lock and take
+their row numbers from the file size under it, never from a count kept
+in memory, and each process picks up rows appended by others from
+hashes.bin before looking a hash up or appending.
+
+Usage:
+    python -m src.embedding_store reindex --collection ml_documents --space cosine
+    python -m src.embedding_store reindex --collection ml_documents --target ml_documents_v2
+    python -m src.embedding_store stats
+
+Enable with EMBEDDING_STORE_ENABLED=true before ingesting. Run reindex
+while the API is stopped.
+"""
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from src import config
+
+# numpy and chromadb are imported on first use so the write paths in
+# document_processor can import this module cheaply
+if TYPE_CHECKING:
+    import chromadb
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 32
+
+
+
+def content_hash(text: str) -> bytes:
+    """
+    SHA-256 digest of a chunk's text
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def model_dir_name(model_id: str) -> str:
+    """
+    Directory name for a model id (which may contain '/' or ':')
+    """
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_id)
+
+
+
+class EmbeddingStore:
+    """
+    Append-only vector file plus chunk table for one embedding model
+
+    Args:
+        path: Store directory
+        model_id: Embedding model the vectors come from
+    """
+
+    def __init__(self, path: str, model_id: str):
+        self.path = path
+        self.model_id = model_id
+        os.makedirs(path, exist_ok=True)
+
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._hashes_path = os.path.join(path, "hashes.bin")
+        self._manifest_path = os.path.join(path, "manifest.json")
+        self._lock_path = os.path.join(path, "store.lock")
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._num_rows = 0
+        self._matrix = None
+
+        with self._file_lock():
+            self._read_manifest()
+            self._truncate_partial()
+            self._sync()
+
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " collection TEXT NOT NULL,"
+            " chunk_id TEXT NOT NULL,"
+            " content_hash BLOB NOT NULL,"
+            " text BLOB NOT NULL,"
+            " metadata TEXT NOT NULL,"
+            " PRIMARY KEY (collection, chunk_id))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        # flock is per open file, so it also serialises threads of one
+        # process that hold separate descriptors
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+    def _read_manifest(self) -> None:
+        if self.dim is not None or not os.path.exists(self._manifest_path):
+            return
+        with open(self._manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["model"] != self.model_id:
+            raise ValueError(f"Embedding store at {self.path} holds {manifest['model']}, not {self.model_id}")
+        self.dim = manifest["dim"]
+
+
+    def _rows_on_disk(self) -> int:
+        if self.dim is None or not all(map(os.path.exists, (self._vectors_path, self._hashes_path))):
+            return 0
+        # Only rows complete in both files count
+        return min(os.path.getsize(self._vectors_path) // (4 * self.dim),
+                   os.path.getsize(self._hashes_path) // HASH_SIZE)
+
+
+    def _truncate_partial(self) -> None:
+        # A write interrupted between the two files (a crash; appends are
+        # locked) leaves extra bytes in one of them. Caller holds the lock.
+        num_rows = self._rows_on_disk()
+        if num_rows == 0 and self.dim is None:
+            return
+        for path, row_size in ((self._vectors_path, 4 * self.dim), (self._hashes_path, HASH_SIZE)):
+            if os.path.exists(path) and os.path.getsize(path) > num_rows * row_size:
+                with open(path, "r+b") as f:
+                    f.truncate(num_rows * row_size)
+
+
+    def _sync(self) -> None:
+        """
+        Index rows appended (by any process) since the last sync
+        """
+        self._read_manifest()
+        num_rows = self._rows_on_disk()
+        if num_rows <= self._num_rows:
+            return
+        with open(self._hashes_path, "rb") as f:
+            f.seek(self._num_rows * HASH_SIZE)
+            hashes = f.read((num_rows - self._num_rows) * HASH_SIZE)
+        for offset in range(0, len(hashes), HASH_SIZE):
+            self._rows.setdefault(hashes[offset:offset + HASH_SIZE], self._num_rows + offset // HASH_SIZE)
+        self._num_rows = num_rows
+
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+    def _vectors(self) -> "np.ndarray":
+        import numpy as np
+
+        if self._matrix is None or len(self._matrix) < self._num_rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._num_rows, self.dim))
+        return self._matrix
+
+
+    def get_vectors(self, hashes: List[bytes]) -> List[Optional["np.ndarray"]]:
+        """
+        Stored vectors for content hashes
+
+        Returns:
+            list: float32 vector per hash, None where it is not stored
+        """
+        import numpy as np
+
+        with self._lock:
+            if any(digest not in self._rows for digest in hashes):
+                with self._file_lock(exclusive=False):
+                    self._sync()
+            rows = [self._rows.get(digest) for digest in hashes]
+            if not any(row is not None for row in rows):
+                return [None] * len(hashes)
+            matrix = self._vectors()
+            return [None if row is None else np.array(matrix[row]) for row in rows]
+
+
+    def put_vectors(self, hashes: List[bytes], vectors: "np.ndarray") -> int:
+        """
+        Append vectors whose content hash is not stored yet
+
+        Args:
+            hashes: Content hash per vector
+            vectors: float32 array (len(hashes), dim)
+
+        Returns:
+            int: Number of vectors appended
+        """
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._manifest_path, "w") as f:
+                    json.dump({"model": self.model_id, "dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors for {self.model_id}, got {vectors.shape[1]}")
+
+            new_rows = {}
+            for i, digest in enumerate(hashes):
+                if digest not in self._rows and digest not in new_rows:
+                    new_rows[digest] = i
+            if not new_rows:
+                return 0
+
+            # Row numbers come from the files, which no one else can grow
+            # while the lock is held
+            self._truncate_partial()
+            first_row = self._rows_on_disk()
+
+            # Vectors first: rows only count once their hash is written too
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors[list(new_rows.values())].tobytes())
+            with open(self._hashes_path, "ab") as f:
+                f.write(b"".join(new_rows))
+
+            for row, digest in enumerate(new_rows, start=first_row):
+                self._rows[digest] = row
+            self._num_rows = first_row + len(new_rows)
+            return len(new_rows)
+
+
+    def put_chunks(self,
+                   collection: str,
+                   ids: List[str],
+                   documents: List[str],
+                   metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Record the chunks of a collection, replacing existing ids
+        """
+        rows = [
+            (collection, chunk_id, content_hash(document),
+             zlib.compress(document.encode("utf-8")), json.dumps(meta, separators=(",", ":")))
+            for chunk_id, document, meta in zip(ids, documents, metadatas)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+
+    def delete_chunks(self, collection: str, ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE collection = ? AND chunk_id = ?",
+                [(collection, chunk_id) for chunk_id in ids]
+            )
+            self._conn.commit()
+
+
+    def delete_collection(self, collection: str) -> None:
+        """
+        Forget every chunk recorded for a collection (vectors are shared and kept)
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._conn.commit()
+
+
+    def copy_chunks(self, collection: str, target: str) -> None:
+        """
+        Record a collection's chunks under another collection name,
+        replacing any the target had
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (target,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks"
+                " SELECT ?, chunk_id, content_hash, text, metadata FROM chunks WHERE collection = ?",
+                (target, collection)
+            )
+            self._conn.commit()
+
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+
+    def collections(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT collection, COUNT(*) FROM chunks GROUP BY collection"))
+
+
+    def iter_chunks(self,
+                    collection: str,
+                    batch_size: int = 1000
+    ) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]], "np.ndarray"]]:
+        """
+        Stored chunks of a collection in batches
+
+        Yields:
+            tuple: (ids, documents, metadatas, vectors) per batch
+
+        Raises:
+            KeyError: If a chunk's vector is missing from the store
+        """
+        import numpy as np
+
+        last_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT chunk_id, content_hash, text, metadata FROM chunks"
+                    " WHERE collection = ? AND chunk_id > ? ORDER BY chunk_id LIMIT ?",
+                    (collection, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+
+            vectors = self.get_vectors([bytes(row[1]) for row in rows])
+            missing = [row[0] for row, vector in zip(rows, vectors) if vector is None]
+            if missing:
+                raise KeyError(f"No stored vector for chunks {missing[:5]} of {collection}")
+
+            yield (
+                [row[0] for row in rows],
+                [zlib.decompress(row[2]).decode("utf-8") for row in rows],
+                [json.loads(row[3]) for row in rows],
+                np.stack(vectors)
+            )
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def store_path(model_id: str, store_dir: Optional[str] = None) -> str:
+    return os.path.join(store_dir or config.EMBEDDING_STORE_DIR, model_dir_name(model_id))
+
+
+def get_store(model_id: str, store_dir: Optional[str] = None) -> EmbeddingStore:
+    """
+    Shared store for an embedding model
+
+    Args:
+        model_id: Embedding model id
+        store_dir: Parent directory (config.EMBEDDING_STORE_DIR by default)
+
+    Returns:
+        EmbeddingStore
+    """
+    path = store_path(model_id, store_dir)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = EmbeddingStore(path, model_id)
+            _stores[path] = store
+            logger.info(f"Opened embedding store for {model_id} at {path} ({len(store)} vectors)")
+        return store
+
+
+def collection_store(collection: "chromadb.Collection") -> Optional[EmbeddingStore]:
+    """
+    Store for a collection's model, if embedding persistence is enabled
+    """
+    if not config.EMBEDDING_STORE_ENABLED:
+        return None
+
+    from src import embeddings
+    model_id = embeddings.stored_model_id(collection)
+    if model_id is None:
+        return None
+    return get_store(model_id)
+
+
+def embed_documents(store: EmbeddingStore,
+                    collection: "chromadb.Collection",
+                    documents: List[str]
+) -> "np.ndarray":
+    """
+    Embed chunk texts, reusing stored vectors and storing new ones
+
+    Args:
+        store: Embedding store of the collection's model
+        collection: Collection whose embedding function computes new vectors
+        documents: Chunk texts
+
+    Returns:
+        np.ndarray: float32 array (len(documents), dim)
+    """
+    import numpy as np
+    from src import embeddings
+
+    hashes = [content_hash(document) for document in documents]
+    vectors = store.get_vectors(hashes)
+
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = np.asarray(embeddings.embed_texts(collection, [documents[i] for i in missing]), dtype=np.float32)
+        store.put_vectors([hashes[i] for i in missing], computed)
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+
+    logger.debug(f"Embedded {len(missing)} of {len(documents)} chunks, {len(documents) - len(missing)} reused")
+    return np.stack(vectors)
+
+
+
+def reindex(client: Any,
+            collection_name: str,
+            target: Optional[str] = None,
+            space: Optional[str] = None,
+            hnsw: Optional[Dict[str, int]] = None,
+            embedding_function: Optional[Any] = None,
+            store_dir: Optional[str] = None,
+            batch_size: int = 1000,
+            force: bool = False
+) -> int:
+    """
+    Rebuild a collection from stored embeddings and text
+
+    The new collection is filled under a temporary name. When target is
+    the collection itself, the old collection is then dropped and the new
+    one renamed, so the database never holds a half-built collection
+    under the real name. The collection's metadata is carried over.
+
+    Only chunks in the store are rebuilt, so chunks ingested before the
+    store was enabled would be lost: unless forced, the rebuild is
+    refused when the store and the collection disagree on the count.
+
+    Args:
+        client: ChromaDB client
+        collection_name: Collection whose stored chunks are used
+        target: Name of the rebuilt collection (collection_name by default)
+        space: HNSW distance ('l2', 'cosine' or 'ip'); unchanged if None
+        hnsw: Other HNSW parameters, e.g. {'ef_construction': 200, 'max_neighbors': 32}
+        embedding_function: Override the configured embedding function
+        store_dir: Embedding store directory (config default if None)
+        batch_size: Chunks added per call
+        force: Rebuild even if the collection holds chunks the store lacks
+
+    Returns:
+        int: Number of chunks written
+
+    Raises:
+        ValueError: If nothing is stored for the collection, or the store
+            does not cover the collection and force is not set
+    """
+    from chromadb.errors import NotFoundError
+    from src import ann_index, cache, chunk_store, embeddings, exact_index, parent_store
+
+    embedding_function = embedding_function or embeddings.get_embedding_function()
+    model_id = embeddings.model_id(embedding_function)
+    store = get_store(model_id, store_dir)
+    target = target or collection_name
+
+    if store.count(collection_name) == 0:
+        raise ValueError(f"No stored embeddings for {collection_name} with model {model_id}")
+
+    hnsw_config = dict(hnsw or {})
+    metadata = {}
+    try:
+        existing = client.get_collection(name=collection_name)
+        hnsw_config = {**{"space": embeddings.collection_space(existing)}, **hnsw_config}
+        # Legacy hnsw:* keys would conflict with the configuration
+        metadata = {key: value for key, value in (existing.metadata or {}).items() if not key.startswith("hnsw:")}
+        stored, indexed = store.count(collection_name), existing.count()
+        if stored != indexed and not force:
+            raise ValueError(
+                f"Embedding store holds {stored} chunks of {collection_name} but the collection has {indexed}; "
+                f"re-indexing would drop the difference (re-ingest, or force to rebuild anyway)"
+            )
+    except NotFoundError:
+        pass
+    if space:
+        hnsw_config["space"] = space
+
+    building = f"{target}-reindex"
+    try:
+        client.delete_collection(name=building)
+    except NotFoundError:
+        pass
+
+    collection = client.create_collection(
+        name=building,
+        embedding_function=embedding_function,
+        metadata={**metadata, "embedding_model": model_id},
+        configuration={"hnsw": hnsw_config}
+    )
+
+    written = 0
+    for ids, documents, metadatas, vectors in store.iter_chunks(collection_name, batch_size):
+        collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+        written += len(ids)
+
+    try:
+        client.delete_collection(name=target)
+    except NotFoundError:
+        pass
+    collection.modify(name=target)
+
+    if target != collection_name:
+        store.copy_chunks(collection_name, target)
+        parents = parent_store.get_store(create=False)
+        if parents is not None:
+            parents.copy_collection(collection_name, target)
+
+    # Indexes, chunk stores and cached answers of the target describe the old collection
+    chunk_store.mark_stale(target)
+    ann_index.mark_stale(target)
+    exact_index.mark_stale(target)
+    cache.invalidate(target)
+
+    logger.info(f"Reindexed {collection_name} into {target}: {written} chunks, hnsw {hnsw_config}")
+    return written
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Stored embeddings and re-indexing")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reindex_parser = subparsers.add_parser("reindex", help="Rebuild a collection from stored embeddings")
+    reindex_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    reindex_parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    reindex_parser.add_argument("--target", default=None, help="New collection name (rebuild in place if omitted)")
+    reindex_parser.add_argument("--store-dir", default=config.EMBEDDING_STORE_DIR)
+    reindex_parser.add_argument("--space", choices=("l2", "cosine", "ip"), default=None)
+    reindex_parser.add_argument("--ef-construction", type=int, default=None)
+    reindex_parser.add_argument("--ef-search", type=int, default=None)
+    reindex_parser.add_argument("--max-neighbors", type=int, default=None)
+    reindex_parser.add_argument("--force", action="store_true",
+                                help="Rebuild even if the collection holds chunks missing from the store")
+
+    stats_parser = subparsers.add_parser("stats", help="Stored vectors and chunks per collection")
+    stats_parser.add_argument("--store-dir", default=config.EMBEDDING_STORE_DIR)
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    if args.command == "reindex":
+        import chromadb
+        client = chromadb.PersistentClient(path=args.db_path)
+        hnsw = {
+            key: value for key, value in (
+                ("ef_construction", args.ef_construction),
+                ("ef_search", args.ef_search),
+                ("max_neighbors", args.max_neighbors)
+            )
+            if value is not None
+        }
+        written = reindex(client, args.collection, args.target, args.space, hnsw, store_dir=args.store_dir,
+                          force=args.force)
+        print(f"{args.target or args.collection}: {written} chunks re-indexed")
+
+    elif args.command == "stats":
+        if not os.path.isdir(args.store_dir):
+            print(f"No embedding store at {args.store_dir}")
+            return 0
+        for name in sorted(os.listdir(args.store_dir)):
+            manifest_path = os.path.join(args.store_dir, name, "manifest.json")
+            if not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                model_id = json.load(f)["model"]
+            store = get_store(model_id, args.store_dir)
+            print(f"{model_id}: {len(store)} vectors, dim {store.dim}")
+            for collection, count in sorted(store.collections().items()):
+                print(f"  {collection}: {count} chunks")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
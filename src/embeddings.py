@@ -0,0 +1,331 @@
+"""
+Embeddings Module
+
+Embedding provider layer: every collection is opened with the embedding
+function configured here (model, batch size, ONNX threads), so ingestion
+and queries embed text the same way. The model id is recorded in the
+collection metadata and a collection is refused if it was built with a
+different model, so vectors from two models are never mixed.
+
+Also has helpers for working with a collection's embeddings outside of
+collection.query, e.g. to search a local index.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from src import cache
+from src import config
+from src.batcher import MicroBatcher
+
+if TYPE_CHECKING:
+    import chromadb
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# Embedding function names ChromaDB persists for its built-in MiniLM model
+CHROMA_DEFAULT_FUNCTIONS = ("default", "onnx_mini_lm_l6_v2")
+
+_embedding_function = None
+_embedding_function_lock = threading.Lock()
+
+# Embedding function per collection id, as bound by open_collection
+_collection_functions: Dict[str, Any] = {}
+_collection_functions_lock = threading.Lock()
+
+_query_batchers: Dict[str, MicroBatcher] = {}
+_query_batchers_lock = threading.Lock()
+
+
+
+class EmbeddingModelMismatch(Exception):
+    """
+    Raised when a collection was built with a different embedding model
+    """
+
+    def __init__(self, collection: str, stored: str, configured: str):
+        super().__init__(
+            f"Collection {collection} was embedded with {stored}, "
+            f"but the configured model is {configured}"
+        )
+        self.collection = collection
+        self.stored = stored
+        self.configured = configured
+
+
+
+def get_embedding_function() -> Any:
+    """
+    Shared embedding function built from config (EMBEDDING_* settings)
+
+    Returns:
+        OnnxEmbeddingFunction
+
+    Raises:
+        ValueError: If EMBEDDING_MODEL names another model than ChromaDB's
+            MiniLM but EMBEDDING_MODEL_PATH is not set (MiniLM would be
+            loaded and recorded under the wrong id)
+    """
+    global _embedding_function
+
+    with _embedding_function_lock:
+        if _embedding_function is None:
+            from src.onnx_embeddings import DEFAULT_MODEL_ID, OnnxEmbeddingFunction
+
+            if config.EMBEDDING_MODEL != DEFAULT_MODEL_ID and not config.EMBEDDING_MODEL_PATH:
+                raise ValueError(
+                    f"EMBEDDING_MODEL={config.EMBEDDING_MODEL} needs EMBEDDING_MODEL_PATH "
+                    f"(a directory with model.onnx and tokenizer.json)"
+                )
+
+            _embedding_function = OnnxEmbeddingFunction(
+                model_id=config.EMBEDDING_MODEL,
+                model_path=config.EMBEDDING_MODEL_PATH or None,
+                batch_size=config.EMBEDDING_BATCH_SIZE,
+                threads=config.EMBEDDING_THREADS,
+                max_tokens=config.EMBEDDING_MAX_TOKENS
+            )
+        return _embedding_function
+
+
+def model_id(embedding_function: Any) -> str:
+    """
+    Identifier of the model behind an embedding function
+    """
+    return getattr(embedding_function, "model_id", None) or embedding_function.name()
+
+
+def stored_model_id(collection: "chromadb.Collection") -> Optional[str]:
+    """
+    Model a collection's vectors were built with
+
+    Collections created before the model was recorded fall back to the
+    embedding function ChromaDB persisted for them.
+
+    Returns:
+        str: Model id, or None if it cannot be told
+    """
+    recorded = (collection.metadata or {}).get("embedding_model")
+    if recorded:
+        return recorded
+
+    persisted = collection.configuration.get("embedding_function")
+    if persisted is None:
+        return None
+    if persisted.name() in CHROMA_DEFAULT_FUNCTIONS:
+        from src.onnx_embeddings import DEFAULT_MODEL_ID
+        return DEFAULT_MODEL_ID
+    return model_id(persisted)
+
+
+def open_collection(client: Any,
+                    name: str,
+                    create: bool = False,
+                    embedding_function: Optional[Any] = None
+) -> Optional["chromadb.Collection"]:
+    """
+    Open (or create) a collection bound to the configured embedding function
+
+    Args:
+        client: ChromaDB client
+        name: Collection name
+        create: Create the collection if it does not exist
+        embedding_function: Override the configured embedding function
+
+    Returns:
+        Collection, or None if it does not exist and create is False
+
+    Raises:
+        EmbeddingModelMismatch: If the collection was built with another model
+    """
+    from chromadb.errors import NotFoundError
+
+    embedding_function = embedding_function or get_embedding_function()
+    configured = model_id(embedding_function)
+
+    try:
+        collection = client.get_collection(name=name, embedding_function=embedding_function)
+    except NotFoundError:
+        if not create:
+            return None
+        collection = client.create_collection(
+            name=name,
+            embedding_function=embedding_function,
+            metadata={"embedding_model": configured}
+        )
+        logger.info(f"Created collection {name} with embedding model {configured}")
+        bind_embedding_function(collection, embedding_function)
+        return collection
+    except ValueError as e:
+        # ChromaDB refuses a different embedding function than the one it
+        # persisted; open with the persisted one and compare models below
+        if "conflict" not in str(e).lower():
+            raise
+        collection = client.get_collection(name=name)
+
+    stored = stored_model_id(collection)
+    if stored is not None and stored != configured:
+        raise EmbeddingModelMismatch(name, stored, configured)
+    bind_embedding_function(collection, embedding_function)
+    return collection
+
+
+def bind_embedding_function(collection: "chromadb.Collection", embedding_function: Any) -> None:
+    """
+    Record the embedding function texts for a collection are embedded with
+    """
+    with _collection_functions_lock:
+        _collection_functions[str(collection.id)] = embedding_function
+
+
+def collection_embedding_function(collection: "chromadb.Collection") -> Any:
+    """
+    Embedding function of a collection
+
+    The one open_collection bound it to; for a collection opened
+    elsewhere, the one ChromaDB persisted for it (built once, then bound).
+
+    Raises:
+        ValueError: If the collection has no usable embedding function
+    """
+    key = str(collection.id)
+    with _collection_functions_lock:
+        function = _collection_functions.get(key)
+    if function is not None:
+        return function
+
+    function = collection.configuration.get("embedding_function")
+    if function is None:
+        raise ValueError(f"Collection {collection.name} has no embedding function")
+    bind_embedding_function(collection, function)
+    return function
+
+
+def embed_texts(collection: "chromadb.Collection", texts: List[str], is_query: bool = False) -> List[Any]:
+    """
+    Embed texts with a collection's embedding function
+
+    Args:
+        collection: ChromaDB collection
+        texts: Texts to embed
+        is_query: Embed as queries (models with a query prompt use it)
+
+    Returns:
+        list: One embedding per text
+    """
+    function = collection_embedding_function(collection)
+    if is_query and hasattr(function, "embed_query"):
+        return list(function.embed_query(input=texts))
+    return list(function(texts))
+
+
+
+def collection_space(collection: "chromadb.Collection") -> str:
+    """
+    Distance function of a collection's vector index
+
+    Args:
+        collection: ChromaDB collection
+
+    Returns:
+        str: 'l2' (ChromaDB's default), 'cosine' or 'ip'
+    """
+    try:
+        return (collection.configuration.get("hnsw") or {}).get("space", "l2")
+    except Exception:
+        return "l2"
+
+
+def embed_queries(collection: "chromadb.Collection", texts: List[str]) -> "np.ndarray":
+    """
+    Embed query texts with the collection's own embedding function
+
+    Texts found in the query embedding cache (see src.cache) are not
+    embedded again. A single question is routed through the model's query
+    micro-batcher (see query_batcher) so concurrent requests share one
+    model call.
+
+    Args:
+        collection: ChromaDB collection
+        texts: Query texts
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dim)
+    """
+    import numpy as np
+
+    model = stored_model_id(collection) or collection.name
+    vectors = cache.get_embeddings(model, texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if not missing:
+        return np.asarray(vectors, dtype=np.float32)
+
+    pending = [texts[i] for i in missing]
+    if len(pending) == 1 and config.QUERY_BATCH_WINDOW_MS > 0:
+        computed = np.asarray([query_batcher(collection).submit(pending[0])], dtype=np.float32)
+    else:
+        computed = np.asarray(embed_texts(collection, pending, is_query=True), dtype=np.float32)
+
+    cache.set_embeddings(model, pending, computed)
+    for i, vector in zip(missing, computed):
+        vectors[i] = vector
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def query_batcher(collection: "chromadb.Collection") -> MicroBatcher:
+    """
+    Micro-batcher for query embeddings, shared by collections of one model
+
+    Args:
+        collection: ChromaDB collection whose embedding function is used
+
+    Returns:
+        MicroBatcher
+    """
+    key = stored_model_id(collection) or collection.name
+    with _query_batchers_lock:
+        batcher = _query_batchers.get(key)
+        if batcher is None:
+            batcher = MicroBatcher(
+                lambda texts: embed_texts(collection, texts, is_query=True),
+                window_ms=config.QUERY_BATCH_WINDOW_MS,
+                max_batch=config.QUERY_BATCH_MAX,
+                name=f"query-embed-{key}"
+            )
+            _query_batchers[key] = batcher
+        return batcher
+
+
+def batcher_metrics() -> Dict[str, Any]:
+    """
+    Batch size and queueing metrics per query batcher
+    """
+    with _query_batchers_lock:
+        return {key: batcher.snapshot() for key, batcher in _query_batchers.items()}
+
+
+def distance(vectors: "np.ndarray", query: "np.ndarray", space: str = "l2") -> "np.ndarray":
+    """
+    ChromaDB-compatible distances between rows of vectors and a query
+
+    Args:
+        vectors: float32 array (n, dim)
+        query: float32 array (dim,)
+        space: 'l2' (squared L2), 'cosine' or 'ip'
+
+    Returns:
+        np.ndarray: float32 distances (n,)
+    """
+    import numpy as np
+
+    if space == "ip":
+        return 1.0 - vectors @ query
+    if space == "cosine":
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        return 1.0 - (vectors @ query) / np.where(norms == 0, 1.0, norms)
+
+    diff = vectors - query
+    return np.einsum("ij,ij->i", diff, diff)
@@ -0,0 +1,291 @@
+"""
+Exact Index Module
+
+Brute-force search for small collections. Below a size threshold the
+whole collection fits in one contiguous float32 matrix, and a single
+matrix product + argpartition is faster than a round trip through
+ChromaDB's HNSW index - and exact.
+
+The matrix holds L2-normalised rows plus the original norms, so squared
+L2, cosine and inner-product distances all come out of the same matmul
+and match the distances ChromaDB reports.
+
+A matrix is tied to the collection's write generation (cache.generation)
+at load time and reloaded once the generation moves on, so writes from
+any process sharing the cache backend are seen on the next query.
+Without a shared backend, writes in other processes are noticed by a
+size check every EXACT_SEARCH_REFRESH_SECONDS.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src import cache
+from src import config
+from src import embeddings
+from src.batcher import MicroBatcher
+
+if TYPE_CHECKING:
+    import chromadb
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+
+class ExactIndex:
+    """
+    In-memory normalised embedding matrix of one collection
+    """
+
+    def __init__(self,
+                 ids: List[str],
+                 vectors: "np.ndarray",
+                 space: str = "l2",
+                 generation: Optional[int] = None
+    ):
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+
+        self.ids = ids
+        self.space = space
+        self.norms = norms.astype(np.float32)
+        self.matrix = vectors / np.where(norms == 0, 1.0, norms)[:, None]
+        self.built_at = time.time()
+        self.generation = generation
+
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+    def search_batch(self, queries: "np.ndarray", k: int) -> List[Tuple[List[str], List[float], "np.ndarray"]]:
+        """
+        Exact nearest neighbours of several queries at once
+
+        All distances come from one (m, dim) x (dim, n) matrix product and
+        the top k of every row from one argpartition.
+
+        Args:
+            queries: float32 query embeddings (m, dim)
+            k: Number of results per query
+
+        Returns:
+            list: (chunk ids, distances, float32 embeddings) per query,
+                closest first
+        """
+        import numpy as np
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self.ids))
+        if k == 0:
+            return [([], [], np.empty((0, queries.shape[1]), dtype=np.float32)) for _ in queries]
+
+        cosines = queries @ self.matrix.T
+        query_norms = np.linalg.norm(queries, axis=1)[:, None]
+
+        if self.space == "cosine":
+            distances = 1.0 - cosines / np.where(query_norms == 0, 1.0, query_norms)
+        elif self.space == "ip":
+            distances = 1.0 - cosines * self.norms
+        else:
+            distances = self.norms ** 2 + query_norms ** 2 - 2.0 * cosines * self.norms
+            np.maximum(distances, 0.0, out=distances)
+
+        if k < len(self.ids):
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(self.ids)), (len(queries), 1))
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.take_along_axis(top, np.argsort(top_distances, axis=1), axis=1)
+
+        results = []
+        for row, rows in enumerate(order):
+            results.append((
+                [self.ids[i] for i in rows],
+                [float(d) for d in distances[row, rows]],
+                self.matrix[rows] * self.norms[rows, None]
+            ))
+        return results
+
+
+    def search(self, query: "np.ndarray", k: int) -> Tuple[List[str], List[float], "np.ndarray"]:
+        """
+        Exact nearest neighbours of one query (see search_batch)
+        """
+        return self.search_batch(query[None, :], k)[0]
+
+
+
+def _search_items(items: List[Tuple["ExactIndex", "np.ndarray", int]]) -> List[Tuple[List[str], List[float], "np.ndarray"]]:
+    # Queries against the same matrix share one search_batch call; each
+    # gets its own k from the largest requested
+    import numpy as np
+
+    results: List[Optional[tuple]] = [None] * len(items)
+    groups: Dict[int, List[int]] = {}
+    for i, (index, _, _) in enumerate(items):
+        groups.setdefault(id(index), []).append(i)
+
+    for positions in groups.values():
+        index = items[positions[0]][0]
+        k = max(items[i][2] for i in positions)
+        batch = index.search_batch(np.stack([items[i][1] for i in positions]), k)
+        for i, (ids, distances, vectors) in zip(positions, batch):
+            n = items[i][2]
+            results[i] = (ids[:n], distances[:n], vectors[:n])
+    return results
+
+
+def search(index: ExactIndex, query: "np.ndarray", k: int) -> Tuple[List[str], List[float], "np.ndarray"]:
+    """
+    Search an index, batched with concurrent queries
+
+    A query is handed to the search micro-batcher (same window as query
+    embedding, config.QUERY_BATCH_WINDOW_MS), so queries arriving
+    together are answered by one search_batch matmul per index.
+    """
+    if config.QUERY_BATCH_WINDOW_MS <= 0:
+        return index.search(query, k)
+    return search_batcher().submit((index, query, k))
+
+
+def search_batcher() -> MicroBatcher:
+    """
+    Micro-batcher for exact searches of this process
+    """
+    global _batcher
+
+    with _lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                _search_items,
+                window_ms=config.QUERY_BATCH_WINDOW_MS,
+                max_batch=config.QUERY_BATCH_MAX,
+                name="exact-search"
+            )
+        return _batcher
+
+
+def batcher_metrics() -> Dict[str, Any]:
+    """
+    Batch size and queueing metrics of the search batcher
+    """
+    with _lock:
+        return _batcher.snapshot() if _batcher is not None else {}
+
+
+
+def build(collection: "chromadb.Collection", batch_size: int = 1000) -> ExactIndex:
+    """
+    Load a collection's embeddings into an ExactIndex
+
+    Args:
+        collection: ChromaDB collection
+        batch_size: Embeddings read from ChromaDB per call
+
+    Returns:
+        ExactIndex
+    """
+    import numpy as np
+
+    # Read before the embeddings, so a write during the load makes the
+    # index stale rather than silently missing the new chunks
+    generation = cache.generation(collection.name)
+
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        batch = collection.get(limit=batch_size, offset=offset, include=["embeddings"])
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+
+    matrix = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    logger.info(f"Loaded {len(ids)} embeddings of {collection.name} for exact search")
+    return ExactIndex(ids, matrix, embeddings.collection_space(collection), generation)
+
+
+
+_indexes: Dict[str, ExactIndex] = {}
+_stale: Dict[str, bool] = {}
+_checked: Dict[str, float] = {}
+_lock = threading.Lock()
+# Held while a matrix is (re)built, so concurrent requests build it once
+_build_lock = threading.Lock()
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_index(collection: "chromadb.Collection") -> Optional[ExactIndex]:
+    """
+    Exact index for a collection small enough to search by brute force
+
+    Collections with at most config.EXACT_SEARCH_MAX_CHUNKS chunks select
+    this mode automatically. The matrix is reloaded when the collection's
+    write generation differs from the one it was loaded at, or after
+    writes in this process; every config.EXACT_SEARCH_REFRESH_SECONDS the
+    collection size is also re-checked, for writes from other processes
+    when the cache backend is not shared.
+
+    Args:
+        collection: ChromaDB collection
+
+    Returns:
+        ExactIndex, or None if the collection is too large (or empty)
+    """
+    if config.EXACT_SEARCH_MAX_CHUNKS <= 0:
+        return None
+
+    name = collection.name
+    now = time.time()
+    generation = cache.generation(name)
+    with _lock:
+        index = _indexes.get(name)
+        stale = _stale.get(name, False) or (index is not None and index.generation != generation)
+        checked = _checked.get(name, 0.0)
+
+    if index is not None and not stale and now - checked < config.EXACT_SEARCH_REFRESH_SECONDS:
+        return index
+
+    count = collection.count()
+    with _lock:
+        _checked[name] = now
+
+    if count == 0 or count > config.EXACT_SEARCH_MAX_CHUNKS:
+        with _lock:
+            _indexes.pop(name, None)
+        return None
+
+    if index is None or stale or len(index) != count:
+        with _build_lock:
+            # Another request may have rebuilt it while this one waited
+            with _lock:
+                current = _indexes.get(name)
+                current_stale = _stale.get(name, False)
+            if (current is not None and current is not index and not current_stale
+                    and current.generation == generation and len(current) == count):
+                return current
+
+            with _lock:
+                _stale[name] = False
+            index = build(collection)
+            with _lock:
+                _indexes[name] = index
+
+    return index
+
+
+def mark_stale(collection_name: str) -> None:
+    """
+    Record that a collection changed, so its matrix is reloaded on next use
+    """
+    with _lock:
+        if collection_name in _indexes:
+            _stale[collection_name] = True
@@ -0,0 +1,429 @@
+"""
+Bulk Ingestion Module
+
+Ingests many documents (PDF, TXT, Markdown, HTML, DOCX), directories of
+them, or zip/tar archives of them in one run. Extraction and chunking run in a process pool while a single
+ChunkBatcher collects chunks from every file and writes them to ChromaDB
+in large batches, amortizing embedding and write overhead across the set.
+
+Usage:
+    python -m src.ingest papers/ onboarding.zip extra.pdf
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from src import config
+from src import document_processor
+from src import embeddings
+from src import loaders
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_WORKERS = 2
+
+# Guard against archive bombs
+MAX_ARCHIVE_BYTES = config.MAX_ARCHIVE_BYTES
+
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_document(filename: str) -> bool:
+    return loaders.is_supported(filename)
+
+
+def member_name(name: str) -> str:
+    """
+    Source name of an archive member: its path inside the archive, with
+    absolute and parent (..) components dropped
+    """
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+def extract_archive(archive_path: str,
+                    dest_dir: str,
+                    max_bytes: int = MAX_ARCHIVE_BYTES
+) -> List[Tuple[str, str]]:
+    """
+    Extract the documents contained in a zip or tar archive
+
+    Members are written under generated names inside dest_dir, so archive
+    paths can never escape it. Members of unsupported types are ignored.
+    Members are named by their path inside the archive (member_name), so
+    same-named files in different folders stay separate documents.
+
+    Args:
+        archive_path: Path to .zip, .tar, .tar.gz or .tgz file
+        dest_dir: Directory to extract into
+        max_bytes: Maximum total uncompressed size of extracted documents
+
+    Returns:
+        list: (member name, extracted path) for each document member
+
+    Raises:
+        ValueError: If the archive exceeds max_bytes
+    """
+    extracted = []
+    total = 0
+
+    def target_for(member_name: str) -> str:
+        return os.path.join(dest_dir, f"{len(extracted):05d}_{os.path.basename(member_name)}")
+
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_document(info.filename):
+                    continue
+
+                total += info.file_size
+                if total > max_bytes:
+                    raise ValueError(f"Archive exceeds {max_bytes} bytes uncompressed")
+
+                target = target_for(info.filename)
+                with archive.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                extracted.append((member_name(info.filename), target))
+    else:
+        with tarfile.open(archive_path, "r:*") as archive:
+            for member in archive:
+                if not member.isfile() or not is_document(member.name):
+                    continue
+
+                total += member.size
+                if total > max_bytes:
+                    raise ValueError(f"Archive exceeds {max_bytes} bytes uncompressed")
+
+                target = target_for(member.name)
+                with archive.extractfile(member) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                extracted.append((member_name(member.name), target))
+
+    logger.info(f"Extracted {len(extracted)} documents from {os.path.basename(archive_path)}")
+    return extracted
+
+
+def collect_files(inputs: List[Tuple[str, str]],
+                  work_dir: str
+) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Expand inputs into the list of documents to ingest
+
+    Documents found in a directory are named by their path relative to
+    it, and archive members by their path inside the archive; the name
+    becomes the chunks' source.
+
+    Args:
+        inputs: (name, path) pairs - documents, archives or directories
+        work_dir: Scratch directory for archive extraction
+
+    Returns:
+        tuple: ((name, path) for each document, names of skipped inputs)
+    """
+    files = []
+    skipped = []
+
+    for name, path in inputs:
+        if os.path.isdir(path):
+            for root, _, filenames in sorted(os.walk(path)):
+                for filename in sorted(filenames):
+                    if is_document(filename):
+                        file_path = os.path.join(root, filename)
+                        files.append((os.path.relpath(file_path, path).replace(os.sep, "/"), file_path))
+        elif is_archive(name):
+            archive_dir = tempfile.mkdtemp(dir=work_dir)
+            try:
+                files.extend(extract_archive(path, archive_dir))
+            except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+                logger.error(f"Failed to extract {name}: {e}")
+                skipped.append(name)
+        elif is_document(name):
+            files.append((name, path))
+        else:
+            logger.warning(f"Skipping unsupported input: {name}")
+            skipped.append(name)
+
+    return files, skipped
+
+
+
+class ChunkBatcher:
+    """
+    Accumulate chunks from many files and store them in large batches
+
+    Each flush is a single store_chunks call, so the embedding model and
+    ChromaDB see a few big batches instead of one small batch per file.
+    When a batch fails it is retried per owner, so only the owners whose
+    chunks cannot be stored are marked failed; rollback_failed then removes
+    what earlier batches stored for them.
+
+    Args:
+        collection: ChromaDB collection to store chunks
+        batch_size: Chunks per ChromaDB write
+        write: Called as write(func, *args) for each store or delete (e.g.
+            CollectionEntry.write to hold the collection's write lock only
+            around the writes); calls func directly if None
+    """
+
+    def __init__(self,
+                 collection: "chromadb.Collection",
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 write: Optional[Callable[..., Any]] = None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._write = write or (lambda func, *args: func(*args))
+
+        self._pending: List[Dict[str, Any]] = []
+        self._owners: List[str] = []
+
+        self.stored: Dict[str, int] = {}
+        self.stored_ids: Dict[str, List[str]] = {}
+        self.failed: set = set()
+        self.num_batches = 0
+
+
+    def add(self, owner: str, chunks: List[Dict[str, Any]]) -> None:
+        self._pending.extend(chunks)
+        self._owners.extend([owner] * len(chunks))
+
+        while len(self._pending) >= self.batch_size:
+            self._flush_batch(self.batch_size)
+
+
+    def flush(self) -> None:
+        while self._pending:
+            self._flush_batch(self.batch_size)
+
+
+    def _flush_batch(self, size: int) -> None:
+        batch, self._pending = self._pending[:size], self._pending[size:]
+        owners, self._owners = self._owners[:size], self._owners[size:]
+
+        num_stored = self._write(document_processor.store_chunks, batch, self.collection)
+        self.num_batches += 1
+
+        if num_stored == 0 and len(set(owners)) > 1:
+            self._retry_per_owner(batch, owners)
+            return
+        if num_stored == 0:
+            self.failed.update(owners)
+            return
+
+        for chunk, owner in zip(batch, owners):
+            self._record(owner, [chunk])
+
+
+    def _retry_per_owner(self, batch: List[Dict[str, Any]], owners: List[str]) -> None:
+        by_owner: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk, owner in zip(batch, owners):
+            by_owner.setdefault(owner, []).append(chunk)
+
+        for owner, chunks in by_owner.items():
+            num_stored = self._write(document_processor.store_chunks, chunks, self.collection)
+            self.num_batches += 1
+            if num_stored == 0:
+                logger.error(f"Failed to store chunks of input {owner}")
+                self.failed.add(owner)
+            else:
+                self._record(owner, chunks)
+
+
+    def _record(self, owner: str, chunks: List[Dict[str, Any]]) -> None:
+        self.stored[owner] = self.stored.get(owner, 0) + len(chunks)
+        self.stored_ids.setdefault(owner, []).extend(document_processor.make_chunk_id(c) for c in chunks)
+
+
+    def rollback_failed(self) -> int:
+        """
+        Delete the chunks already stored for owners that later failed
+
+        A partly stored file would otherwise be found by its hash and
+        taken for a duplicate when it is uploaded again.
+
+        Returns:
+            int: Number of chunks deleted
+        """
+        deleted = 0
+        for owner in sorted(self.failed):
+            ids = self.stored_ids.pop(owner, [])
+            self.stored.pop(owner, None)
+            if ids:
+                logger.warning(f"Removing {len(ids)} chunks of partly stored input {owner}")
+                deleted += self._write(document_processor.delete_chunks, ids, self.collection)
+        return deleted
+
+
+
+def ingest_files(files: List[Tuple[str, str]],
+                 collection: "chromadb.Collection",
+                 pool: Optional[ProcessPoolExecutor] = None,
+                 workers: int = DEFAULT_WORKERS,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 strategy: str = "paragraph",
+                 write: Optional[Callable[..., Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ingest a set of documents with a worker pool and one shared batcher
+
+    Args:
+        files: (name, path) for each document; name is used as the citation source
+        collection: ChromaDB collection to store chunks
+        pool: Process pool for extraction (a temporary one is created if None)
+        workers: Pool size when creating a temporary pool
+        batch_size: Chunks per ChromaDB write
+        strategy: 'paragraph' (semantic) or 'fixed' (size-based)
+        write: Wrapper for the store calls (see ChunkBatcher); extraction
+            and chunking run outside it
+
+    Returns:
+        list: Per-file dicts with 'filename', 'num_chunks', 'status',
+            'doc_hash' and 'error', in input order
+    """
+    results = [
+        {"filename": name, "num_chunks": 0, "status": "pending", "doc_hash": None, "error": None}
+        for name, _ in files
+    ]
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    batcher = ChunkBatcher(collection, batch_size, write)
+    seen_hashes = set()
+    futures = {}
+
+    try:
+        for index, (name, path) in enumerate(files):
+            doc_hash = document_processor.file_sha256(path)
+            results[index]["doc_hash"] = doc_hash
+
+            if doc_hash in seen_hashes or document_processor.find_document_by_hash(doc_hash, collection):
+                results[index]["status"] = "duplicate"
+                continue
+            seen_hashes.add(doc_hash)
+
+            future = pool.submit(
+                document_processor.chunk_document,
+                path,
+                overlap=100,
+                strategy=strategy,
+                source=name
+            )
+            futures[future] = index
+
+        # Batcher owners are keyed by input index so that files sharing a
+        # name within one run are reported separately
+        for future in as_completed(futures):
+            index = futures[future]
+            result = results[index]
+
+            try:
+                chunks = future.result()
+            except Exception as e:
+                logger.error(f"Failed to process {result['filename']}: {e}")
+                result["status"] = "failed"
+                result["error"] = str(e)
+                continue
+
+            if not chunks:
+                result["status"] = "failed"
+                result["error"] = "No text extracted"
+                continue
+
+            for chunk in chunks:
+                chunk["metadata"] = {"doc_hash": result["doc_hash"]}
+            batcher.add(str(index), chunks)
+
+        batcher.flush()
+        batcher.rollback_failed()
+
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    for index, result in enumerate(results):
+        if result["status"] != "pending":
+            continue
+        if str(index) in batcher.failed:
+            result["status"] = "failed"
+            result["error"] = "Failed to store chunks"
+        else:
+            result["status"] = "success"
+            result["num_chunks"] = batcher.stored.get(str(index), 0)
+
+    num_chunks = sum(r["num_chunks"] for r in results)
+    logger.info(f"Ingested {len(files)} files: {num_chunks} chunks in {batcher.num_batches} batches")
+    return results
+
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Bulk ingest documents into ChromaDB")
+    parser.add_argument("paths", nargs="+", help="Documents, directories or zip/tar archives")
+    parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--strategy", choices=["paragraph", "fixed"], default="paragraph")
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    import chromadb
+    client = chromadb.PersistentClient(path=args.db_path)
+    collection = embeddings.open_collection(client, args.collection, create=True)
+
+    work_dir = tempfile.mkdtemp(prefix="rag_ingest_")
+    try:
+        inputs = [(os.path.basename(os.path.normpath(p)), p) for p in args.paths]
+        files, skipped = collect_files(inputs, work_dir)
+
+        results = ingest_files(
+            files,
+            collection,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            strategy=args.strategy
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for result in results:
+        line = f"{result['status']:>9}  {result['num_chunks']:>6}  {result['filename']}"
+        if result["error"]:
+            line += f"  ({result['error']})"
+        print(line)
+    for name in skipped:
+        print(f"{'skipped':>9}  {0:>6}  {name}")
+
+    failed = [r for r in results if r["status"] == "failed"]
+    print(f"\n{len(results)} files, {sum(r['num_chunks'] for r in results)} chunks, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,407 @@
+"""
+Document Loaders Module
+
+Registry of loaders that turn a file into pages of plain text, so every
+format goes through the same page -> chunk -> upsert pipeline as PDFs
+(document_processor.chunk_document).
+
+    pdf    pypdf text layer, OCR for scanned pages (extract_text_from_pdf)
+    txt    plain text; form feeds are page breaks
+    md     Markdown; each heading starts a new section
+    html   HTML; each <h1>-<h6> starts a new section
+    docx   Word; each Heading/Title paragraph starts a new section,
+           explicit page breaks start a new page
+
+Formats without real pages are split into sections, and sections longer
+than config.LOADER_PAGE_CHARS into several pages at paragraph
+boundaries. A "page" of a text document is therefore one of these
+sections, and page_num its position in the document.
+
+The format is detected from the file's content (detect_format): PDF and
+DOCX by their signatures, text formats by their markup, with the file
+extension only deciding between text formats.
+"""
+
+import logging
+import os
+import re
+import zipfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src import config
+
+
+logger = logging.getLogger(__name__)
+
+SNIFF_BYTES = 8192
+TEXT_FORMATS = ("txt", "md", "html")
+
+# Block of extracted text: (text, is_heading), or None for a page break
+Block = Optional[Tuple[str, bool]]
+
+LOADERS: Dict[str, Callable[[str], Dict[str, Any]]] = {}
+EXTENSIONS: Dict[str, str] = {}
+
+
+
+class UnsupportedFormat(ValueError):
+    """
+    Raised when a file is not in any format a loader is registered for
+    """
+
+
+
+def register(name: str, extensions: Iterable[str]):
+    """
+    Register a loader function for a format
+
+    The loader takes a path and returns a dict with 'pages' (list of
+    page texts) and 'metadata' (dict, may be empty).
+
+    Args:
+        name: Format name (e.g. 'md')
+        extensions: File extensions of the format, with the dot
+    """
+    def decorator(func: Callable[[str], Dict[str, Any]]) -> Callable[[str], Dict[str, Any]]:
+        LOADERS[name] = func
+        for extension in extensions:
+            EXTENSIONS[extension] = name
+        return func
+    return decorator
+
+
+def format_from_filename(filename: str) -> Optional[str]:
+    """
+    Format a file name claims by its extension, None if unknown
+    """
+    return EXTENSIONS.get(os.path.splitext(filename.lower())[1])
+
+
+def is_supported(filename: str) -> bool:
+    return format_from_filename(filename) is not None
+
+
+def decode_text(data: bytes) -> str:
+    """
+    Decode text as UTF-8 (with or without BOM), falling back to cp1252
+    """
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+def detect_format(path: str, filename: Optional[str] = None) -> str:
+    """
+    Detect a file's format from its content
+
+    Args:
+        path: File to inspect
+        filename: Original file name, used only to choose between text
+            formats (the path's name if None)
+
+    Returns:
+        str: Registered format name
+
+    Raises:
+        UnsupportedFormat: If the content is not a supported format
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+        raise UnsupportedFormat(f"{filename or os.path.basename(path)} is a zip file but not a Word document")
+
+    if not head.strip() or b"\x00" in head:
+        raise UnsupportedFormat(f"{filename or os.path.basename(path)} is empty or binary")
+
+    claimed = format_from_filename(filename or path)
+    if claimed in TEXT_FORMATS:
+        return claimed
+
+    text = decode_text(head).lstrip().lower()
+    if text.startswith(("<!doctype html", "<html")) or re.search(r"<(head|body|p|div|h[1-6])[\s>]", text):
+        return "html"
+    if re.search(r"^(#{1,6}\s+\S|```)|\[[^\]\n]+\]\([^)\s]+\)", text, re.MULTILINE):
+        return "md"
+    return "txt"
+
+
+def load(path: str, file_format: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load a document as pages of text
+
+    Args:
+        path: File to load
+        file_format: Registered format name (detected if None)
+        filename: Original file name, a hint for detection
+
+    Returns:
+        dict: {
+            'format': format name,
+            'pages': list of page (or section) texts,
+            'num_pages': number of pages,
+            'metadata': document metadata (e.g. title),
+            'text': all pages joined,
+            ...plus whatever the loader adds (see extract_text_from_pdf)
+        }, or {} if the file could not be read
+
+    Raises:
+        UnsupportedFormat: If the format is not supported
+    """
+    file_format = file_format or detect_format(path, filename)
+    loader = LOADERS.get(file_format)
+    if loader is None:
+        raise UnsupportedFormat(f"No loader for format {file_format}")
+
+    try:
+        data = loader(path)
+    except Exception as e:
+        logger.error(f"Failed to load {path} as {file_format}: {e}")
+        return {}
+    if not data:
+        return {}
+
+    data.setdefault("metadata", {})
+    data["format"] = file_format
+    data["num_pages"] = len(data["pages"])
+    if "text" not in data:
+        data["text"] = "\n\n".join(data["pages"])
+    return data
+
+
+def group_pages(blocks: Iterable[Block], max_chars: Optional[int] = None) -> List[str]:
+    """
+    Assemble blocks of text into pages
+
+    A heading is joined to the paragraph after it and starts a new page;
+    pages are also cut before exceeding max_chars and at page breaks.
+
+    Args:
+        blocks: (text, is_heading) per paragraph, None for a page break
+        max_chars: Page size limit (config.LOADER_PAGE_CHARS by default)
+
+    Returns:
+        list: Page texts, paragraphs separated by blank lines
+    """
+    max_chars = max_chars or config.LOADER_PAGE_CHARS
+    pages: List[str] = []
+    current: List[str] = []
+    size = 0
+    heading = None
+
+    def flush():
+        nonlocal current, size
+        if current:
+            pages.append("\n\n".join(current))
+        current, size = [], 0
+
+    for block in blocks:
+        if block is None:
+            if heading:
+                current.append(heading)
+                heading = None
+            flush()
+            continue
+
+        text, is_heading = block
+        text = text.strip()
+        if not text:
+            continue
+        if is_heading:
+            heading = f"{heading}\n{text}" if heading else text
+            continue
+
+        starts_section = heading is not None
+        if heading:
+            text = f"{heading}\n{text}"
+            heading = None
+        if current and (starts_section or size + len(text) > max_chars):
+            flush()
+        current.append(text)
+        size += len(text) + 2
+
+    if heading:
+        current.append(heading)
+    flush()
+    return pages
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+
+@register("pdf", [".pdf"])
+def load_pdf(path: str) -> Dict[str, Any]:
+    # Imported here: document_processor imports this module
+    from src.document_processor import extract_text_from_pdf
+
+    data = extract_text_from_pdf(path)
+    if data:
+        data["metadata"] = {"title": data["metadata"].title} if data["metadata"] and data["metadata"].title else {}
+    return data
+
+
+@register("txt", [".txt", ".text"])
+def load_text(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        text = decode_text(f.read()).replace("\r\n", "\n")
+
+    blocks: List[Block] = []
+    for page in text.split("\f"):
+        blocks.extend((paragraph, False) for paragraph in split_paragraphs(page))
+        blocks.append(None)
+    return {"pages": group_pages(blocks)}
+
+
+@register("md", [".md", ".markdown"])
+def load_markdown(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        text = decode_text(f.read()).replace("\r\n", "\n")
+
+    blocks: List[Block] = []
+    paragraph: List[str] = []
+    title = None
+    in_fence = False
+
+    def end_paragraph():
+        if paragraph:
+            blocks.append(("\n".join(paragraph), False))
+            paragraph.clear()
+
+    for line in text.split("\n"):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+            paragraph.append(line)
+            continue
+
+        heading = None if in_fence else re.match(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$", line)
+        if heading:
+            end_paragraph()
+            blocks.append((heading.group(2), True))
+            title = title or heading.group(2)
+        elif not line.strip() and not in_fence:
+            end_paragraph()
+        else:
+            paragraph.append(line)
+    end_paragraph()
+
+    return {"pages": group_pages(blocks), "metadata": {"title": title} if title else {}}
+
+
+@register("html", [".html", ".htm", ".xhtml"])
+def load_html(path: str) -> Dict[str, Any]:
+    from html.parser import HTMLParser
+
+    skip_tags = {"script", "style", "head", "noscript", "template", "svg"}
+    heading_tags = {"h1", "h2", "h3", "h4", "h5", "h6"}
+    block_tags = heading_tags | {
+        "p", "div", "section", "article", "aside", "header", "footer", "main", "nav",
+        "ul", "ol", "li", "dl", "dt", "dd", "table", "tr", "blockquote", "pre",
+        "figure", "figcaption", "br", "hr", "form"
+    }
+
+    class Extractor(HTMLParser):
+        def __init__(self):
+            super().__init__(convert_charrefs=True)
+            self.blocks: List[Block] = []
+            self.parts: List[str] = []
+            self.skip = 0
+            self.heading = False
+            self.in_title = False
+            self.title = ""
+
+        def end_block(self):
+            text = " ".join("".join(self.parts).split())
+            if text:
+                self.blocks.append((text, self.heading))
+            self.parts = []
+
+        def handle_starttag(self, tag, attrs):
+            if tag == "title":
+                self.in_title = True
+            if tag in skip_tags:
+                self.skip += 1
+            elif tag in block_tags:
+                self.end_block()
+                self.heading = tag in heading_tags
+
+        def handle_endtag(self, tag):
+            if tag == "title":
+                self.in_title = False
+            if tag in skip_tags:
+                self.skip = max(0, self.skip - 1)
+            elif tag in block_tags:
+                self.end_block()
+                self.heading = False
+
+        def handle_data(self, data):
+            if self.in_title:
+                self.title += data
+            elif not self.skip:
+                self.parts.append(data)
+
+    with open(path, "rb") as f:
+        text = decode_text(f.read())
+
+    parser = Extractor()
+    parser.feed(text)
+    parser.close()
+    parser.end_block()
+
+    title = " ".join(parser.title.split())
+    return {"pages": group_pages(parser.blocks), "metadata": {"title": title} if title else {}}
+
+
+@register("docx", [".docx"])
+def load_docx(path: str) -> Dict[str, Any]:
+    import xml.etree.ElementTree as ET
+
+    w = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    blocks: List[Block] = []
+
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as f:
+            root = ET.parse(f).getroot()
+
+        metadata = {}
+        if "docProps/core.xml" in archive.namelist():
+            core = ET.fromstring(archive.read("docProps/core.xml"))
+            title = core.findtext("{http://purl.org/dc/elements/1.1/}title")
+            if title:
+                metadata["title"] = title
+
+    for paragraph in root.iter(f"{w}p"):
+        style = paragraph.find(f"{w}pPr/{w}pStyle")
+        style = style.get(f"{w}val", "").lower() if style is not None else ""
+        if paragraph.find(f"{w}pPr/{w}pageBreakBefore") is not None:
+            blocks.append(None)
+
+        parts = []
+        page_break = False
+        for node in paragraph.iter():
+            if node.tag == f"{w}t":
+                parts.append(node.text or "")
+            elif node.tag == f"{w}tab":
+                parts.append("\t")
+            elif node.tag == f"{w}br":
+                if node.get(f"{w}type") == "page":
+                    page_break = True
+                else:
+                    parts.append("\n")
+
+        blocks.append(("".join(parts), style.startswith(("heading", "title"))))
+        if page_break:
+            blocks.append(None)
+
+    return {"pages": group_pages(blocks), "metadata": metadata}
@@ -0,0 +1,96 @@
+"""
+Maintenance Module
+
+Offline maintenance commands for the persistent ChromaDB directory.
+
+Usage:
+    python -m src.maintenance compact --db-path ./chroma_db
+
+Run while the API is stopped: compaction needs exclusive access to the
+database files.
+"""
+
+import argparse
+import logging
+import os
+from typing import Dict, Optional
+
+from src import config
+
+
+logger = logging.getLogger(__name__)
+
+
+
+def directory_size(path: str) -> int:
+    """
+    Total size of all files under a directory
+
+    Args:
+        path: Directory path
+
+    Returns:
+        int: Size in bytes
+    """
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def compact(db_path: str) -> Dict[str, int]:
+    """
+    Reclaim space left behind by deleted chunks
+
+    Runs Chroma's vacuum, which purges the already-applied write-ahead
+    log and rebuilds the SQLite file without free pages.
+
+    Args:
+        db_path: Persistent ChromaDB directory
+
+    Returns:
+        dict: {'bytes_before': ..., 'bytes_after': ...}
+
+    Raises:
+        FileNotFoundError: If db_path is not a ChromaDB directory
+    """
+    import chromadb_rust_bindings
+
+    if not os.path.exists(os.path.join(db_path, "chroma.sqlite3")):
+        raise FileNotFoundError(f"No ChromaDB database at {db_path}")
+
+    before = directory_size(db_path)
+    chromadb_rust_bindings.cli(["chroma", "vacuum", "--path", db_path, "--force"])
+    after = directory_size(db_path)
+
+    logger.info(f"Compacted {db_path}: {before} -> {after} bytes")
+    return {"bytes_before": before, "bytes_after": after}
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="ChromaDB maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="Reclaim space in the persistent database")
+    compact_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    if args.command == "compact":
+        sizes = compact(args.db_path)
+        saved = sizes["bytes_before"] - sizes["bytes_after"]
+        print(f"{args.db_path}: {sizes['bytes_before']} -> {sizes['bytes_after']} bytes ({saved} reclaimed)")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
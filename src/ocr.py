@@ -0,0 +1,148 @@
+"""
+OCR Module
+
+Fallback text extraction for scanned pages. extract_text_from_pdf hands
+each page with (almost) no text layer to submit_page as soon as it is
+seen; the page's embedded images are OCR'd by Tesseract in a separate
+pool while the remaining native-text pages are still being extracted.
+
+The pool is a thread pool: pytesseract runs every image through the
+tesseract binary in its own process, so threads are enough to keep
+several cores busy and the pool can live inside an ingestion worker
+process (which may not start processes of its own).
+
+Needs the optional pytesseract and Pillow packages and the tesseract
+binary (apt-get install tesseract-ocr). Without them low-text pages are
+logged and skipped, as before.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from src import config
+
+
+logger = logging.getLogger(__name__)
+
+_available: Optional[bool] = None
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def is_low_text(text: str, min_chars: Optional[int] = None) -> bool:
+    """
+    Whether a page's text layer is too thin to be the real content
+
+    Args:
+        text: Text extracted from the page
+        min_chars: Non-whitespace characters below which a page counts as
+            scanned (config.OCR_MIN_CHARS by default)
+    """
+    if min_chars is None:
+        min_chars = config.OCR_MIN_CHARS
+    return sum(1 for c in text or "" if not c.isspace()) < min_chars
+
+
+def ocr_available() -> bool:
+    """
+    Whether OCR is enabled and pytesseract, Pillow and tesseract are installed
+
+    Checked once per process.
+    """
+    global _available
+
+    if not config.OCR_ENABLED:
+        return False
+    if _available is None:
+        try:
+            import pytesseract
+            import PIL  # noqa: F401
+            pytesseract.get_tesseract_version()
+            _available = True
+        except Exception as e:
+            logger.warning(f"OCR unavailable, scanned pages will have no text: {e}")
+            _available = False
+    return _available
+
+
+def get_pool() -> ThreadPoolExecutor:
+    """
+    OCR pool of this process (config.OCR_WORKERS threads)
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=config.OCR_WORKERS, thread_name_prefix="ocr")
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def page_images(page: Any) -> List[bytes]:
+    """
+    Encoded images embedded in a pypdf page (a scan is usually one)
+    """
+    images = []
+    for image in page.images:
+        try:
+            images.append(image.data)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable image {image.name}: {e}")
+    return images
+
+
+def ocr_image(data: bytes) -> str:
+    """
+    Recognise the text of one encoded image
+    """
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return pytesseract.image_to_string(
+            image,
+            lang=config.OCR_LANGUAGE,
+            timeout=config.OCR_TIMEOUT_SECONDS
+        )
+
+
+def ocr_images(images: List[bytes]) -> str:
+    """
+    OCR a page's images and join their text as paragraphs
+    """
+    texts = [ocr_image(data).strip() for data in images]
+    return "\n\n".join(text for text in texts if text)
+
+
+def _timed_ocr(images: List[bytes]) -> tuple:
+    started = time.perf_counter()
+    text = ocr_images(images)
+    return text, time.perf_counter() - started
+
+
+def submit_page(page: Any) -> Optional[Future]:
+    """
+    Start OCR of a page in the pool
+
+    The images are read here, on the caller's thread, so the pypdf
+    reader is never used from two threads.
+
+    Args:
+        page: pypdf page with too little text
+
+    Returns:
+        Future of (page text, OCR seconds), or None if OCR is unavailable
+        or the page has no images
+    """
+    if not ocr_available():
+        return None
+    images = page_images(page)
+    if not images:
+        return None
+    return get_pool().submit(_timed_ocr, images)
@@ -0,0 +1,161 @@
+"""
+ONNX Embedding Function Module
+
+ChromaDB's MiniLM ONNX embedding function with the knobs it lacks:
+any exported sentence-transformer model directory, batch size, intra-op
+thread count, and padding to the longest text in a batch instead of
+always to the maximum sequence length.
+
+Imported lazily through src.embeddings because it pulls in chromadb.
+"""
+
+import logging
+import os
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+
+logger = logging.getLogger(__name__)
+
+# Model ChromaDB uses by default; downloaded on first use
+DEFAULT_MODEL_ID = "all-MiniLM-L6-v2"
+
+
+
+@register_embedding_function
+class OnnxEmbeddingFunction(ONNXMiniLM_L6_V2):
+    """
+    Batched, thread-configurable ONNX sentence embedding
+
+    Args:
+        model_id: Name recorded in collection metadata
+        model_path: Directory with model.onnx and tokenizer.json (ChromaDB's
+            downloaded MiniLM if None)
+        batch_size: Texts per ONNX run
+        threads: Intra-op threads (0 lets onnxruntime decide)
+        max_tokens: Truncation length
+        preferred_providers: onnxruntime execution providers
+    """
+
+    def __init__(self,
+                 model_id: str = DEFAULT_MODEL_ID,
+                 model_path: Optional[str] = None,
+                 batch_size: int = 32,
+                 threads: int = 0,
+                 max_tokens: int = 256,
+                 preferred_providers: Optional[List[str]] = None):
+        super().__init__(preferred_providers=preferred_providers)
+        self.model_id = model_id
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.threads = threads
+        self._max_tokens = max_tokens
+
+
+    def _model_dir(self) -> str:
+        return self.model_path or os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME)
+
+
+    def max_tokens(self) -> int:
+        return self._max_tokens
+
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(os.path.join(self._model_dir(), "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self._max_tokens)
+        # Pad to the longest text in the batch; mean pooling masks the padding
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+
+    @cached_property
+    def model(self) -> Any:
+        providers = self._preferred_providers or self.ort.get_available_providers()
+        providers = [p for p in providers if p != "CoreMLExecutionProvider"]
+
+        options = self.ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads > 0:
+            options.intra_op_num_threads = self.threads
+
+        logger.info(f"Loading embedding model {self.model_id} (batch {self.batch_size}, threads {self.threads or 'auto'})")
+        return self.ort.InferenceSession(
+            os.path.join(self._model_dir(), "model.onnx"),
+            providers=providers,
+            sess_options=options
+        )
+
+
+    def _forward(self, documents: List[str], batch_size: int = 32) -> np.ndarray:
+        # The base class tokenises one text at a time; batch encoding pads
+        # every text in the batch to the same length in one call
+        all_embeddings = []
+        for start in range(0, len(documents), batch_size):
+            encoded = self.tokenizer.encode_batch(documents[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+            output = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            all_embeddings.append(self._normalize(pooled).astype(np.float32))
+
+        if not all_embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(all_embeddings)
+
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if self.model_path is None:
+            self._download_model_if_not_exists()
+        return list(self._forward(list(input), self.batch_size))
+
+
+    @staticmethod
+    def name() -> str:
+        return "rag-onnx"
+
+
+    def get_config(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "model_path": self.model_path,
+            "batch_size": self.batch_size,
+            "threads": self.threads,
+            "max_tokens": self._max_tokens,
+            "preferred_providers": self._preferred_providers
+        }
+
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "OnnxEmbeddingFunction":
+        return OnnxEmbeddingFunction(
+            model_id=config.get("model_id", DEFAULT_MODEL_ID),
+            model_path=config.get("model_path"),
+            batch_size=config.get("batch_size", 32),
+            threads=config.get("threads", 0),
+            max_tokens=config.get("max_tokens", 256),
+            preferred_providers=config.get("preferred_providers")
+        )
+
+
+    def validate_config_update(self, old_config: Dict[str, Any], new_config: Dict[str, Any]) -> None:
+        if old_config.get("model_id") != new_config.get("model_id"):
+            raise ValueError("The embedding model of a collection cannot be changed")
+
+
+    @staticmethod
+    def validate_config(config: Dict[str, Any]) -> None:
+        pass
@@ -0,0 +1,230 @@
+"""
+Parent Chunk Store Module
+
+Side store for the large "parent" spans used by parent-child retrieval.
+Only the small child chunks are embedded in ChromaDB; each child records
+its parent_id and the parent text is kept here once, zlib-compressed in
+a SQLite file, to be swapped in when the context is built.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from src import config
+
+
+logger = logging.getLogger(__name__)
+
+
+
+class ParentStore:
+    """
+    SQLite table of compressed parent texts keyed by (collection, parent_id)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            " collection TEXT NOT NULL,"
+            " parent_id TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " text BLOB NOT NULL,"
+            " PRIMARY KEY (collection, parent_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS parents_source ON parents (collection, source)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+
+    def put_many(self, collection: str, parents: Dict[str, Tuple[str, str]]) -> int:
+        """
+        Store parent texts, replacing existing entries with the same id
+
+        Args:
+            collection: Collection name
+            parents: parent_id -> (source, text)
+
+        Returns:
+            int: Number of parents written
+        """
+        rows = [
+            (collection, parent_id, source, zlib.compress(text.encode("utf-8")))
+            for parent_id, (source, text) in parents.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+
+    def get_many(self, collection: str, parent_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Look up parent texts
+
+        Args:
+            collection: Collection name
+            parent_ids: Parent ids to fetch
+
+        Returns:
+            dict: parent_id -> text for the ids that exist
+        """
+        parent_ids = list(dict.fromkeys(parent_ids))
+        if not parent_ids:
+            return {}
+
+        placeholders = ",".join("?" * len(parent_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT parent_id, text FROM parents WHERE collection = ? AND parent_id IN ({placeholders})",
+                [collection, *parent_ids]
+            ).fetchall()
+        return {parent_id: zlib.decompress(text).decode("utf-8") for parent_id, text in rows}
+
+
+    def delete_source(self, collection: str, source: str, keep: Optional[Iterable[str]] = None) -> int:
+        """
+        Delete a document's parents
+
+        Args:
+            collection: Collection name
+            source: Source document name
+            keep: Parent ids to keep (e.g. those of a replacement version)
+
+        Returns:
+            int: Number of parents deleted
+        """
+        keep = set(keep or ())
+        with self._lock:
+            ids = [
+                row[0] for row in self._conn.execute(
+                    "SELECT parent_id FROM parents WHERE collection = ? AND source = ?",
+                    (collection, source)
+                )
+                if row[0] not in keep
+            ]
+            self._conn.executemany(
+                "DELETE FROM parents WHERE collection = ? AND parent_id = ?",
+                [(collection, parent_id) for parent_id in ids]
+            )
+            self._conn.commit()
+        return len(ids)
+
+
+    def items(self, collection: str, batch_size: int = 1000) -> Iterator[Tuple[str, str, str]]:
+        """
+        Every parent of a collection, read in batches
+
+        Yields:
+            tuple: (parent_id, source, text)
+        """
+        last_id = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT parent_id, source, text FROM parents"
+                    " WHERE collection = ? AND parent_id > ? ORDER BY parent_id LIMIT ?",
+                    (collection, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for parent_id, source, text in rows:
+                yield parent_id, source, zlib.decompress(text).decode("utf-8")
+
+
+    def delete_collection(self, collection: str) -> int:
+        """
+        Delete every parent of a collection
+
+        Returns:
+            int: Number of parents deleted
+        """
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM parents WHERE collection = ?", (collection,)).rowcount
+            self._conn.commit()
+        return deleted
+
+
+    def copy_collection(self, collection: str, target: str) -> None:
+        """
+        Copy a collection's parents to another collection name, replacing
+        any the target had
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM parents WHERE collection = ?", (target,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parents"
+                " SELECT ?, parent_id, source, text FROM parents WHERE collection = ?",
+                (target, collection)
+            )
+            self._conn.commit()
+
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM parents WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+
+_stores: Dict[str, ParentStore] = {}
+_stores_lock = threading.Lock()
+
+# Set by a read replica to serve the parents of its private snapshot copy
+_path_override: Optional[str] = None
+
+
+def use_path(path: Optional[str]) -> None:
+    """
+    Serve parents from another database file (None restores config.PARENT_STORE_PATH)
+    """
+    global _path_override
+    _path_override = path
+
+
+def close_store(path: str) -> None:
+    """
+    Close a store opened by get_store, e.g. before its file is removed
+    """
+    with _stores_lock:
+        store = _stores.pop(path, None)
+    if store is not None:
+        store.close()
+
+
+def get_store(create: bool = True) -> Optional[ParentStore]:
+    """
+    Shared store at config.PARENT_STORE_PATH (or the path set by use_path)
+
+    Args:
+        create: Create the database file if it does not exist yet
+
+    Returns:
+        ParentStore, or None if create is False and there is no store yet
+    """
+    path = _path_override or config.PARENT_STORE_PATH
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            if not create and not os.path.exists(path):
+                return None
+            store = ParentStore(path)
+            _stores[path] = store
+            logger.info(f"Opened parent store at {path}")
+        return store
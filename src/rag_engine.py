@@ -3,33 +3,297 @@ RAG Query Pipeline
 Combines retrieval from ChromaDB with Gemini generation
 """
 
-import os
 import logging
-from typing import Dict, List, Any
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import chromadb
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
 
+# Loads .env (GEMINI_API_KEY) for the Gemini client
+from src import config
+from src import ann_index
+from src import chunk_store
+from src import embeddings
+from src import exact_index
+from src import parent_store
 
+# google.genai and chromadb are heavy; they are imported on first use
+if TYPE_CHECKING:
+    import chromadb
 
-# Load environment
-load_dotenv()
 
-
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
 
+# Chunks further than this from the question are treated as irrelevant
+DISTANCE_THRESHOLD = 1.2
+
+
+def build_where_filter(
+        sources: Optional[List[str]] = None,
+        page_range: Optional[Tuple[int, int]] = None,
+        metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build a ChromaDB where clause from query filters
+
+    Args:
+        sources: Only search chunks from these source documents
+        page_range: Inclusive (first, last) page numbers
+        metadata: Exact-match filters on other metadata fields
+
+    Returns:
+        dict: ChromaDB where clause, or None if no filters were given
+    """
+    conditions = []
+
+    if sources:
+        if len(sources) == 1:
+            conditions.append({"source": {"$eq": sources[0]}})
+        else:
+            conditions.append({"source": {"$in": list(sources)}})
+
+    if page_range:
+        first, last = page_range
+        conditions.append({"page_num": {"$gte": first}})
+        conditions.append({"page_num": {"$lte": last}})
+
+    for key, value in (metadata or {}).items():
+        conditions.append({key: {"$eq": value}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def distances_to_similarity(distances: List[float], collection: "chromadb.Collection") -> List[float]:
+    """
+    Convert query distances to cosine similarities
+
+    Embeddings are assumed unit length (true for the default MiniLM
+    model), so squared L2 distance d maps to a cosine of 1 - d/2.
+
+    Args:
+        distances: Distances returned by collection.query
+        collection: Collection the distances came from (for its space)
+
+    Returns:
+        list: Cosine similarity per distance
+    """
+    space = embeddings.collection_space(collection)
+    if space in ("cosine", "ip"):
+        return [1.0 - d for d in distances]
+    return [1.0 - d / 2.0 for d in distances]
+
+
+def mmr_select(query_similarity: List[float],
+               embeddings: List[List[float]],
+               k: int,
+               lambda_mult: float = 0.7) -> List[int]:
+    """
+    Pick k diverse candidates with maximal marginal relevance
+
+    Each step takes the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected),
+    so near-duplicates of an already selected chunk lose out to slightly
+    less relevant but new information.
+
+    Args:
+        query_similarity: Similarity of each candidate to the question
+        embeddings: Candidate embeddings
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+
+    Returns:
+        list: Indices of the selected candidates, in selection order
+    """
+    import numpy as np
+
+    relevance = np.asarray(query_similarity, dtype=np.float32)
+    if relevance.size == 0 or k <= 0:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    pairwise = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(relevance.size, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, relevance.size):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+
+    return selected
+
+
+def retrieve_chunks(
+        question: str,
+        collection: "chromadb.Collection",
+        n_results: int = 3,
+        where: Optional[Dict[str, Any]] = None,
+        mmr_lambda: Optional[float] = None,
+        offset: int = 0) -> Dict[str, List[Any]]:
+    """
+    Retrieve the chunks most relevant to a question
+
+    With MMR enabled (mmr_lambda < 1), a wider candidate set is fetched
+    with embeddings and a diverse n_results are picked from it.
+
+    Args:
+        question: User's question
+        collection: ChromaDB collection with documents
+        n_results: Num of chunks to retrieve
+        where: Optional ChromaDB metadata filter applied before ranking
+        mmr_lambda: MMR trade-off (config.MMR_LAMBDA if None, 1.0 disables)
+        offset: Skip this many of the best chunks (for paging); only the
+            returned chunks are resolved to text
+
+    Returns:
+        dict: {
+            'ids': chunk ids,
+            'documents': chunk texts within the distance threshold,
+            'metadatas': their metadata dicts, with 'relevance' (cosine
+                similarity to the question) added,
+            'distances': their distances to the question
+        }
+    """
+    if mmr_lambda is None:
+        mmr_lambda = config.MMR_LAMBDA
+    n_total = offset + n_results
+    use_mmr = mmr_lambda < 1.0 and n_total > 1
+
+    n_fetch = n_total * config.MMR_FETCH_MULTIPLIER if use_mmr else n_total
+
+    # With a chunk store only ids and distances come from ChromaDB.
+    # Unfiltered queries can use a local index: the configured ANN index,
+    # or brute force if the collection is small enough.
+    store = chunk_store.get_store(collection)
+    index = None
+    if where is None:
+        index = ann_index.get_index(collection) or exact_index.get_index(collection)
+
+    logger.info(f"Retrieving chunks for {question}")
+    query_embedding = embeddings.embed_queries(collection, [question])[0]
+
+    if isinstance(index, exact_index.ExactIndex):
+        # Concurrent queries share one matrix product
+        ids, distances, vectors = exact_index.search(index, query_embedding, n_fetch)
+    elif index is not None:
+        ids, distances, vectors = index.search(query_embedding, n_fetch)
+    if index is not None:
+        results = {
+            "ids": [ids],
+            "distances": [distances],
+            "embeddings": [vectors],
+            "documents": None,
+            "metadatas": None
+        }
+    else:
+        include = ["distances"] if store is not None else ["documents", "metadatas", "distances"]
+        if use_mmr:
+            include.append("embeddings")
+
+        results = collection.query(
+            query_embeddings = [query_embedding],
+            n_results = n_fetch,
+            where = where,
+            include = include
+        )
+    logger.info(f"Retrieved {len(results['ids'][0])} chunks")
+
+    # Filter chunks by distance threshold
+    keep = [
+        i for i, dist in enumerate(results['distances'][0])
+        if dist < DISTANCE_THRESHOLD
+    ]
+
+    if use_mmr and len(keep) > n_total:
+        selected = mmr_select(
+            distances_to_similarity([results['distances'][0][i] for i in keep], collection),
+            [results['embeddings'][0][i] for i in keep],
+            n_total,
+            mmr_lambda
+        )
+        logger.info(f"MMR kept {len(selected)} of {len(keep)} candidates (lambda={mmr_lambda})")
+        keep = [keep[i] for i in selected]
+    keep = keep[offset:n_total]
+
+    if results['documents'] is None:
+        documents, metadatas = resolve_chunks([results['ids'][0][i] for i in keep], store, collection)
+        # A local index can still list chunks deleted since it was built
+        found = [n for n, doc in enumerate(documents) if doc is not None]
+        if len(found) < len(keep):
+            logger.info(f"Dropping {len(keep) - len(found)} chunks no longer in the collection")
+        keep = [keep[n] for n in found]
+        documents = [documents[n] for n in found]
+        metadatas = [metadatas[n] for n in found]
+    else:
+        documents = [results['documents'][0][i] for i in keep]
+        metadatas = [results['metadatas'][0][i] for i in keep]
+
+    distances = [results['distances'][0][i] for i in keep]
+    relevance = distances_to_similarity(distances, collection) if keep else []
+    metadatas = [
+        {**(meta or {}), "relevance": round(float(score), 4)}
+        for meta, score in zip(metadatas, relevance)
+    ]
+
+    return {
+        "ids": [results['ids'][0][i] for i in keep],
+        "documents": documents,
+        "metadatas": metadatas,
+        "distances": distances
+    }
+
+
+def resolve_chunks(ids: List[str],
+                   store: Optional["chunk_store.ChunkStore"],
+                   collection: "chromadb.Collection") -> Tuple[List[str], List[dict]]:
+    """
+    Look up chunk text and metadata, from the chunk store where possible
+    
+    Args:
+        ids: Chunk ids in result order
+        store: Chunk store snapshot of the collection, or None
+        collection: Collection to fall back to for ids not in the snapshot
+        
+    Returns:
+        tuple: (documents, metadatas) in the order of ids, both None for
+            ids found in neither the store nor the collection
+    """
+    if store is not None:
+        documents, metadatas = store.resolve(ids)
+    else:
+        documents, metadatas = [None] * len(ids), [None] * len(ids)
+
+    missing = [chunk_id for chunk_id, doc in zip(ids, documents) if doc is None]
+    if missing:
+        logger.info(f"Fetching {len(missing)} chunks from ChromaDB")
+        fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+        found = {
+            chunk_id: (doc, meta)
+            for chunk_id, doc, meta in zip(fetched['ids'], fetched['documents'], fetched['metadatas'])
+        }
+        for i, chunk_id in enumerate(ids):
+            if documents[i] is None:
+                documents[i], metadatas[i] = found.get(chunk_id, (None, None))
+
+    return documents, metadatas
+
+
 def query_rag_system(
         question: str,
-        collection: chromadb.Collection,
-        n_results: int = 3) -> Dict[str, Any]:
+        collection: "chromadb.Collection",
+        n_results: int = 3,
+        where: Optional[Dict[str, Any]] = None,
+        mmr_lambda: Optional[float] = None) -> Dict[str, Any]:
     """
     Complete RAG pipeline: Question -> Retrieve -> Generate -> Answer
 
@@ -37,11 +301,14 @@ def query_rag_system(
         question: User's question
         collection: ChromaDB collection with documents
         n_results: Num of chunks to retrieve
+        where: Optional ChromaDB metadata filter (see build_where_filter)
+        mmr_lambda: MMR relevance/diversity trade-off (see retrieve_chunks)
 
     Returns:
         dict:{
             'answer': Generated answer from LLM,
             'sources': List of sources used (with page numbers),
+            'citations': Structured citations (see extract_citations),
             'context_chunks': Chunks retrieved
         }
 
@@ -50,27 +317,9 @@ def query_rag_system(
     """
 
     try:
-        logger.info(f"Retrieving chunks for {question}")
-        results = collection.query(
-            query_texts = [question],
-            n_results = n_results
-        )
-        logger.info(f"Retrieved {len(results['ids'][0])} chunks")
-
-        # Filter chunks by distance threshold
-        filtered_docs = []
-        filtered_metadatas = []
-        DISTANCE_THRESHOLD = 1.2
-
-
-        for doc, meta, dist in zip(
-            results['documents'][0],
-            results['metadatas'][0],
-            results['distances'][0]
-        ):
-            if dist < DISTANCE_THRESHOLD:
-                filtered_docs.append(doc)
-                filtered_metadatas.append(meta)
+        retrieved = retrieve_chunks(question, collection, n_results, where, mmr_lambda)
+        filtered_docs = retrieved["documents"]
+        filtered_metadatas = retrieved["metadatas"]
 
         # Return early if no relevant chunks
         if not filtered_docs:
@@ -78,13 +327,15 @@ def query_rag_system(
             return {
                 'answer': "I don't have relevant information in my knowledge base.",
                 'sources': [],
+                'citations': [],
                 'context_chunks': []
             }
 
 
 
-        # Format context from filtered chunks
-        context = format_context(filtered_docs, filtered_metadatas)    
+        # Format context from filtered chunks, expanding children to parents
+        parents = load_parents(filtered_metadatas, collection)
+        context = format_context(filtered_docs, filtered_metadatas, parents)    
     
         # Build prompt
         sys_instruct = "Only use provided context to answer the given question"
@@ -102,6 +353,9 @@ def query_rag_system(
         Answer:"""
 
         # Call Gemini
+        from google import genai
+        from google.genai import types
+
         client = genai.Client()
         model = "gemini-2.5-flash"
 
@@ -116,10 +370,12 @@ def query_rag_system(
 
 
         # Return complete response
+        citations = extract_citations(filtered_metadatas)
         return {
             'answer' : response.text,
             'context_chunks' : filtered_docs,
-            'sources' : extract_sources(filtered_metadatas)
+            'sources' : extract_sources(filtered_metadatas, citations),
+            'citations' : citations
         }
     
     except Exception as e:
@@ -127,17 +383,47 @@ def query_rag_system(
         return {
             'answer' : "An error occured while processing your question.",
             'sources' : [],
+            'citations' : [],
             'context_chunks' : []
         }
 
 
-def format_context(documents:List[str], metadatas:List[dict]) -> str:
+def load_parents(metadatas: List[dict], collection: "chromadb.Collection") -> Dict[str, str]:
+    """
+    Fetch the parent spans of retrieved child chunks
+    
+    Args:
+        metadatas: Metadata dicts of the retrieved chunks
+        collection: Collection the chunks came from
+        
+    Returns:
+        dict: parent_id -> parent text (empty if no chunk has a parent)
+    """
+    parent_ids = [meta["parent_id"] for meta in metadatas if meta.get("parent_id")]
+    if not parent_ids:
+        return {}
+
+    store = parent_store.get_store(create=False)
+    if store is None:
+        logger.warning("Chunks reference parents but there is no parent store")
+        return {}
+    return store.get_many(collection.name, parent_ids)
+
+
+def format_context(documents:List[str],
+                   metadatas:List[dict],
+                   parents: Optional[Dict[str, str]] = None) -> str:
     """
     Format retrieved chunks into context string
+
+    Child chunks whose parent is in parents are replaced by the parent
+    text, and each parent appears only once however many of its children
+    matched.
     
     Args:
         documents: List of document texts from ChromaDB
         metadatas: List of metadata dicts
+        parents: Optional parent_id -> parent text from load_parents
         
     Returns:
         str: Formatted context string with source citations
@@ -145,8 +431,16 @@ def format_context(documents:List[str], metadatas:List[dict]) -> str:
     """
     try:
         context = []
+        used_parents = set()
 
         for document, metadata in zip(documents, metadatas):
+            parent_id = metadata.get('parent_id')
+            if parents and parent_id in parents:
+                if parent_id in used_parents:
+                    continue
+                used_parents.add(parent_id)
+                document = parents[parent_id]
+
             source = metadata.get('source', 'Unknown')
             page = metadata.get('page_num', '?')
             context.append(
@@ -161,43 +455,89 @@ def format_context(documents:List[str], metadatas:List[dict]) -> str:
         logger.error(f"Failed to format context: {e}")
         return ""
 
-def extract_sources(metadatas: List[dict]) -> List[str]:
+def extract_citations(metadatas: List[dict]) -> List[Dict[str, Any]]:
     """
-    Extract unique sources for citation
-    
+    Group retrieved chunks into citations, one per document
+
+    Metadatas are taken in retrieval order, so documents come out in
+    order of their most relevant chunk and each document's spans in
+    relevance order, in a single pass. Chunks without a page or offsets
+    are still cited, just without those fields.
+
     Args:
-        metadatas: List of metadata dicts
-        
-    Returns:
-        list: Unique source strings like "test.pdf (Page 5)"
+        metadatas: Metadata dicts of the retrieved chunks, best first
+            (as returned by retrieve_chunks, with 'relevance')
 
+    Returns:
+        list: Citations like {
+            'source': "test.pdf",
+            'relevance': best chunk's relevance,
+            'pages': pages cited, in relevance order,
+            'spans': [{'chunk_id', 'page', 'char_start', 'char_end', 'relevance'}, ...]
+        }
     """
+    citations: Dict[str, Dict[str, Any]] = {}
 
-    # Sort by page number
-    sorted_metas = sorted(metadatas, key= lambda x: x["page_num"])
+    for meta in metadatas:
+        source = meta.get('source', 'Unknown')
+        page = meta.get('page_num')
+
+        citation = citations.get(source)
+        if citation is None:
+            citation = citations[source] = {
+                'source': source,
+                'relevance': meta.get('relevance'),
+                'pages': [],
+                'spans': []
+            }
+        if page is not None and page not in citation['pages']:
+            citation['pages'].append(page)
+        citation['spans'].append({
+            'chunk_id': meta.get('chunk_id'),
+            'page': page,
+            'char_start': meta.get('char_start'),
+            'char_end': meta.get('char_end'),
+            'relevance': meta.get('relevance')
+        })
 
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_sources =[]
+    return list(citations.values())
 
-    for meta in sorted_metas:
-        source = meta.get('source', 'Unknown')
-        page = meta.get('page_num', '?')
-        formatted = f"{source} (Page {page})"
 
-        if formatted not in seen:
-            seen.add(formatted)
-            unique_sources.append(formatted)
+def extract_sources(metadatas: List[dict],
+                    citations: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+    """
+    Extract unique sources for citation
     
-    return unique_sources
+    Args:
+        metadatas: List of metadata dicts, best first
+        citations: Citations already built from metadatas by extract_citations
+        
+    Returns:
+        list: Unique source strings like "test.pdf (Page 5)", grouped by
+            document in relevance order
+
+    """
+    if citations is None:
+        citations = extract_citations(metadatas)
+
+    sources = []
+    for citation in citations:
+        if not citation['pages']:
+            sources.append(f"{citation['source']} (Page ?)")
+        for page in citation['pages']:
+            sources.append(f"{citation['source']} (Page {page})")
+    return sources
 
 
 
 
 if __name__ == "__main__":
     """Test the RAG system with sample questions"""
+    import chromadb
     from src import document_processor
 
+    config.setup_logging()
+
     print("\n" + "="*60)
     print("RAG SYSTEM TEST")
     print("="*60)
@@ -205,7 +545,7 @@ if __name__ == "__main__":
     # Setup test environment
     pdf_path = "test_document.pdf"
     client = chromadb.Client()
-    collection = client.create_collection(name= "ml_documents")
+    collection = embeddings.open_collection(client, "ml_documents", create=True)
 
     # Process PDF
     num_stored = document_processor.process_and_store_pdf(pdf_path, collection)
@@ -0,0 +1,228 @@
+"""
+Collection Registry Module
+
+Lets one process serve many collections: handles are opened lazily on
+first use, kept in an LRU capped at a maximum number of open handles,
+and each collection carries its own write lock and usage statistics.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, TYPE_CHECKING
+
+from src import embeddings
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+logger = logging.getLogger(__name__)
+
+# Same rule ChromaDB applies to collection names
+COLLECTION_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,510}[a-zA-Z0-9]$")
+
+
+
+class CollectionNotFound(Exception):
+    """
+    Raised when a collection does not exist and may not be created
+    """
+
+
+
+class CollectionStats:
+    """
+    Usage counters for one collection, kept even while its handle is closed
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.uploads = 0
+        self.deletes = 0
+        self.opens = 0
+        self.last_used: Optional[float] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "uploads": self.uploads,
+            "deletes": self.deletes,
+            "opens": self.opens,
+            "last_used": self.last_used
+        }
+
+
+
+class CollectionEntry:
+    """
+    An open collection handle with its write lock and stats
+    """
+
+    def __init__(self,
+                 name: str,
+                 collection: "chromadb.Collection",
+                 stats: CollectionStats,
+                 write_lock: threading.Lock):
+        self.name = name
+        self.collection = collection
+        self.stats = stats
+        self.write_lock = write_lock
+
+
+    def write(self, func, *args):
+        """
+        Call a collection write function while holding the write lock
+        """
+        with self.write_lock:
+            return func(*args)
+
+
+
+class CollectionRegistry:
+    """
+    Lazily opened, LRU-bounded set of collection handles
+
+    The ChromaDB client itself is only created when the first collection
+    is requested. Collections are opened with embedding_function, or the
+    configured embedding provider if it is None.
+    """
+
+    def __init__(self,
+                 client_factory: Callable[[], Any],
+                 default_name: str,
+                 max_open: int = 8,
+                 allow_create: bool = True,
+                 embedding_function: Optional[Any] = None):
+        self.client_factory = client_factory
+        self.default_name = default_name
+        self.max_open = max_open
+        self.allow_create = allow_create
+        self.embedding_function = embedding_function
+
+        self._client = None
+        self._entries: "OrderedDict[str, CollectionEntry]" = OrderedDict()
+        self._stats: Dict[str, CollectionStats] = {}
+
+        # Serialises writes so that a document replace or delete is never
+        # interleaved with another write to the same collection. Kept
+        # outside the entries so eviction cannot split a collection's lock.
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+        self.evictions = 0
+
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory()
+            return self._client
+
+
+    def get(self, name: Optional[str] = None, create: bool = False) -> CollectionEntry:
+        """
+        Get an open collection, opening it if needed
+
+        Args:
+            name: Collection name (registry default if None)
+            create: Create the collection if it does not exist
+
+        Returns:
+            CollectionEntry for the collection
+
+        Raises:
+            ValueError: If the name is not a valid collection name
+            CollectionNotFound: If it does not exist and cannot be created
+            EmbeddingModelMismatch: If it was built with a different model
+        """
+        name = name or self.default_name
+        if not COLLECTION_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid collection name: {name}")
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                entry.stats.last_used = time.time()
+                return entry
+
+            collection = self._open(name, create and self.allow_create)
+
+            stats = self._stats.setdefault(name, CollectionStats())
+            stats.opens += 1
+            stats.last_used = time.time()
+
+            entry = CollectionEntry(
+                name,
+                collection,
+                stats,
+                self._write_locks.setdefault(name, threading.Lock())
+            )
+            self._entries[name] = entry
+
+            while len(self._entries) > self.max_open:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Closed collection handle: {evicted}")
+
+            return entry
+
+
+    def _open(self, name: str, create: bool) -> "chromadb.Collection":
+        collection = embeddings.open_collection(self.client, name, create, self.embedding_function)
+        if collection is None:
+            raise CollectionNotFound(name)
+        logger.info(f"Opened collection {name} ({collection.count()} chunks)")
+        return collection
+
+
+    def swap_client(self, client: Any) -> None:
+        """
+        Serve from another client, e.g. a newly loaded snapshot
+
+        Open handles are dropped and reopened lazily from the new client.
+        Requests already holding an entry finish on the old client.
+        """
+        with self._lock:
+            self._client = client
+            self._entries.clear()
+        logger.info("Switched collection registry to a new client")
+
+
+    def list_collections(self) -> List[str]:
+        """
+        Names of every collection in the database
+        """
+        return sorted(c.name for c in self.client.list_collections())
+
+
+    def stats(self, name: str) -> Dict[str, Any]:
+        """
+        Stats for one collection, including its live chunk count
+
+        Raises:
+            CollectionNotFound: If the collection does not exist
+        """
+        entry = self.get(name)
+        return {
+            "name": name,
+            "count": entry.collection.count(),
+            **entry.stats.snapshot()
+        }
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Registry-wide metrics
+        """
+        with self._lock:
+            return {
+                "open_handles": list(self._entries.keys()),
+                "max_open": self.max_open,
+                "evictions": self.evictions,
+                "collections": {name: stats.snapshot() for name, stats in self._stats.items()}
+            }
@@ -0,0 +1,361 @@
+"""
+Snapshot Module
+
+Read-replica serving. A single ingestion node publishes immutable
+snapshots of its collections; any number of query workers (uvicorn
+workers, containers) load the current snapshot into a private, local
+ChromaDB copy and serve it read-only, switching to newer snapshots as
+they are published. No process ever writes to another's database: a
+replica keeps the parent spans in its copy too, and leaves the shared
+parent and embedding stores alone.
+
+Layout of the snapshot directory (shared volume or synced bucket):
+    CURRENT                        id of the snapshot to serve
+    <snapshot id>/manifest.json    collections and publish time
+    <snapshot id>/<collection>.zip collection export (see src.transfer)
+
+A snapshot is written under a temporary name, renamed into place and
+only then made current by atomically replacing CURRENT, so replicas
+never see a partial snapshot.
+
+Usage:
+    # On the ingestion node
+    python -m src.snapshot publish --collection ml_documents
+
+    # On each replica
+    READ_ONLY=true SNAPSHOT_DIR=/shared/snapshots uvicorn src.api:app --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src import config
+
+if TYPE_CHECKING:
+    from src.registry import CollectionRegistry
+
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+# Parent store inside a replica's local copy
+PARENTS_FILE = "parents.sqlite3"
+
+
+
+class SnapshotNotFound(Exception):
+    """
+    Raised when no snapshot has been published yet
+    """
+
+
+
+def current_snapshot(snapshot_dir: str) -> Optional[str]:
+    """
+    Id of the snapshot currently published
+
+    Returns:
+        str: Snapshot id, or None if nothing has been published
+    """
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_snapshots(snapshot_dir: str) -> List[str]:
+    """
+    Ids of every complete snapshot, oldest first
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.exists(os.path.join(snapshot_dir, name, "manifest.json"))
+    )
+
+
+def publish(client: Any,
+            collection_names: List[str],
+            snapshot_dir: Optional[str] = None,
+            keep: Optional[int] = None
+) -> str:
+    """
+    Export collections as a new snapshot and make it current
+
+    Args:
+        client: ChromaDB client of the ingestion node
+        collection_names: Collections to include
+        snapshot_dir: Snapshot directory (config.SNAPSHOT_DIR by default)
+        keep: Number of snapshots to keep (config.SNAPSHOT_KEEP by default)
+
+    Returns:
+        str: Id of the published snapshot
+    """
+    from src import transfer
+
+    snapshot_dir = snapshot_dir or config.SNAPSHOT_DIR
+    keep = keep or config.SNAPSHOT_KEEP
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    now = time.time()
+    snapshot_id = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f".{int(now * 1e6) % 1_000_000:06d}"
+    tmp_path = os.path.join(snapshot_dir, f".{snapshot_id}.tmp")
+    os.makedirs(tmp_path)
+
+    collections = {}
+    for name in collection_names:
+        collection = client.get_collection(name=name)
+        manifest = transfer.export_collection(collection, os.path.join(tmp_path, f"{name}.zip"))
+        collections[name] = manifest["num_chunks"]
+
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump({"id": snapshot_id, "collections": collections, "published_at": time.time()}, f, indent=2)
+    os.replace(tmp_path, os.path.join(snapshot_dir, snapshot_id))
+
+    pointer = os.path.join(snapshot_dir, f".{CURRENT_FILE}.tmp")
+    with open(pointer, "w") as f:
+        f.write(snapshot_id)
+    os.replace(pointer, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    for old in list_snapshots(snapshot_dir)[:-keep]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+
+    logger.info(f"Published snapshot {snapshot_id}: {collections}")
+    return snapshot_id
+
+
+
+def _close_client(client: Any) -> None:
+    # ChromaDB caches one system per persist directory for the process;
+    # drop it so the directory can be removed and its memory released
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+        system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+        if system is not None:
+            system.stop()
+    except Exception as e:
+        logger.warning(f"Failed to close snapshot client: {e}")
+
+
+
+class SnapshotReplica:
+    """
+    Serves the current snapshot from a private local copy
+
+    Used as the client factory of a CollectionRegistry in read-only mode:
+    client() loads the current snapshot on first use, and a background
+    thread (start) swaps the registry over to newer snapshots. The copy
+    that was just replaced is kept until the next swap so requests still
+    running against it can finish.
+
+    Args:
+        snapshot_dir: Directory snapshots are published to
+        local_dir: Where this process keeps its loaded copies
+        poll_seconds: How often to check for a newer snapshot
+        embedding_function: Override the configured embedding function
+    """
+
+    def __init__(self,
+                 snapshot_dir: str,
+                 local_dir: Optional[str] = None,
+                 poll_seconds: float = 10.0,
+                 embedding_function: Optional[Any] = None):
+        self.snapshot_dir = snapshot_dir
+        self.local_dir = local_dir or os.path.join(tempfile.gettempdir(), "rag-replica")
+        self.poll_seconds = poll_seconds
+        self.embedding_function = embedding_function
+
+        self.snapshot_id: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.swaps = 0
+        self.failures = 0
+
+        self._client = None
+        self._path: Optional[str] = None
+        self._retired: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+
+    def load(self, snapshot_id: str) -> Tuple[Any, str]:
+        """
+        Load a snapshot into a new local database
+
+        Returns:
+            tuple: (chromadb.PersistentClient, local directory of the copy)
+        """
+        import chromadb
+        from src import parent_store, transfer
+
+        source = os.path.join(self.snapshot_dir, snapshot_id)
+        with open(os.path.join(source, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        os.makedirs(self.local_dir, exist_ok=True)
+        path = tempfile.mkdtemp(prefix=f"{snapshot_id}-", dir=self.local_dir)
+        started = time.perf_counter()
+
+        client = chromadb.PersistentClient(path=path)
+        parents = parent_store.ParentStore(os.path.join(path, PARENTS_FILE))
+        try:
+            for name in manifest["collections"]:
+                transfer.import_collection(client, os.path.join(source, f"{name}.zip"), name,
+                                           replace=True, embedding_function=self.embedding_function,
+                                           parents=parents, store_embeddings=False)
+        finally:
+            parents.close()
+
+        logger.info(f"Loaded snapshot {snapshot_id} ({len(manifest['collections'])} collections) "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return client, path
+
+
+    def client(self) -> Any:
+        """
+        Client of the loaded snapshot, loading the current one if needed
+
+        Raises:
+            SnapshotNotFound: If nothing has been published yet
+        """
+        from src import parent_store
+
+        with self._lock:
+            if self._client is None:
+                snapshot_id = current_snapshot(self.snapshot_dir)
+                if snapshot_id is None:
+                    raise SnapshotNotFound(f"No snapshot published in {self.snapshot_dir}")
+                self._client, self._path = self.load(snapshot_id)
+                parent_store.use_path(os.path.join(self._path, PARENTS_FILE))
+                self.snapshot_id = snapshot_id
+                self.loaded_at = time.time()
+            return self._client
+
+
+    def refresh(self, registry: "CollectionRegistry") -> bool:
+        """
+        Swap the registry to the current snapshot if it changed
+
+        Returns:
+            bool: True if a newer snapshot was loaded
+        """
+        from src import ann_index, chunk_store, exact_index, parent_store
+
+        snapshot_id = current_snapshot(self.snapshot_dir)
+        if snapshot_id is None or snapshot_id == self.snapshot_id:
+            return False
+
+        # Loading happens outside the lock; queries keep using the old copy
+        client, path = self.load(snapshot_id)
+
+        with self._lock:
+            if self._retired is not None:
+                old_client, old_path = self._retired
+                _close_client(old_client)
+                parent_store.close_store(os.path.join(old_path, PARENTS_FILE))
+                shutil.rmtree(old_path, ignore_errors=True)
+            if self._client is not None:
+                self._retired = (self._client, self._path)
+
+            self._client, self._path = client, path
+            parent_store.use_path(os.path.join(path, PARENTS_FILE))
+            self.snapshot_id = snapshot_id
+            self.loaded_at = time.time()
+            self.swaps += 1
+
+        registry.swap_client(client)
+        for name in registry.list_collections():
+            chunk_store.mark_stale(name)
+            ann_index.mark_stale(name)
+            exact_index.mark_stale(name)
+
+        logger.info(f"Now serving snapshot {snapshot_id}")
+        return True
+
+
+    def start(self, registry: "CollectionRegistry") -> None:
+        """
+        Poll for newer snapshots in a background thread
+        """
+        def run():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self.refresh(registry)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Failed to load snapshot: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="snapshot-poller", daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Replica metrics
+        """
+        return {
+            "snapshot_id": self.snapshot_id,
+            "loaded_at": self.loaded_at,
+            "swaps": self.swaps,
+            "failures": self.failures
+        }
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Publish snapshots for read replicas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = subparsers.add_parser("publish", help="Export collections as the current snapshot")
+    publish_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    publish_parser.add_argument("--collection", action="append", default=None,
+                                help="Collection to include (repeatable, all collections if omitted)")
+    publish_parser.add_argument("--snapshot-dir", default=config.SNAPSHOT_DIR)
+    publish_parser.add_argument("--keep", type=int, default=config.SNAPSHOT_KEEP)
+
+    list_parser = subparsers.add_parser("list", help="List published snapshots")
+    list_parser.add_argument("--snapshot-dir", default=config.SNAPSHOT_DIR)
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    if args.command == "publish":
+        import chromadb
+        client = chromadb.PersistentClient(path=args.db_path)
+        names = args.collection or sorted(c.name for c in client.list_collections())
+        snapshot_id = publish(client, names, args.snapshot_dir, args.keep)
+        print(f"Published snapshot {snapshot_id} with {len(names)} collections")
+
+    elif args.command == "list":
+        current = current_snapshot(args.snapshot_dir)
+        for snapshot_id in list_snapshots(args.snapshot_dir):
+            print(f"{'*' if snapshot_id == current else ' '} {snapshot_id}")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
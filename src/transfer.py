@@ -0,0 +1,294 @@
+"""
+Collection Transfer Module
+
+Exports a whole collection (ids, text, metadata, embeddings, plus the
+parent texts of parent-child chunks) to one compact file and imports it
+on another node, without re-embedding and without holding the collection
+in memory: both directions stream fixed-size pages.
+
+An export is a zip file:
+    manifest.json             collection name, embedding model, HNSW
+                              configuration, dimension, counts, pages
+    pages/000000.npy          float32 embeddings of page 0 (stored as is)
+    pages/000000.jsonl        {"id", "document", "metadata"} per chunk (deflated)
+    ...
+    parents.jsonl             parent texts, if the collection has any
+
+Usage:
+    python -m src.transfer export --collection ml_documents --output ml_documents.zip
+    python -m src.transfer import --input ml_documents.zip --target ml_documents --replace
+
+Run import while the API is stopped.
+"""
+
+import argparse
+import json
+import logging
+import time
+import zipfile
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+from src import config
+
+# numpy and chromadb are imported on first use
+if TYPE_CHECKING:
+    import chromadb
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DEFAULT_PAGE_SIZE = 1000
+
+
+def page_name(page: int, suffix: str) -> str:
+    return f"pages/{page:06d}.{suffix}"
+
+
+
+def export_collection(collection: "chromadb.Collection",
+                      path: str,
+                      page_size: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, Any]:
+    """
+    Write a collection to an export file
+
+    Args:
+        collection: ChromaDB collection to export
+        path: Output file
+        page_size: Chunks read from ChromaDB and written per page
+
+    Returns:
+        dict: The export's manifest
+    """
+    import numpy as np
+    from src import embeddings, parent_store
+
+    hnsw = {
+        key: value for key, value in (collection.configuration.get("hnsw") or {}).items()
+        if key in ("space", "ef_construction", "ef_search", "max_neighbors")
+    }
+    manifest = {
+        "format": FORMAT_VERSION,
+        "collection": collection.name,
+        "embedding_model": embeddings.stored_model_id(collection),
+        "metadata": dict(collection.metadata or {}),
+        "hnsw": hnsw,
+        "dim": None,
+        "num_chunks": 0,
+        "num_pages": 0,
+        "num_parents": 0,
+        "exported_at": time.time()
+    }
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        offset = 0
+        while True:
+            batch = collection.get(limit=page_size, offset=offset,
+                                   include=["embeddings", "documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            offset += len(batch["ids"])
+
+            vectors = np.asarray(batch["embeddings"], dtype=np.float32)
+            manifest["dim"] = int(vectors.shape[1])
+
+            page = manifest["num_pages"]
+            with archive.open(zipfile.ZipInfo(page_name(page, "npy")), "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, vectors)
+            with archive.open(page_name(page, "jsonl"), "w", force_zip64=True) as f:
+                for chunk_id, document, meta in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                    record = {"id": chunk_id, "document": document, "metadata": meta}
+                    f.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+
+            manifest["num_pages"] += 1
+            manifest["num_chunks"] += len(batch["ids"])
+
+        store = parent_store.get_store(create=False)
+        if store is not None and store.count(collection.name):
+            with archive.open("parents.jsonl", "w", force_zip64=True) as f:
+                for parent_id, source, text in store.items(collection.name):
+                    record = {"id": parent_id, "source": source, "text": text}
+                    f.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+                    manifest["num_parents"] += 1
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    logger.info(f"Exported {collection.name}: {manifest['num_chunks']} chunks in {manifest['num_pages']} pages to {path}")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    """
+    Manifest of an export file
+
+    Raises:
+        ValueError: If the file is not an export of a supported version
+    """
+    with zipfile.ZipFile(path) as archive:
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except KeyError:
+            raise ValueError(f"{path} is not a collection export (no manifest)")
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def import_collection(client: Any,
+                      path: str,
+                      target: Optional[str] = None,
+                      replace: bool = False,
+                      embedding_function: Optional[Any] = None,
+                      parents: Optional[Any] = None,
+                      store_embeddings: bool = True
+) -> "chromadb.Collection":
+    """
+    Create a collection from an export file
+
+    The collection is filled under a temporary name and renamed when
+    complete, so a failed import never leaves a partial collection behind.
+
+    Args:
+        client: ChromaDB client
+        path: Export file
+        target: Collection name (the exported name by default)
+        replace: Drop an existing collection of that name
+        embedding_function: Override the configured embedding function
+        parents: ParentStore to write parents to (the shared one if None)
+        store_embeddings: Record the chunks in the embedding store (when enabled)
+
+    Returns:
+        Collection: The imported collection
+
+    Raises:
+        ValueError: If the target exists and replace is False, or the file is invalid
+        EmbeddingModelMismatch: If the export was made with another model
+    """
+    import numpy as np
+    from chromadb.errors import NotFoundError
+    from src import ann_index, cache, chunk_store, embedding_store, embeddings, exact_index, parent_store
+
+    manifest = read_manifest(path)
+    target = target or manifest["collection"]
+
+    embedding_function = embedding_function or embeddings.get_embedding_function()
+    configured = embeddings.model_id(embedding_function)
+    if manifest["embedding_model"] and manifest["embedding_model"] != configured:
+        raise embeddings.EmbeddingModelMismatch(target, manifest["embedding_model"], configured)
+
+    if not replace:
+        try:
+            client.get_collection(name=target)
+            raise ValueError(f"Collection {target} already exists")
+        except NotFoundError:
+            pass
+
+    building = f"{target}-import"
+    try:
+        client.delete_collection(name=building)
+    except NotFoundError:
+        pass
+
+    collection = client.create_collection(
+        name=building,
+        embedding_function=embedding_function,
+        metadata={**manifest["metadata"], "embedding_model": configured},
+        configuration={"hnsw": manifest["hnsw"]} if manifest["hnsw"] else None
+    )
+
+    vector_store = None
+    if config.EMBEDDING_STORE_ENABLED and store_embeddings:
+        vector_store = embedding_store.get_store(configured)
+        # Chunks and parents of a replaced collection must not outlive it
+        vector_store.delete_collection(target)
+    if parents is None:
+        parents = parent_store.get_store(create=manifest["num_parents"] > 0)
+    if parents is not None:
+        parents.delete_collection(target)
+
+    with zipfile.ZipFile(path) as archive:
+        for page in range(manifest["num_pages"]):
+            with archive.open(page_name(page, "npy")) as f:
+                vectors = np.lib.format.read_array(f)
+            with archive.open(page_name(page, "jsonl")) as f:
+                records = [json.loads(line) for line in f]
+
+            ids = [record["id"] for record in records]
+            documents = [record["document"] for record in records]
+            metadatas = [record["metadata"] for record in records]
+            collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+
+            if vector_store is not None:
+                vector_store.put_vectors([embedding_store.content_hash(d) for d in documents], vectors)
+                vector_store.put_chunks(target, ids, documents, metadatas)
+
+        if manifest["num_parents"]:
+            with archive.open("parents.jsonl") as f:
+                batch = {}
+                for line in f:
+                    record = json.loads(line)
+                    batch[record["id"]] = (record["source"], record["text"])
+                    if len(batch) >= DEFAULT_PAGE_SIZE:
+                        parents.put_many(target, batch)
+                        batch = {}
+                if batch:
+                    parents.put_many(target, batch)
+
+    try:
+        client.delete_collection(name=target)
+    except NotFoundError:
+        pass
+    collection.modify(name=target)
+
+    chunk_store.mark_stale(target)
+    ann_index.mark_stale(target)
+    exact_index.mark_stale(target)
+    cache.invalidate(target)
+
+    logger.info(f"Imported {manifest['num_chunks']} chunks from {path} into {target}")
+    return collection
+
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Export and import collections")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a collection to a file")
+    export_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    export_parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    export_parser.add_argument("--output", required=True)
+    export_parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+
+    import_parser = subparsers.add_parser("import", help="Create a collection from an export")
+    import_parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    import_parser.add_argument("--input", required=True)
+    import_parser.add_argument("--target", default=None, help="Collection name (exported name if omitted)")
+    import_parser.add_argument("--replace", action="store_true", help="Replace an existing collection")
+
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+
+    import chromadb
+    client = chromadb.PersistentClient(path=args.db_path)
+
+    if args.command == "export":
+        collection = client.get_collection(name=args.collection)
+        manifest = export_collection(collection, args.output, args.page_size)
+        print(f"{args.collection}: {manifest['num_chunks']} chunks exported to {args.output}")
+
+    elif args.command == "import":
+        collection = import_collection(client, args.input, args.target, args.replace)
+        print(f"{collection.name}: {collection.count()} chunks imported from {args.input}")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""
+Upload Handling Module
+
+Streams uploaded files to disk in fixed-size chunks, hashing them
+incrementally and enforcing a maximum size, so that large uploads
+never have to be held in memory.
+
+Starlette spools a multipart body to disk before the endpoint sees the
+file, so the size limit is enforced on the raw request body by the
+BodySizeLimit middleware, while it arrives; the check in
+stream_upload_to_tempfile only applies to each file of a batch.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the upload per iteration
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Allowance for multipart boundaries and part headers around one file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+
+class UploadTooLarge(Exception):
+    """
+    Raised when an upload exceeds the configured maximum size
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+
+async def stream_upload_to_tempfile(
+        file: UploadFile,
+        max_bytes: int,
+        suffix: str = ".pdf",
+        chunk_size: int = UPLOAD_CHUNK_BYTES,
+        directory: Optional[str] = None
+) -> Tuple[str, int, str]:
+    """
+    Copy an upload to a temp file chunk by chunk
+
+    Args:
+        file: Uploaded file
+        max_bytes: Maximum allowed size, checked while streaming
+        suffix: Temp file suffix
+        chunk_size: Bytes read per iteration
+        directory: Directory for the temp file (system default if None)
+
+    Returns:
+        tuple: (temp file path, size in bytes, SHA-256 hex digest).
+            The caller owns the temp file and must remove it.
+
+    Raises:
+        UploadTooLarge: If the upload exceeds max_bytes (temp file is removed)
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+    temp_path = temp_file.name
+
+    try:
+        with temp_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+
+                digest.update(chunk)
+                await run_in_threadpool(temp_file.write, chunk)
+
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    logger.info(f"Streamed {file.filename} to {temp_path} ({size} bytes)")
+    return temp_path, size, digest.hexdigest()
+
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware that enforces a request body limit before parsing
+
+    A request whose Content-Length exceeds the limit for its path is
+    answered with 413 without reading the body. Bodies without a length
+    (chunked) are counted as they arrive and parsing is aborted with 413
+    once the limit is passed, so an oversized upload is never spooled
+    to disk in full.
+
+    Args:
+        app: ASGI application
+        limit_for: Maximum body bytes for a request path, None for no limit
+    """
+
+    def __init__(self, app, limit_for: Callable[[str], Optional[int]]):
+        self.app = app
+        self.limit_for = limit_for
+
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            logger.warning(f"Refused {scope['path']} body of {int(length)} bytes (limit {limit})")
+            response = JSONResponse({"detail": str(UploadTooLarge(limit))}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing as is
+                    raise HTTPException(status_code=413, detail=str(UploadTooLarge(limit)))
+            return message
+
+        await self.app(scope, limited_receive, send)
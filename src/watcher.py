@@ -0,0 +1,248 @@
+"""
+Directory Watcher Module
+
+Keeps a collection in sync with a folder of documents (any format in
+src.loaders): new or modified files
+are (re-)ingested with the same chunking pipeline as process_and_store_pdf
+and removed files have their chunks deleted, so the index stays fresh
+without full re-ingestion.
+
+Documents are stored under their path relative to the watched directory
+(e.g. 2024/report.pdf), the same names src.ingest gives a directory's
+files, so equally named files in different folders stay apart.
+
+The watcher writes from its own process, so a running API only learns of
+its writes through a shared cache backend (CACHE_BACKEND=sqlite or redis):
+without one, cached answers and query embeddings are not invalidated and
+local indexes notice the writes only at their periodic size checks.
+
+Usage:
+    python -m src.watcher /shared/pdfs --debounce-ms 2000
+"""
+
+import argparse
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple, TYPE_CHECKING
+
+from watchfiles import watch, Change, DefaultFilter
+
+from src import cache
+from src import config
+from src import document_processor
+from src import embeddings
+from src import loaders
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_MS = 1600
+
+
+
+class DocumentFilter(DefaultFilter):
+    """
+    watchfiles filter that only passes files of supported formats
+    """
+
+    def __call__(self, change: Change, path: str) -> bool:
+        return loaders.is_supported(path) and super().__call__(change, path)
+
+
+
+def source_name(path: str, directory: Optional[str] = None) -> str:
+    """
+    Source a file's chunks are stored under: its path relative to the
+    watched directory, or its file name without one
+    """
+    if directory is None:
+        return os.path.basename(path)
+    return os.path.relpath(path, directory).replace(os.sep, "/")
+
+
+def sync_file(path: str,
+              collection: "chromadb.Collection",
+              directory: Optional[str] = None
+) -> str:
+    """
+    Bring one document's chunks in line with the file on disk
+
+    Unchanged files (same content hash as the stored chunks) are skipped.
+    Changed files replace their old chunks, so paragraphs that disappeared
+    from the file do not linger in the index.
+
+    Args:
+        path: Path to the document
+        collection: ChromaDB collection to update
+        directory: Watched directory the source name is relative to
+
+    Returns:
+        str: 'unchanged', 'ingested' or 'failed'
+    """
+    source = source_name(path, directory)
+    doc_hash = document_processor.file_sha256(path)
+
+    if document_processor.get_document_hash(source, collection) == doc_hash:
+        logger.info(f"Unchanged: {source}")
+        return "unchanged"
+
+    chunks = document_processor.chunk_document(path, overlap=100, source=source)
+    num_chunks = document_processor.replace_document(source, chunks, collection, {"doc_hash": doc_hash})
+
+    if num_chunks == 0:
+        logger.warning(f"No chunks stored for {source}")
+        return "failed"
+
+    logger.info(f"Ingested {source}: {num_chunks} chunks")
+    return "ingested"
+
+
+def handle_changes(changes: Iterable[Tuple[Change, str]],
+                   collection: "chromadb.Collection",
+                   directory: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Apply one debounced batch of file system changes
+
+    Several events for the same path collapse into a single action based
+    on whether the file still exists.
+
+    Args:
+        changes: (Change, path) pairs from watchfiles
+        collection: ChromaDB collection to update
+        directory: Watched directory (see source_name)
+
+    Returns:
+        dict: path -> action taken ('deleted', 'unchanged', 'ingested', 'failed')
+    """
+    paths: Set[str] = {path for _, path in changes}
+    actions = {}
+
+    for path in sorted(paths):
+        try:
+            if os.path.exists(path):
+                actions[path] = sync_file(path, collection, directory)
+            else:
+                document_processor.delete_document(source_name(path, directory), collection)
+                actions[path] = "deleted"
+        except Exception as e:
+            logger.error(f"Failed to sync {path}: {e}")
+            actions[path] = "failed"
+
+    return actions
+
+
+def initial_sync(directory: str,
+                 collection: "chromadb.Collection",
+                 prune: bool = False
+) -> Dict[str, str]:
+    """
+    Sync every document currently in the directory
+
+    Args:
+        directory: Watched directory
+        collection: ChromaDB collection to update
+        prune: Also delete chunks whose source file is not in the directory
+
+    Returns:
+        dict: path or source -> action taken
+    """
+    changes = set()
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if loaders.is_supported(filename):
+                changes.add((Change.added, os.path.join(root, filename)))
+
+    actions = handle_changes(changes, collection, directory)
+
+    if prune:
+        on_disk = {source_name(path, directory) for _, path in changes}
+        stored = {meta["source"] for meta in collection.get(include=["metadatas"])["metadatas"]}
+        for source in sorted(stored - on_disk):
+            document_processor.delete_document(source, collection)
+            actions[source] = "deleted"
+
+    return actions
+
+
+def watch_directory(directory: str,
+                    collection: "chromadb.Collection",
+                    debounce_ms: int = DEFAULT_DEBOUNCE_MS,
+                    stop_event: Optional[threading.Event] = None
+) -> None:
+    """
+    Watch a directory and apply changes until stopped
+
+    Args:
+        directory: Directory to watch (recursively)
+        collection: ChromaDB collection to update
+        debounce_ms: Quiet period before a batch of changes is applied
+        stop_event: Event that ends the watch when set
+    """
+    logger.info(f"Watching {directory} (debounce {debounce_ms}ms)")
+
+    for changes in watch(
+            directory,
+            watch_filter=DocumentFilter(),
+            debounce=debounce_ms,
+            stop_event=stop_event
+    ):
+        actions = handle_changes(changes, collection, directory)
+        logger.info(f"Applied {len(actions)} changes")
+
+
+
+def check_shared_cache() -> bool:
+    """
+    Warn when the API cannot see this process's writes through the cache
+
+    Returns:
+        bool: True if the cache backend is shared
+    """
+    if cache.is_shared():
+        return True
+    logger.warning(
+        f"CACHE_BACKEND={config.CACHE_BACKEND} is not shared with the API: its cached answers "
+        f"will not be invalidated by the watcher's writes. Use CACHE_BACKEND=sqlite or redis "
+        f"in both processes."
+    )
+    return False
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point
+    """
+    parser = argparse.ArgumentParser(description="Watch a directory and keep ChromaDB in sync")
+    parser.add_argument("directory", help="Directory of documents to watch")
+    parser.add_argument("--db-path", default=config.CHROMA_DB_PATH)
+    parser.add_argument("--collection", default=config.COLLECTION_NAME)
+    parser.add_argument("--debounce-ms", type=int, default=DEFAULT_DEBOUNCE_MS)
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete chunks for sources not present in the directory at startup")
+    args = parser.parse_args(argv)
+
+    config.setup_logging()
+    check_shared_cache()
+
+    import chromadb
+    client = chromadb.PersistentClient(path=args.db_path)
+    collection = embeddings.open_collection(client, args.collection, create=True)
+
+    initial_sync(args.directory, collection, prune=args.prune)
+
+    try:
+        watch_directory(args.directory, collection, debounce_ms=args.debounce_ms)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+
+    return 0
+
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""
+Shared test fixtures
+
+Tests avoid the default ONNX embedding model (which is downloaded on
+first use) by giving collections a cheap deterministic embedding.
+"""
+
+import hashlib
+import uuid
+
+import numpy as np
+import pytest
+import chromadb
+from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+
+@register_embedding_function
+class HashEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Deterministic bag-of-words hashing embedding for tests
+    """
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def __call__(self, input: Documents) -> Embeddings:
+        vectors = []
+        for text in input:
+            vec = np.zeros(self.dim, dtype=np.float32)
+            for word in text.lower().split():
+                digest = hashlib.md5(word.encode()).digest()
+                vec[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+            norm = np.linalg.norm(vec)
+            vectors.append(vec / norm if norm > 0 else vec)
+        return vectors
+
+    @staticmethod
+    def name() -> str:
+        return "test-hash"
+
+    def get_config(self):
+        return {"dim": self.dim}
+
+    @staticmethod
+    def build_from_config(config):
+        return HashEmbeddingFunction(config.get("dim", 64))
+
+
+def make_pdf(path, pages):
+    """
+    Write a text PDF
+
+    Args:
+        path: Output path
+        pages: List of pages, each a list of paragraph strings
+    """
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    font_ref = writer._add_object(font)
+
+    for paragraphs in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})
+        })
+        text = "\\n\\n".join(paragraphs)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 11 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+
+    writer.write(str(path))
+    return path
+
+
+@pytest.fixture
+def memory_client():
+    """In-memory ChromaDB client"""
+    return chromadb.EphemeralClient()
+
+
+@pytest.fixture
+def memory_collection(memory_client):
+    """In-memory collection with the hashing embedding function"""
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    collection = memory_client.create_collection(name=name, embedding_function=HashEmbeddingFunction())
+    yield collection
+    memory_client.delete_collection(name)
+
+
+@pytest.fixture
+def api_collection(monkeypatch, memory_client, memory_collection):
+    """Point the API's collection registry at memory_collection as its default"""
+    from src import api
+    from src.registry import CollectionRegistry
+
+    registry = CollectionRegistry(
+        client_factory=lambda: memory_client,
+        default_name=memory_collection.name,
+        embedding_function=HashEmbeddingFunction()
+    )
+    monkeypatch.setattr(api, "registry", registry)
+    return memory_collection
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """Small two-page PDF"""
+    return make_pdf(tmp_path / "sample.pdf", [
+        ["Total Defence has six pillars.", "Military defence is the first pillar."],
+        ["Civil defence protects the population."]
+    ])
@@ -0,0 +1,87 @@
+"""
+Admission control tests
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api
+from src.admission import ConcurrencyLimiter, TokenBucketRateLimiter, AdmissionRejected
+
+client = TestClient(api.app)
+
+
+def test_limiter_rejects_when_queue_full():
+    """Test requests beyond concurrency + queue are rejected immediately"""
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await limiter.acquire()
+        assert exc.value.status_code == 503
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 0
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_wait_timeout():
+    """Test queued requests give up after max_wait"""
+    async def scenario():
+        limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=4, max_wait=0.05)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected) as exc:
+            await limiter.acquire()
+        assert exc.value.reason == "test_wait_timeout"
+        assert limiter.queue_depth == 0
+        assert limiter.snapshot()["rejected_timeout"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills():
+    """Test token bucket allows burst then refills at rate"""
+    bucket = TokenBucketRateLimiter(rate=1.0, burst=2)
+    bucket.check("client", now=0.0)
+    bucket.check("client", now=0.0)
+
+    with pytest.raises(AdmissionRejected) as exc:
+        bucket.check("client", now=0.0)
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after == 1
+
+    # Other clients are unaffected, and tokens come back over time
+    bucket.check("other", now=0.0)
+    bucket.check("client", now=1.0)
+
+
+def test_query_rate_limited_returns_429(monkeypatch):
+    """Test /query returns 429 with Retry-After when client is out of tokens"""
+    monkeypatch.setattr(api, "rate_limiter", TokenBucketRateLimiter(rate=0.01, burst=0))
+
+    response = client.post("/query", json={"question": "test", "n_results": 3})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_query_saturated_returns_503(monkeypatch):
+    """Test /query returns 503 when no slot or queue space is available"""
+    monkeypatch.setattr(api.query_limiter, "max_concurrency", 0)
+    monkeypatch.setattr(api.query_limiter, "max_queue", 0)
+
+    response = client.post("/query", json={"question": "test", "n_results": 3})
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+    data = client.get("/metrics").json()
+    assert data["admission"]["query"]["rejected_queue_full"] >= 1
@@ -0,0 +1,234 @@
+"""
+Local ANN and exact index tests
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src import ann_index, cache, config, document_processor, exact_index, rag_engine
+from tests.conftest import HashEmbeddingFunction, make_pdf
+
+
+def clustered_vectors(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(20, dim))
+    vectors = centres[rng.integers(20, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def vector_collection(memory_client):
+    vectors = clustered_vectors(2000, 32)
+    collection = memory_client.create_collection("ann-test")
+    collection.add(ids=[f"id{i}" for i in range(len(vectors))], embeddings=vectors)
+    yield collection, vectors
+    memory_client.delete_collection("ann-test")
+
+
+@pytest.mark.parametrize("quantization,rescore", [("int8", 100), ("binary", 400)])
+def test_ivf_recall_and_exact_distances(vector_collection, tmp_path, quantization, rescore):
+    """Test the index finds the true neighbours and re-scores exactly"""
+    collection, vectors = vector_collection
+    ann_index.build(collection, str(tmp_path / "index"), quantization=quantization)
+    index = ann_index.open_current(str(tmp_path / "index"))
+
+    queries = clustered_vectors(20, 32, seed=1)
+    hits = 0
+    for query in queries:
+        exact = np.argsort(((vectors - query) ** 2).sum(axis=1))[:10]
+        ids, distances, found = index.search(query, 10, nprobe=16, rescore=rescore)
+        hits += len({f"id{i}" for i in exact} & set(ids))
+
+        assert distances == sorted(distances)
+        assert np.allclose(distances, ((found - query) ** 2).sum(axis=1), atol=1e-5)
+
+    assert hits / (10 * len(queries)) >= 0.9
+
+
+def test_retrieval_uses_index_until_collection_changes(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test queries go through the index and writes send them back to ChromaDB"""
+    monkeypatch.setattr(config, "ANN_INDEX_COLLECTIONS", {memory_collection.name})
+    monkeypatch.setattr(config, "ANN_INDEX_DIR", str(tmp_path / "ann"))
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    ann_index.rebuild(memory_collection)
+
+    searched = []
+    original_search = ann_index.IVFIndex.search
+    monkeypatch.setattr(ann_index.IVFIndex, "search", lambda self, *args: searched.append(1) or original_search(self, *args))
+    monkeypatch.setattr(ann_index, "rebuild_in_background", lambda collection: None)
+
+    retrieved = rag_engine.retrieve_chunks("civil defence population", memory_collection, 1)
+    assert retrieved["documents"] == ["Civil defence protects the population."]
+    assert retrieved["metadatas"][0]["page_num"] == 2
+    assert searched == [1]
+
+    ann_index.mark_stale(memory_collection.name)
+    assert ann_index.get_index(memory_collection) is None
+    assert rag_engine.retrieve_chunks("civil defence population", memory_collection, 1)["documents"]
+    assert searched == [1]
+
+
+def test_index_follows_other_processes(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test writes and rebuilds made elsewhere are picked up by the recheck"""
+    monkeypatch.setattr(config, "ANN_INDEX_COLLECTIONS", {memory_collection.name})
+    monkeypatch.setattr(config, "ANN_INDEX_DIR", str(tmp_path / "ann"))
+    monkeypatch.setattr(config, "ANN_INDEX_RECHECK_SECONDS", 0)
+    monkeypatch.setattr(ann_index, "rebuild_in_background", lambda collection: None)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    ann_index.rebuild(memory_collection)
+    assert len(ann_index.get_index(memory_collection)) == 3
+
+    # Another worker stores a chunk (without this process's mark_stale)...
+    memory_collection.add(ids=["other"], documents=["Written by another worker."])
+    assert ann_index.get_index(memory_collection) is None
+
+    # ...and rebuilds the index on disk
+    path = ann_index.index_path(memory_collection.name)
+    for _ in range(3):
+        ann_index.build(memory_collection, path)
+    monkeypatch.setitem(ann_index._stale, memory_collection.name, False)
+    assert len(ann_index.get_index(memory_collection)) == 4
+    assert len([name for name in os.listdir(path) if name.startswith("v")]) == ann_index.KEEP_VERSIONS
+
+
+def test_index_behind_write_generation_is_stale(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test a write seen through the shared generation retires the index at once"""
+    monkeypatch.setattr(config, "ANN_INDEX_COLLECTIONS", {memory_collection.name})
+    monkeypatch.setattr(config, "ANN_INDEX_DIR", str(tmp_path / "ann"))
+    monkeypatch.setattr(config, "ANN_INDEX_RECHECK_SECONDS", 3600)
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(ann_index, "rebuild_in_background", lambda collection: None)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    ann_index.rebuild(memory_collection)
+    assert ann_index.get_index(memory_collection) is not None
+
+    # Another worker replaces a chunk in place: same size, newer generation
+    chunk_id = memory_collection.get()["ids"][0]
+    memory_collection.update(ids=[chunk_id], documents=["Rewritten by another worker."])
+    cache.invalidate(memory_collection.name)
+    assert ann_index.get_index(memory_collection) is None
+
+
+def test_exact_batch_search_matches_chroma(vector_collection):
+    """Test brute-force batch results and distances equal ChromaDB's and per-query search"""
+    collection, vectors = vector_collection
+    index = exact_index.build(collection)
+    queries = clustered_vectors(5, 32, seed=2)
+
+    results = index.search_batch(queries, 5)
+    for query, (ids, distances, found) in zip(queries, results):
+        single = index.search(query, 5)
+        assert single[0] == ids and np.allclose(single[1], distances) and np.array_equal(single[2], found)
+    chroma = collection.query(query_embeddings=queries, n_results=5, include=["distances"])
+
+    for (ids, distances, found), chroma_ids, chroma_distances in zip(results, chroma["ids"], chroma["distances"]):
+        assert ids == chroma_ids
+        assert np.allclose(distances, chroma_distances, atol=1e-4)
+        assert np.allclose(found, vectors[[int(i[2:]) for i in ids]], atol=1e-6)
+
+
+def test_exact_index_auto_selected_below_threshold(memory_collection, sample_pdf, monkeypatch, tmp_path):
+    """Test small collections use brute force and reload after writes"""
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_CHUNKS", 2)
+    assert exact_index.get_index(memory_collection) is None
+
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_CHUNKS", 100)
+    index = exact_index.get_index(memory_collection)
+    assert len(index) == 3
+
+    more = make_pdf(tmp_path / "more.pdf", [["Digital defence guards against cyber threats."]])
+    document_processor.process_and_store_pdf(str(more), memory_collection)
+    assert len(exact_index.get_index(memory_collection)) == 4
+
+    retrieved = rag_engine.retrieve_chunks("digital defence guards", memory_collection, 1)
+    assert retrieved["documents"] == ["Digital defence guards against cyber threats."]
+
+
+def test_exact_index_follows_write_generation(memory_collection, sample_pdf, monkeypatch):
+    """Test a write elsewhere that keeps the count still reloads the matrix"""
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_CHUNKS", 100)
+    monkeypatch.setattr(config, "EXACT_SEARCH_REFRESH_SECONDS", 3600)
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "_cache", None)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    index = exact_index.get_index(memory_collection)
+    assert exact_index.get_index(memory_collection) is index
+
+    # Another process rewrites a chunk in place and bumps the generation
+    chunk_id = memory_collection.get(limit=1)["ids"][0]
+    memory_collection.update(ids=[chunk_id], documents=["Psychological defence counters disinformation."])
+    cache.invalidate(memory_collection.name)
+
+    reloaded = exact_index.get_index(memory_collection)
+    assert reloaded is not index and len(reloaded) == len(index)
+    query = HashEmbeddingFunction()(["Psychological defence counters disinformation."])[0]
+    assert reloaded.search(query, 1)[0] == [chunk_id]
+
+
+def test_concurrent_exact_searches_share_one_batch(vector_collection, monkeypatch):
+    """Test queries arriving together go through one search_batch call"""
+    collection, vectors = vector_collection
+    index = exact_index.build(collection)
+    queries = clustered_vectors(4, 32, seed=3)
+    monkeypatch.setattr(config, "QUERY_BATCH_WINDOW_MS", 200)
+    monkeypatch.setattr(exact_index, "_batcher", None)
+
+    batch_sizes = []
+    original = exact_index.ExactIndex.search_batch
+    monkeypatch.setattr(exact_index.ExactIndex, "search_batch",
+                        lambda self, q, k: batch_sizes.append(len(q)) or original(self, q, k))
+
+    results = {}
+    barrier = threading.Barrier(len(queries))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = exact_index.search(index, queries[i], 3 + i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert batch_sizes == [len(queries)]
+    for i, query in enumerate(queries):
+        assert results[i][0] == index.search(query, 3 + i)[0]
+
+
+def test_exact_index_built_once_under_concurrency(memory_collection, sample_pdf, monkeypatch):
+    """Test concurrent requests for a stale index trigger a single rebuild"""
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_CHUNKS", 100)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+
+    builds = []
+    original = exact_index.build
+
+    def slow_build(collection):
+        builds.append(1)
+        time.sleep(0.2)
+        return original(collection)
+
+    monkeypatch.setattr(exact_index, "build", slow_build)
+    barrier = threading.Barrier(4)
+    found = []
+
+    def worker():
+        barrier.wait()
+        found.append(exact_index.get_index(memory_collection))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert all(index is found[0] for index in found)
@@ -3,8 +3,11 @@
 Basic API tests for RAG Research Assistant
 """
 
+import time
+
 import pytest
 from fastapi.testclient import TestClient
+from src import api
 from src.api import app
 
 client = TestClient(app)
@@ -89,4 +92,27 @@ def test_docs_endpoint():
 def test_redoc_endpoint():
     """Test ReDoc documentation is available"""
     response = client.get("/redoc")
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_ready_endpoint_before_warmup(monkeypatch):
+    """Test readiness reports 503 until warmup has completed"""
+    monkeypatch.setitem(api.startup, "status", "starting")
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+
+def test_ready_after_warmup(api_collection):
+    """Test warmup runs in the lifespan and records a startup breakdown"""
+    with TestClient(api.app) as warm_client:
+        deadline = time.time() + 10
+        response = warm_client.get("/ready")
+        while response.status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+            response = warm_client.get("/ready")
+
+    assert response.status_code == 200
+    timings = response.json()["startup_seconds"]
+    for phase in ["import", "chroma_client", "open_collection", "embedding_and_index", "warmup_total"]:
+        assert phase in timings
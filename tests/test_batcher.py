@@ -0,0 +1,71 @@
+"""
+Micro-batcher tests
+"""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api
+from src.batcher import MicroBatcher
+
+
+def run_concurrently(batcher, items):
+    results = {}
+    barrier = threading.Barrier(len(items))
+
+    def worker(item):
+        barrier.wait()
+        results[item] = batcher.submit(item)
+
+    threads = [threading.Thread(target=worker, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_batches():
+    """Test items arriving together are processed in one call each with its own result"""
+    sizes = []
+
+    def square(items):
+        sizes.append(len(items))
+        return [item * item for item in items]
+
+    batcher = MicroBatcher(square, window_ms=100, max_batch=4)
+    results = run_concurrently(batcher, list(range(8)))
+
+    assert results == {i: i * i for i in range(8)}
+    assert max(sizes) <= 4
+    assert len(sizes) < 8
+
+    stats = batcher.snapshot()
+    assert stats["items"] == 8
+    assert stats["batches"] == len(sizes)
+    assert stats["mean_batch_size"] > 1
+    assert stats["max_queue_wait_ms"] >= stats["mean_queue_wait_ms"] > 0
+
+
+def test_batch_failure_reaches_every_caller():
+    """Test an exception in the batch function is raised to each waiter"""
+    def fail(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(fail, window_ms=1)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.submit("question")
+    assert batcher.snapshot()["failures"] == 1
+
+
+def test_query_embeddings_are_batched(api_collection, monkeypatch):
+    """Test retrieval goes through the query batcher and shows up in /metrics"""
+    from src import rag_engine
+
+    api_collection.add(ids=["a"], documents=["civil defence"], metadatas=[{"source": "x.pdf", "page_num": 1}])
+    rag_engine.retrieve_chunks("civil defence", api_collection, 1)
+
+    query_metrics = TestClient(api.app).get("/metrics").json()["query_embedding"]
+    assert query_metrics["test-hash"]["items"] >= 1
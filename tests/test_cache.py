@@ -0,0 +1,112 @@
+"""
+Answer and embedding cache tests
+"""
+
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api, cache, config, document_processor, embeddings, rag_engine
+
+
+@pytest.fixture
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_BACKEND", request.param)
+    monkeypatch.setattr(config, "CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "_stats", {})
+    return request.param
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"], indirect=True)
+def test_backend_get_set_expiry_and_counter(backend):
+    """Test values, expiry and counters behave the same on each backend"""
+    store = cache.get_cache()
+
+    store.set("a", b"value")
+    store.set("b", b"short", ttl=0.05)
+    assert store.get("a") == b"value"
+    assert store.get("b") == b"short"
+    time.sleep(0.1)
+    assert store.get("b") is None
+
+    assert store.incr("gen") == 1
+    assert store.incr("gen") == 2
+    assert store.get("gen") == b"2"
+
+
+def test_sqlite_cache_is_shared_between_connections(tmp_path):
+    """Test an invalidation by one process is seen by another"""
+    path = str(tmp_path / "shared.sqlite3")
+    first, second = cache.SQLiteCache(path), cache.SQLiteCache(path)
+
+    first.set("answer", b"cached")
+    assert second.get("answer") == b"cached"
+    second.incr("gen:docs")
+    assert first.get("gen:docs") == b"1"
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_answers_cached_until_collection_changes(backend, api_collection, monkeypatch):
+    """Test repeated questions skip the pipeline until a write bumps the generation"""
+    calls = []
+
+    def fake_query(question, collection, n_results, where, mmr_lambda):
+        calls.append(question)
+        return {"answer": f"answer {len(calls)}", "sources": ["a.pdf (Page 1)"], "context_chunks": ["x"]}
+
+    monkeypatch.setattr(rag_engine, "query_rag_system", fake_query)
+    client = TestClient(api.app)
+
+    first = client.post("/query", json={"question": "What is civil defence?"}).json()
+    second = client.post("/query", json={"question": "What is civil defence?"}).json()
+    assert first == second
+    assert len(calls) == 1
+
+    client.post("/query", json={"question": "What is civil defence?", "n_results": 5})
+    assert len(calls) == 2
+
+    document_processor.store_chunks(
+        [{"text": "Civil defence.", "page_num": 1, "chunk_id": "c0", "source": "b.pdf"}], api_collection
+    )
+    third = client.post("/query", json={"question": "What is civil defence?"}).json()
+    assert third["answer"] == "answer 3"
+
+    assert client.get("/metrics").json()["cache"]["answer"] == {"hits": 1, "misses": 3}
+
+
+@pytest.mark.parametrize("backend", ["memory"], indirect=True)
+def test_query_embeddings_cached(backend, memory_collection, monkeypatch):
+    """Test a repeated question is not embedded again"""
+    embedded = []
+    original = embeddings.collection_embedding_function(memory_collection)
+
+    def counting_embed(input):
+        embedded.extend(input)
+        return original(input)
+
+    embeddings.bind_embedding_function(memory_collection, counting_embed)
+    monkeypatch.setattr(config, "QUERY_BATCH_WINDOW_MS", 0)
+
+    first = embeddings.embed_queries(memory_collection, ["civil defence", "total defence"])
+    second = embeddings.embed_queries(memory_collection, ["total defence", "digital defence"])
+
+    assert embedded == ["civil defence", "total defence", "digital defence"]
+    assert np.array_equal(first[1], second[0])
+
+
+@pytest.mark.parametrize("backend", ["memory"], indirect=True)
+def test_generation_survives_backend_errors(backend, monkeypatch):
+    """Test a failing backend keeps the last generation instead of raising"""
+    cache.invalidate("docs")
+    cache.invalidate("docs")
+    assert cache.generation("docs") == 2
+
+    def fail(key):
+        raise ConnectionError("cache down")
+
+    monkeypatch.setattr(cache.get_cache(), "get", fail)
+    assert cache.generation("docs") == 2
+    assert cache.generation("never-read") == 0
@@ -0,0 +1,86 @@
+"""
+Chunk offset and structured citation tests
+"""
+
+from fastapi.testclient import TestClient
+
+from src import api, document_processor, rag_engine
+from tests.conftest import make_pdf
+
+
+def test_chunks_record_their_span_in_the_page(sample_pdf):
+    """Test char_start/char_end point back at the chunk text in its page"""
+    pages = document_processor.extract_text_from_pdf(str(sample_pdf))["pages"]
+
+    for child_size in (0, 60):
+        chunks = document_processor.chunk_pdf_by_pages(str(sample_pdf), child_size=child_size)
+        assert chunks
+        for chunk in chunks:
+            page = pages[chunk["page_num"] - 1]
+            assert page[chunk["char_start"]:chunk["char_end"]] == chunk["text"]
+
+
+def test_overlapping_chunks_are_located_in_order():
+    """Test repeated and overlapping chunks map to successive spans"""
+    text = "alpha beta alpha beta gamma"
+    spans = document_processor.locate_chunks(text, ["alpha beta", "beta alpha", "alpha beta", "missing"])
+    assert spans == [(0, 10), (6, 16), (11, 21), None]
+
+
+def test_offsets_are_stored_as_metadata(tmp_path, memory_collection):
+    """Test offsets survive store_chunks"""
+    pdf = make_pdf(tmp_path / "offsets.pdf", [["First paragraph here.", "Second paragraph there."]])
+    document_processor.store_chunks(document_processor.chunk_pdf_by_pages(str(pdf), child_size=0),
+                                    memory_collection)
+
+    stored = memory_collection.get(include=["documents", "metadatas"])
+    for document, meta in zip(stored["documents"], stored["metadatas"]):
+        assert meta["char_end"] - meta["char_start"] == len(document)
+
+
+def test_citations_group_by_document_in_relevance_order():
+    """Test one citation per document, ordered by its best chunk"""
+    metadatas = [
+        {"source": "b.pdf", "page_num": 7, "chunk_id": "b7", "char_start": 10, "char_end": 50, "relevance": 0.9},
+        {"source": "a.pdf", "page_num": 2, "chunk_id": "a2", "relevance": 0.8},
+        {"source": "b.pdf", "page_num": 3, "chunk_id": "b3", "relevance": 0.7},
+        {"source": "b.pdf", "page_num": 7, "chunk_id": "b7x", "relevance": 0.6},
+        {"source": "c.pdf"}
+    ]
+    citations = rag_engine.extract_citations(metadatas)
+
+    assert [c["source"] for c in citations] == ["b.pdf", "a.pdf", "c.pdf"]
+    assert citations[0]["relevance"] == 0.9
+    assert citations[0]["pages"] == [7, 3]
+    assert [span["chunk_id"] for span in citations[0]["spans"]] == ["b7", "b3", "b7x"]
+    assert citations[0]["spans"][0]["char_start"] == 10
+    assert citations[2]["pages"] == []
+
+    # Missing page numbers no longer raise
+    assert rag_engine.extract_sources(metadatas) == [
+        "b.pdf (Page 7)", "b.pdf (Page 3)", "a.pdf (Page 2)", "c.pdf (Page ?)"
+    ]
+
+
+def test_search_returns_citations_with_relevance(api_collection):
+    """Test retrieval adds relevance and /search returns citations"""
+    api_collection.add(
+        ids=["c0", "c1"],
+        documents=["civil defence protects the population", "digital defence secures networks"],
+        metadatas=[
+            {"source": "handbook.pdf", "page_num": 1, "char_start": 0, "char_end": 37},
+            {"source": "handbook.pdf", "page_num": 2, "char_start": 5, "char_end": 37}
+        ]
+    )
+    response = TestClient(api.app).post("/search", json={"question": "civil defence protects the population"})
+    assert response.status_code == 200
+
+    body = response.json()
+    assert body["results"][0]["metadata"]["relevance"] > 0.99
+    assert len(body["citations"]) == 1
+    citation = body["citations"][0]
+    assert citation["source"] == "handbook.pdf"
+    assert citation["spans"][0] == {
+        "chunk_id": None, "page": 1, "char_start": 0, "char_end": 37,
+        "relevance": body["results"][0]["metadata"]["relevance"]
+    }
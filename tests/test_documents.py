@@ -0,0 +1,90 @@
+"""
+Document delete/replace and maintenance tests
+"""
+
+import chromadb
+from fastapi.testclient import TestClient
+
+from src import api, document_processor, maintenance
+from tests.conftest import make_pdf, HashEmbeddingFunction
+
+
+def test_delete_document_endpoint(api_collection, sample_pdf, tmp_path):
+    """Test DELETE removes only the named document's chunks"""
+    document_processor.process_and_store_pdf(str(sample_pdf), api_collection, source="a.pdf")
+    other = make_pdf(tmp_path / "b.pdf", [["Another document."]])
+    document_processor.process_and_store_pdf(str(other), api_collection)
+
+    client = TestClient(api.app)
+    response = client.delete("/documents/a.pdf")
+
+    assert response.status_code == 200
+    assert response.json()["num_chunks_deleted"] == 3
+    assert [m["source"] for m in api_collection.get()["metadatas"]] == ["b.pdf"]
+
+    assert client.delete("/documents/a.pdf").status_code == 404
+
+
+def test_replace_document_endpoint(api_collection, sample_pdf, tmp_path):
+    """Test PUT replaces chunks and drops stale ones"""
+    document_processor.process_and_store_pdf(str(sample_pdf), api_collection, source="report.pdf")
+    updated = make_pdf(tmp_path / "v2.pdf", [["Total Defence has six pillars.", "A brand new paragraph."]])
+
+    with TestClient(api.app) as client:
+        with open(updated, "rb") as f:
+            response = client.put("/documents/report.pdf", files={"file": ("v2.pdf", f, "application/pdf")})
+        with open(updated, "rb") as f:
+            again = client.put("/documents/report.pdf", files={"file": ("v2.pdf", f, "application/pdf")})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "replaced"
+    assert again.json()["status"] == "unchanged"
+    assert sorted(api_collection.get()["documents"]) == [
+        "A brand new paragraph.",
+        "Total Defence has six pillars.",
+    ]
+
+
+
+def test_document_ids_with_slashes(api_collection, sample_pdf, tmp_path):
+    """Test PUT and DELETE accept document ids containing '/'"""
+    updated = make_pdf(tmp_path / "v2.pdf", [["A brand new paragraph."]])
+
+    with TestClient(api.app) as client:
+        with open(updated, "rb") as f:
+            response = client.put("/documents/reports/2024/q1.pdf", files={"file": ("v2.pdf", f, "application/pdf")})
+        assert response.status_code == 200
+        assert response.json()["filename"] == "reports/2024/q1.pdf"
+        assert [m["source"] for m in api_collection.get()["metadatas"]] == ["reports/2024/q1.pdf"]
+
+        assert client.delete("/documents/reports/2024/q1.pdf").status_code == 200
+    assert api_collection.count() == 0
+
+
+def test_replace_with_empty_document_is_rejected(api_collection, sample_pdf, tmp_path):
+    """Test PUT with a file that yields no chunks fails and keeps the old chunks"""
+    document_processor.process_and_store_pdf(str(sample_pdf), api_collection, source="report.pdf")
+    blank = make_pdf(tmp_path / "blank.pdf", [[]])
+
+    with TestClient(api.app) as client:
+        with open(blank, "rb") as f:
+            response = client.put("/documents/report.pdf", files={"file": ("blank.pdf", f, "application/pdf")})
+
+    assert response.status_code == 422
+    assert api_collection.count() == 3
+
+
+def test_compact_reclaims_space(tmp_path):
+    """Test compaction runs on a persistent database and keeps data readable"""
+    db_path = str(tmp_path / "db")
+    client = chromadb.PersistentClient(path=db_path)
+    collection = client.create_collection("compact_test", embedding_function=HashEmbeddingFunction())
+    collection.add(ids=[str(i) for i in range(300)], documents=[f"chunk {i} " * 50 for i in range(300)])
+    collection.delete(ids=[str(i) for i in range(250)])
+    del collection, client
+
+    sizes = maintenance.compact(db_path)
+
+    assert sizes["bytes_after"] <= sizes["bytes_before"]
+    reopened = chromadb.PersistentClient(path=db_path).get_collection("compact_test")
+    assert reopened.count() == 50
@@ -0,0 +1,183 @@
+"""
+Embedding store and re-indexing tests
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from src import cache, config, document_processor, embedding_store, embeddings
+from tests.conftest import HashEmbeddingFunction
+
+
+class CountingEmbeddingFunction(HashEmbeddingFunction):
+    """Hashing embedding that counts the texts it embeds"""
+
+    def __init__(self, dim: int = 64):
+        super().__init__(dim)
+        self.calls = 0
+
+    def __call__(self, input):
+        self.calls += len(input)
+        return super().__call__(input)
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDING_STORE_ENABLED", True)
+    monkeypatch.setattr(config, "EMBEDDING_STORE_DIR", str(tmp_path / "embeddings"))
+    monkeypatch.setattr(embedding_store, "_stores", {})
+    return tmp_path / "embeddings"
+
+
+def make_collection(client, function):
+    return embeddings.open_collection(client, f"test-{uuid.uuid4().hex[:12]}", create=True, embedding_function=function)
+
+
+def test_ingestion_reuses_stored_vectors(store_dir, memory_client, sample_pdf):
+    """Test identical chunk text is embedded only once across collections"""
+    function = CountingEmbeddingFunction()
+    first = make_collection(memory_client, function)
+    second = make_collection(memory_client, function)
+
+    chunks = document_processor.chunk_pdf_by_pages(str(sample_pdf))
+    document_processor.store_chunks(chunks, first)
+    assert function.calls == len(chunks)
+
+    document_processor.store_chunks(chunks, second)
+    assert function.calls == len(chunks)
+
+    store = embedding_store.get_store("test-hash")
+    assert len(store) == len(chunks)
+    assert store.count(first.name) == store.count(second.name) == len(chunks)
+
+    stored = second.get(include=["embeddings", "documents"])
+    expected = np.asarray(HashEmbeddingFunction()(stored["documents"]))
+    assert np.allclose(stored["embeddings"], expected)
+
+    document_processor.delete_document("sample.pdf", first)
+    assert store.count(first.name) == 0
+    assert store.count(second.name) == len(chunks)
+
+
+def test_reindex_into_new_collection_without_model(store_dir, memory_client, sample_pdf):
+    """Test a collection is rebuilt with another metric from stored vectors only"""
+    function = CountingEmbeddingFunction()
+    collection = make_collection(memory_client, function)
+    document_processor.store_chunks(document_processor.chunk_pdf_by_pages(str(sample_pdf)), collection)
+    calls = function.calls
+
+    target = f"{collection.name}-cosine"
+    written = embedding_store.reindex(memory_client, collection.name, target, space="cosine",
+                                      hnsw={"max_neighbors": 32}, embedding_function=function)
+    assert function.calls == calls
+
+    rebuilt = memory_client.get_collection(target, embedding_function=function)
+    assert written == rebuilt.count() == collection.count()
+    assert embeddings.collection_space(rebuilt) == "cosine"
+    assert rebuilt.configuration["hnsw"]["max_neighbors"] == 32
+    assert rebuilt.metadata["embedding_model"] == "test-hash"
+    assert rebuilt.get(ids=collection.get()["ids"][:1], include=["metadatas"])["metadatas"][0]["source"] == "sample.pdf"
+
+    result = rebuilt.query(query_texts=["civil defence population"], n_results=1)
+    assert "Civil defence" in result["documents"][0][0]
+    assert embedding_store.get_store("test-hash").count(target) == written
+    memory_client.delete_collection(target)
+
+
+def test_reindex_into_existing_target_replaces_its_rows(store_dir, memory_client, sample_pdf, monkeypatch):
+    """Test a reindex over an existing collection drops its old chunk rows and cached answers"""
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "_cache", None)
+    function = CountingEmbeddingFunction()
+    collection = make_collection(memory_client, function)
+    document_processor.store_chunks(document_processor.chunk_pdf_by_pages(str(sample_pdf)), collection)
+
+    target = f"{collection.name}-copy"
+    store = embedding_store.get_store("test-hash")
+    store.put_chunks(target, ["stale"], ["A chunk of the old target."], [{"source": "old.pdf"}])
+    generation = cache.generation(target)
+
+    written = embedding_store.reindex(memory_client, collection.name, target, embedding_function=function)
+
+    assert store.count(target) == written
+    assert cache.generation(target) > generation
+    memory_client.delete_collection(target)
+
+
+def test_reindex_in_place(store_dir, memory_client, sample_pdf):
+    """Test rebuilding under the same name replaces the collection"""
+    function = CountingEmbeddingFunction()
+    collection = make_collection(memory_client, function)
+    num_chunks = document_processor.store_chunks(document_processor.chunk_pdf_by_pages(str(sample_pdf)), collection)
+
+    embedding_store.reindex(memory_client, collection.name, space="ip", embedding_function=function)
+
+    names = {c.name for c in memory_client.list_collections()}
+    assert collection.name in names
+    assert f"{collection.name}-reindex" not in names
+    rebuilt = memory_client.get_collection(collection.name, embedding_function=function)
+    assert embeddings.collection_space(rebuilt) == "ip"
+    assert rebuilt.count() == num_chunks
+    memory_client.delete_collection(collection.name)
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    """Test a partial vector write is dropped when the store is reopened"""
+    path = tmp_path / "model"
+    store = embedding_store.EmbeddingStore(str(path), "model")
+    hashes = [embedding_store.content_hash(text) for text in ("a", "b")]
+    store.put_vectors(hashes, np.eye(2, 4, dtype=np.float32))
+    store.close()
+
+    with open(path / "vectors.f32", "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reopened = embedding_store.EmbeddingStore(str(path), "model")
+    assert len(reopened) == 2
+    assert np.array_equal(reopened.get_vectors(hashes[1:])[0], np.eye(2, 4, dtype=np.float32)[1])
+    assert reopened.get_vectors([embedding_store.content_hash("c")]) == [None]
+
+    with pytest.raises(ValueError):
+        embedding_store.EmbeddingStore(str(path), "other-model")
+
+
+def test_stores_sharing_a_directory_append_without_clobbering(tmp_path):
+    """Test rows appended through another handle are numbered from the files"""
+    path = str(tmp_path / "model")
+    first = embedding_store.EmbeddingStore(path, "model")
+    second = embedding_store.EmbeddingStore(path, "model")
+    a, b, c = (embedding_store.content_hash(text) for text in ("a", "b", "c"))
+    vectors = np.eye(3, 4, dtype=np.float32)
+
+    first.put_vectors([a], vectors[:1])
+    assert second.put_vectors([b], vectors[1:2]) == 1
+    assert first.put_vectors([c, a], vectors[[2, 0]]) == 1
+
+    for store in (first, second, embedding_store.EmbeddingStore(path, "model")):
+        got = store.get_vectors([a, b, c])
+        assert all(np.array_equal(got[i], vectors[i]) for i in range(3))
+
+
+def test_reindex_refuses_incomplete_store(store_dir, memory_client, sample_pdf, monkeypatch):
+    """Test chunks ingested before the store was enabled are not dropped"""
+    function = CountingEmbeddingFunction()
+    collection = memory_client.create_collection(name=f"test-{uuid.uuid4().hex[:12]}", embedding_function=function,
+                                                 metadata={"owner": "docs"})
+    chunks = document_processor.chunk_pdf_by_pages(str(sample_pdf))
+    monkeypatch.setattr(config, "EMBEDDING_STORE_ENABLED", False)
+    document_processor.store_chunks(chunks[:1], collection)
+    monkeypatch.setattr(config, "EMBEDDING_STORE_ENABLED", True)
+    document_processor.store_chunks(chunks[1:], collection)
+
+    with pytest.raises(ValueError):
+        embedding_store.reindex(memory_client, collection.name, embedding_function=function)
+    assert memory_client.get_collection(collection.name).count() == len(chunks)
+
+    written = embedding_store.reindex(memory_client, collection.name, embedding_function=function, force=True)
+    rebuilt = memory_client.get_collection(collection.name, embedding_function=function)
+    assert written == rebuilt.count() == len(chunks) - 1
+    assert rebuilt.metadata["owner"] == "docs"
+    assert rebuilt.metadata["embedding_model"] == "test-hash"
+    memory_client.delete_collection(collection.name)
@@ -0,0 +1,83 @@
+"""
+Embedding provider tests
+"""
+
+import os
+import uuid
+
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+from src import config, embeddings
+from src.onnx_embeddings import OnnxEmbeddingFunction
+from tests.conftest import HashEmbeddingFunction
+
+
+def unique(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+
+def test_new_collection_records_model(memory_client):
+    """Test collections are created with the provider and its model id"""
+    collection = embeddings.open_collection(memory_client, unique("model"), create=True,
+                                            embedding_function=HashEmbeddingFunction())
+
+    assert collection.metadata["embedding_model"] == "test-hash"
+    assert embeddings.open_collection(memory_client, unique("missing")) is None
+
+
+def test_mixing_models_is_refused(memory_client):
+    """Test a collection cannot be opened with a different model"""
+    name, legacy = unique("model"), unique("legacy")
+    embeddings.open_collection(memory_client, name, create=True, embedding_function=HashEmbeddingFunction())
+
+    other = OnnxEmbeddingFunction(model_id="other-model")
+    with pytest.raises(embeddings.EmbeddingModelMismatch):
+        embeddings.open_collection(memory_client, name, embedding_function=other)
+
+    # Collections created with ChromaDB's default function count as MiniLM
+    memory_client.create_collection(legacy)
+    assert embeddings.open_collection(memory_client, legacy, embedding_function=OnnxEmbeddingFunction())
+    with pytest.raises(embeddings.EmbeddingModelMismatch):
+        embeddings.open_collection(memory_client, legacy, embedding_function=other)
+
+
+def test_onnx_config_round_trip():
+    """Test the provider settings survive ChromaDB's config persistence"""
+    function = OnnxEmbeddingFunction(model_id="m", model_path="/models/m", batch_size=64, threads=4, max_tokens=128)
+    rebuilt = OnnxEmbeddingFunction.build_from_config(function.get_config())
+
+    assert (rebuilt.model_id, rebuilt.model_path, rebuilt.batch_size, rebuilt.threads, rebuilt.max_tokens()) == \
+        ("m", "/models/m", 64, 4, 128)
+
+
+def test_other_model_requires_model_path(monkeypatch):
+    """Test a non-default EMBEDDING_MODEL without EMBEDDING_MODEL_PATH is refused"""
+    monkeypatch.setattr(config, "EMBEDDING_MODEL", "bge-small-en")
+    monkeypatch.setattr(config, "EMBEDDING_MODEL_PATH", "")
+    monkeypatch.setattr(embeddings, "_embedding_function", None)
+
+    with pytest.raises(ValueError, match="EMBEDDING_MODEL_PATH"):
+        embeddings.get_embedding_function()
+
+
+MINILM_DIR = os.path.join(ONNXMiniLM_L6_V2.DOWNLOAD_PATH, ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME)
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(MINILM_DIR, "model.onnx")),
+                    reason="MiniLM ONNX model not downloaded")
+def test_onnx_matches_chroma_minilm():
+    """Test batched embedding gives the same vectors as ChromaDB's MiniLM function"""
+    texts = [
+        "Total Defence has six pillars.",
+        "Civil defence protects the population during emergencies and crises of every kind.",
+        "",
+        "word " * 400,
+    ]
+
+    ours = np.asarray(OnnxEmbeddingFunction(batch_size=3)(texts))
+    reference = np.asarray(ONNXMiniLM_L6_V2()(texts))
+
+    assert ours.shape == reference.shape
+    assert np.allclose(ours, reference, atol=1e-5)
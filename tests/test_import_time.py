@@ -0,0 +1,57 @@
+"""
+Import-time budget tests
+
+Run each import in a fresh interpreter with `python -X importtime` so
+module caching in the test process does not hide regressions.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budgets in milliseconds (generous enough for slow CI)
+IMPORT_BUDGETS_MS = {
+    "src.document_processor": 150,
+    "src.rag_engine": 150,
+    "src.ingest": 250,
+}
+
+HEAVY_MODULES = ["chromadb", "google.genai", "pypdf", "onnxruntime"]
+
+
+def cumulative_import_ms(module: str) -> float:
+    """Cumulative import time of module in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS_MS))
+def test_import_time_budget(module):
+    """Test light modules import within their budget"""
+    cumulative_import_ms(module)  # warm the bytecode cache
+    elapsed = cumulative_import_ms(module)
+    assert elapsed < IMPORT_BUDGETS_MS[module], f"{module} took {elapsed:.1f}ms"
+
+
+def test_heavy_dependencies_deferred():
+    """Test importing the app does not load ChromaDB, Gemini or pypdf"""
+    code = (
+        "import sys, src.api, src.ingest, src.watcher, src.maintenance; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == ""
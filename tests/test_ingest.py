@@ -0,0 +1,153 @@
+"""
+Bulk ingestion tests
+"""
+
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from src import api, document_processor, embeddings, ingest
+from tests.conftest import make_pdf, HashEmbeddingFunction
+
+
+def make_pdfs(tmp_path, count):
+    return [
+        make_pdf(tmp_path / f"doc{i}.pdf", [[f"Document {i} paragraph one.", f"Document {i} paragraph two."]])
+        for i in range(count)
+    ]
+
+
+def test_ingest_files_batches_across_files(tmp_path, memory_collection):
+    """Test chunks from several files share batches and results are per file"""
+    pdfs = make_pdfs(tmp_path, 3)
+    files = [(p.name, str(p)) for p in pdfs] + [("copy.pdf", str(pdfs[0]))]
+
+    results = ingest.ingest_files(files, memory_collection, workers=1, batch_size=4)
+
+    assert [r["status"] for r in results] == ["success", "success", "success", "duplicate"]
+    assert [r["num_chunks"] for r in results] == [2, 2, 2, 0]
+    assert memory_collection.count() == 6
+
+
+def test_collect_files_expands_archives(tmp_path):
+    """Test zip and tar archives are expanded to their PDF members only"""
+    pdfs = make_pdfs(tmp_path, 2)
+
+    zip_path = tmp_path / "set.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(pdfs[0], "nested/doc0.pdf")
+        archive.writestr("../escape.pdf", pdfs[1].read_bytes())
+        archive.writestr("notes.csv", "ignored")
+
+    tar_path = tmp_path / "set.tar.gz"
+    with tarfile.open(tar_path, "w:gz") as archive:
+        archive.add(pdfs[1], "doc1.pdf")
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    files, skipped = ingest.collect_files(
+        [("set.zip", str(zip_path)), ("set.tar.gz", str(tar_path)), ("a.csv", "a.csv")],
+        str(work_dir)
+    )
+
+    assert [name for name, _ in files] == ["nested/doc0.pdf", "escape.pdf", "doc1.pdf"]
+    assert all(path.startswith(str(work_dir)) for _, path in files)
+    assert skipped == ["a.csv"]
+
+
+def test_same_file_names_in_subdirectories(tmp_path, memory_collection):
+    """Test files sharing a base name get separate sources and chunk ids"""
+    docs = tmp_path / "docs"
+    for folder, ending in (("a", "alpha"), ("b", "beta")):
+        (docs / folder).mkdir(parents=True)
+        make_pdf(docs / folder / "report.pdf", [["Shared opening paragraph of the report.", f"Closing {ending}."]])
+
+    files, _ = ingest.collect_files([("docs", str(docs))], str(tmp_path))
+    assert [name for name, _ in files] == ["a/report.pdf", "b/report.pdf"]
+
+    results = ingest.ingest_files(files, memory_collection, workers=1, batch_size=16)
+    assert [r["status"] for r in results] == ["success", "success"]
+    assert memory_collection.count() == 4
+
+
+def test_failed_batch_is_retried_per_file(tmp_path, memory_collection, monkeypatch):
+    """Test one file that cannot be stored does not fail the rest of its batch"""
+    pdfs = make_pdfs(tmp_path, 3)
+    store_chunks = document_processor.store_chunks
+
+    def failing_store_chunks(chunks, collection, *args, **kwargs):
+        if any("Document 1" in chunk["text"] for chunk in chunks):
+            return 0
+        return store_chunks(chunks, collection, *args, **kwargs)
+
+    monkeypatch.setattr(document_processor, "store_chunks", failing_store_chunks)
+    results = ingest.ingest_files([(p.name, str(p)) for p in pdfs], memory_collection, workers=1, batch_size=16)
+
+    assert [r["status"] for r in results] == ["success", "failed", "success"]
+    assert memory_collection.count() == 4
+
+
+def test_partly_stored_file_is_rolled_back(tmp_path, memory_collection, monkeypatch):
+    """Test chunks stored before a file's later batch failed are removed"""
+    pdfs = make_pdfs(tmp_path, 2)
+    store_chunks = document_processor.store_chunks
+
+    def failing_store_chunks(chunks, collection, *args, **kwargs):
+        if any("Document 1 paragraph two." == chunk["text"] for chunk in chunks):
+            return 0
+        return store_chunks(chunks, collection, *args, **kwargs)
+
+    writes = []
+
+    def write(func, *args):
+        writes.append(func.__name__)
+        return func(*args)
+
+    monkeypatch.setattr(document_processor, "store_chunks", failing_store_chunks)
+    results = ingest.ingest_files([(p.name, str(p)) for p in pdfs], memory_collection,
+                                  workers=1, batch_size=3, write=write)
+
+    assert [r["status"] for r in results] == ["success", "failed"]
+    assert results[1]["num_chunks"] == 0
+    assert [m["source"] for m in memory_collection.get()["metadatas"]] == ["doc0.pdf", "doc0.pdf"]
+    assert writes[-1] == "delete_chunks"
+
+
+def test_upload_batch_endpoint(tmp_path, api_collection):
+    """Test /upload/batch ingests PDFs and archives with per-file results"""
+    pdfs = make_pdfs(tmp_path, 3)
+
+    zip_path = tmp_path / "more.zip"
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.write(pdfs[2], "doc2.pdf")
+
+    with TestClient(api.app) as client:
+        response = client.post("/upload/batch", files=[
+            ("files", ("doc0.pdf", pdfs[0].read_bytes(), "application/pdf")),
+            ("files", ("doc1.pdf", pdfs[1].read_bytes(), "application/pdf")),
+            ("files", ("more.zip", zip_path.read_bytes(), "application/zip")),
+            ("files", ("data.csv", b"a,b", "text/csv")),
+        ])
+
+    assert response.status_code == 200
+    data = response.json()
+    statuses = {r["filename"]: r["status"] for r in data["results"]}
+    assert statuses == {"doc0.pdf": "success", "doc1.pdf": "success", "doc2.pdf": "success", "data.csv": "skipped"}
+    assert data["num_chunks"] == 6
+
+
+def test_cli_ingests_directory(tmp_path, capsys, monkeypatch):
+    """Test the CLI ingests a directory into a persistent collection"""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    make_pdfs(docs, 2)
+
+    # Configure the hashing embedding as the provider the CLI opens collections with
+    monkeypatch.setattr(embeddings, "get_embedding_function", HashEmbeddingFunction)
+    db_path = tmp_path / "db"
+
+    exit_code = ingest.main([str(docs), "--db-path", str(db_path), "--collection", "cli_test", "--workers", "1"])
+
+    assert exit_code == 0
+    assert "2 files, 4 chunks, 0 failed" in capsys.readouterr().out
@@ -0,0 +1,175 @@
+"""
+Document loader registry tests
+"""
+
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api, document_processor, loaders
+
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+MARKDOWN = """# Total Defence
+
+Total Defence has six pillars.
+
+```python
+# not a heading
+print("hi")
+```
+
+## Civil Defence
+
+Civil defence protects the population.
+
+Shelters are built underground.
+"""
+
+HTML = """<!DOCTYPE html>
+<html><head><title>Defence Handbook</title><style>p { color: red; }</style></head>
+<body>
+<h1>Digital Defence</h1>
+<p>Digital defence secures networks &amp; data.</p>
+<script>var ignored = "script text";</script>
+<h2>Psychological Defence</h2>
+<p>Psychological defence builds resilience.</p>
+</body></html>
+"""
+
+
+def make_docx(path, paragraphs):
+    """
+    Write a minimal DOCX
+
+    Args:
+        path: Output path
+        paragraphs: (text, style) pairs; style 'pagebreak' inserts a page break
+    """
+    body = []
+    for text, style in paragraphs:
+        if style == "pagebreak":
+            body.append(f'<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+            continue
+        props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        body.append(f"<w:p>{props}<w:r><w:t>{text}</w:t></w:r></w:p>")
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr(
+            "word/document.xml",
+            f'<?xml version="1.0"?><w:document xmlns:w="{W}"><w:body>{"".join(body)}</w:body></w:document>'
+        )
+    return path
+
+
+@pytest.fixture
+def documents(tmp_path, sample_pdf):
+    (tmp_path / "notes.md").write_text(MARKDOWN)
+    (tmp_path / "page.html").write_text(HTML)
+    (tmp_path / "plain.txt").write_text("First page paragraph.\n\nStill first page.\fSecond page.")
+    make_docx(tmp_path / "report.docx", [
+        ("Overview", "Heading1"),
+        ("Economic defence keeps the economy strong.", None),
+        ("", "pagebreak"),
+        ("Social defence builds trust.", None),
+    ])
+    return {
+        "pdf": sample_pdf,
+        "md": tmp_path / "notes.md",
+        "html": tmp_path / "page.html",
+        "txt": tmp_path / "plain.txt",
+        "docx": tmp_path / "report.docx",
+    }
+
+
+def test_format_detected_from_content(documents, tmp_path):
+    """Test signatures and markup decide the format, not the extension"""
+    for file_format, path in documents.items():
+        assert loaders.detect_format(str(path)) == file_format
+
+    # Misnamed files are still recognised
+    misnamed = tmp_path / "upload.bin"
+    misnamed.write_bytes(documents["pdf"].read_bytes())
+    assert loaders.detect_format(str(misnamed)) == "pdf"
+    misnamed.write_text(HTML)
+    assert loaders.detect_format(str(misnamed)) == "html"
+    misnamed.write_text(MARKDOWN)
+    assert loaders.detect_format(str(misnamed), "upload.pdf") == "md"
+
+    # The extension only chooses between text formats
+    assert loaders.detect_format(str(documents["md"]), "notes.txt") == "txt"
+
+    binary = tmp_path / "image.png"
+    binary.write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00")
+    with pytest.raises(loaders.UnsupportedFormat):
+        loaders.detect_format(str(binary))
+
+    archive = tmp_path / "not_word.docx"
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("readme.txt", "hello")
+    with pytest.raises(loaders.UnsupportedFormat):
+        loaders.detect_format(str(archive))
+
+
+def test_text_formats_split_into_sections(documents):
+    """Test headings start sections and markup is stripped"""
+    md = loaders.load(str(documents["md"]))
+    assert md["format"] == "md"
+    assert md["metadata"] == {"title": "Total Defence"}
+    assert md["pages"][0].startswith("Total Defence\nTotal Defence has six pillars.")
+    assert "# not a heading" in md["pages"][0]
+    assert md["pages"][1].startswith("Civil Defence\nCivil defence protects")
+    assert md["num_pages"] == 2
+
+    html = loaders.load(str(documents["html"]))
+    assert html["metadata"] == {"title": "Defence Handbook"}
+    assert html["pages"] == [
+        "Digital Defence\nDigital defence secures networks & data.",
+        "Psychological Defence\nPsychological defence builds resilience."
+    ]
+
+    txt = loaders.load(str(documents["txt"]))
+    assert txt["pages"] == ["First page paragraph.\n\nStill first page.", "Second page."]
+
+    docx = loaders.load(str(documents["docx"]))
+    assert docx["pages"] == ["Overview\nEconomic defence keeps the economy strong.", "Social defence builds trust."]
+
+
+def test_long_sections_are_paged(monkeypatch):
+    """Test sections are cut at paragraph boundaries past LOADER_PAGE_CHARS"""
+    blocks = [("a" * 40, False)] * 5
+    assert [len(page) for page in loaders.group_pages(blocks, max_chars=100)] == [82, 82, 40]
+
+
+def test_every_format_is_chunked_the_same_way(documents):
+    """Test chunk_document gives PDF-style chunks with sections and offsets"""
+    for file_format, path in documents.items():
+        data = loaders.load(str(path))
+        chunks = document_processor.chunk_document(str(path), child_size=0)
+        assert chunks, file_format
+        for chunk in chunks:
+            page = data["pages"][chunk["page_num"] - 1]
+            assert page[chunk["char_start"]:chunk["char_end"]] == chunk["text"]
+
+    md_chunks = document_processor.chunk_document(str(documents["md"]), child_size=0)
+    assert md_chunks[-1]["section"] == "Civil Defence"
+    assert md_chunks[-1]["source"] == "notes.md"
+
+
+def test_upload_accepts_other_formats(api_collection, documents):
+    """Test /upload sniffs the format and rejects unsupported content"""
+    with TestClient(api.app) as client:
+        with open(documents["docx"], "rb") as f:
+            response = client.post("/upload", files={"file": ("report.docx", f, "application/octet-stream")})
+        assert response.status_code == 200
+        assert response.json()["format"] == "docx"
+        assert response.json()["num_chunks"] == 2
+
+        response = client.post("/upload", files={"file": ("photo.md", b"\x89PNG\r\n\x1a\n\x00", "image/png")})
+        assert response.status_code == 400
+
+    stored = api_collection.get(include=["metadatas"])["metadatas"]
+    assert {meta["source"] for meta in stored} == {"report.docx"}
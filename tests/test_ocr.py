@@ -0,0 +1,86 @@
+"""
+OCR fallback tests
+
+Tesseract is not needed: the OCR call itself is replaced, everything
+around it (detection, routing, the pool, timings) runs for real.
+"""
+
+import threading
+
+import pytest
+
+from src import config, document_processor, ocr
+from tests.conftest import make_pdf
+
+
+NATIVE_TEXT = "Total Defence has six pillars that keep the country safe."
+SCANNED_TEXT = "Civil defence protects the population in an emergency."
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    # Page 2 has no text layer, like a scan
+    return make_pdf(tmp_path / "scanned.pdf", [[NATIVE_TEXT], [""], [NATIVE_TEXT]])
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    calls = []
+
+    def fake_ocr_images(images):
+        calls.append(threading.current_thread().name)
+        return SCANNED_TEXT
+
+    monkeypatch.setattr(ocr, "ocr_available", lambda: True)
+    monkeypatch.setattr(ocr, "page_images", lambda page: [b"image"])
+    monkeypatch.setattr(ocr, "ocr_images", fake_ocr_images)
+    return calls
+
+
+def test_low_text_detection():
+    """Test pages count as scanned by their non-whitespace characters"""
+    assert ocr.is_low_text("")
+    assert ocr.is_low_text("  12 \n ", min_chars=5)
+    assert not ocr.is_low_text(NATIVE_TEXT)
+
+
+def test_only_low_text_pages_are_ocrd(scanned_pdf, fake_ocr):
+    """Test scanned pages are OCR'd in the pool and native pages are not"""
+    data = document_processor.extract_text_from_pdf(str(scanned_pdf))
+
+    assert len(fake_ocr) == 1
+    assert fake_ocr[0].startswith("ocr")
+    assert data["ocr_pages"] == [2]
+    assert data["pages"][1] == SCANNED_TEXT
+    assert NATIVE_TEXT in data["pages"][0]
+
+    assert [t["method"] for t in data["page_timings"]] == ["text", "ocr", "text"]
+    assert all(t["seconds"] >= 0 for t in data["page_timings"])
+
+    chunks = document_processor.chunk_pdf_by_pages(str(scanned_pdf), child_size=0)
+    assert [c["extraction"] for c in chunks if c["page_num"] == 2] == ["ocr"]
+    assert not any("extraction" in c for c in chunks if c["page_num"] != 2)
+
+
+def test_ocr_failure_keeps_text_layer(scanned_pdf, fake_ocr, monkeypatch):
+    """Test a failing OCR call leaves the page as extracted"""
+    def broken(images):
+        raise RuntimeError("tesseract crashed")
+
+    monkeypatch.setattr(ocr, "ocr_images", broken)
+    data = document_processor.extract_text_from_pdf(str(scanned_pdf))
+
+    assert data["ocr_pages"] == []
+    assert data["pages"][1] == ""
+    assert data["page_timings"][1]["method"] == "text"
+    assert data["page_timings"][1]["low_text"]
+
+
+def test_without_ocr_scanned_pages_are_skipped(scanned_pdf, monkeypatch):
+    """Test extraction still works when OCR is disabled"""
+    monkeypatch.setattr(config, "OCR_ENABLED", False)
+    assert not ocr.ocr_available()
+
+    data = document_processor.extract_text_from_pdf(str(scanned_pdf))
+    assert data["ocr_pages"] == []
+    assert [t["low_text"] for t in data["page_timings"]] == [False, True, False]
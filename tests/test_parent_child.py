@@ -0,0 +1,51 @@
+"""
+Parent-child chunking tests
+"""
+
+import pytest
+
+from src import config, document_processor, parent_store, rag_engine
+from tests.conftest import make_pdf
+
+
+LONG_PARAGRAPH = " ".join(f"Civil defence sentence {i} keeps the population safe." for i in range(12))
+
+
+@pytest.fixture
+def parent_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PARENT_STORE_PATH", str(tmp_path / "parents.sqlite3"))
+    return make_pdf(tmp_path / "handbook.pdf", [[LONG_PARAGRAPH, "Total Defence has six pillars."]])
+
+
+def test_children_point_at_their_parent(parent_pdf):
+    """Test a long paragraph becomes several children of one parent"""
+    chunks = document_processor.chunk_pdf_by_pages(str(parent_pdf), child_size=120)
+
+    long_children = [c for c in chunks if c["parent_text"] == LONG_PARAGRAPH]
+    assert len(long_children) > 3
+    assert len({c["parent_id"] for c in long_children}) == 1
+    assert all(len(c["text"]) <= 120 for c in chunks)
+
+    assert document_processor.chunk_pdf_by_pages(str(parent_pdf), child_size=0)[0]["text"] == LONG_PARAGRAPH
+
+
+def test_context_expands_children_to_parents(parent_pdf, memory_collection):
+    """Test stored parents replace matched children once in the context"""
+    chunks = document_processor.chunk_pdf_by_pages(str(parent_pdf), child_size=120)
+    document_processor.store_chunks(chunks, memory_collection)
+
+    store = parent_store.get_store(create=False)
+    assert store.count(memory_collection.name) == 2
+
+    stored = memory_collection.get()
+    long_ids = [i for i, m in enumerate(stored["metadatas"]) if m["parent_id"] == chunks[0]["parent_id"]]
+    documents = [stored["documents"][i] for i in long_ids[:2]]
+    metadatas = [stored["metadatas"][i] for i in long_ids[:2]]
+
+    parents = rag_engine.load_parents(metadatas, memory_collection)
+    context = rag_engine.format_context(documents, metadatas, parents)
+
+    assert context.count(LONG_PARAGRAPH) == 1
+
+    document_processor.delete_document("handbook.pdf", memory_collection)
+    assert store.count(memory_collection.name) == 0
@@ -0,0 +1,44 @@
+"""
+Collection registry and X-Collection header tests
+"""
+
+from fastapi.testclient import TestClient
+
+from src import api
+from src.registry import CollectionRegistry
+
+
+def test_collection_selected_by_header(api_collection, memory_client, sample_pdf):
+    """Test X-Collection routes uploads to a separate, lazily created collection"""
+    client = TestClient(api.app)
+    with open(sample_pdf, "rb") as f:
+        response = client.post(
+            "/upload",
+            files={"file": ("a.pdf", f, "application/pdf")},
+            headers={"X-Collection": "team-b"},
+        )
+    assert response.status_code == 200
+    assert api_collection.count() == 0
+
+    stats = client.get("/collections/team-b/stats").json()
+    assert stats["count"] == 3
+    assert stats["uploads"] == 1
+    assert "team-b" in client.get("/collections").json()["collections"]
+
+    missing = client.post("/query", json={"question": "test"}, headers={"X-Collection": "no-such"})
+    assert missing.status_code == 404
+    invalid = client.post("/query", json={"question": "test"}, headers={"X-Collection": "a"})
+    assert invalid.status_code == 400
+
+
+def test_registry_evicts_least_recently_used(memory_client):
+    """Test the registry keeps at most max_open handles, evicting the LRU one"""
+    registry = CollectionRegistry(lambda: memory_client, default_name="col-a", max_open=2)
+    for name in ["col-a", "col-b", "col-a", "col-c"]:
+        registry.get(name, create=True)
+
+    snapshot = registry.snapshot()
+    assert snapshot["open_handles"] == ["col-a", "col-c"]
+    assert snapshot["evictions"] == 1
+    assert snapshot["collections"]["col-b"]["opens"] == 1
+    assert registry.stats("col-b")["count"] == 0
@@ -0,0 +1,207 @@
+"""
+Filtered retrieval tests
+"""
+
+import os
+
+from fastapi.testclient import TestClient
+
+from src import api, cache, chunk_store, config, document_processor, exact_index, rag_engine
+from tests.conftest import make_pdf
+
+
+def test_build_where_filter():
+    """Test filters combine into a single where clause"""
+    assert rag_engine.build_where_filter() is None
+    assert rag_engine.build_where_filter(sources=["a.pdf"]) == {"source": {"$eq": "a.pdf"}}
+    assert rag_engine.build_where_filter(sources=["a.pdf", "b.pdf"], page_range=(2, 4), metadata={"section": "Intro"}) == {
+        "$and": [
+            {"source": {"$in": ["a.pdf", "b.pdf"]}},
+            {"page_num": {"$gte": 2}},
+            {"page_num": {"$lte": 4}},
+            {"section": {"$eq": "Intro"}},
+        ]
+    }
+
+
+def test_chunks_record_section_and_upload_time(memory_collection, tmp_path):
+    """Test headings become the section of the chunks that follow them"""
+    pdf = make_pdf(tmp_path / "guide.pdf", [
+        ["Introduction", "Total Defence has six pillars."],
+        ["Civil Defence", "Civil defence protects the population."]
+    ])
+    document_processor.process_and_store_pdf(str(pdf), memory_collection)
+
+    metas = {m["chunk_id"]: m for m in memory_collection.get()["metadatas"]}
+
+    assert metas["page1_chunk1"]["section"] == "Introduction"
+    assert metas["page2_chunk1"]["section"] == "Civil Defence"
+    assert all(m["ingested_at"] > 0 and m["doc_hash"] for m in metas.values())
+
+
+def test_retrieve_chunks_with_filters(memory_collection, sample_pdf, tmp_path):
+    """Test where filters restrict the candidate chunks"""
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection, source="a.pdf")
+    other = make_pdf(tmp_path / "b.pdf", [["Total Defence has six pillars in b."]])
+    document_processor.process_and_store_pdf(str(other), memory_collection)
+
+    where = rag_engine.build_where_filter(sources=["b.pdf"])
+    retrieved = rag_engine.retrieve_chunks("Total Defence pillars", memory_collection, 5, where)
+    assert {m["source"] for m in retrieved["metadatas"]} == {"b.pdf"}
+
+    where = rag_engine.build_where_filter(sources=["a.pdf"], page_range=(2, 2))
+    retrieved = rag_engine.retrieve_chunks("Civil defence population", memory_collection, 5, where)
+    assert retrieved["documents"] == ["Civil defence protects the population."]
+
+
+def test_query_endpoint_passes_filters(api_collection, monkeypatch):
+    """Test /query builds the where clause and validates filters"""
+    calls = []
+
+    def fake_query(question, collection, n_results, where, mmr_lambda):
+        calls.append(where)
+        return {"answer": "ok", "sources": [], "context_chunks": []}
+
+    monkeypatch.setattr(rag_engine, "query_rag_system", fake_query)
+    client = TestClient(api.app)
+
+    response = client.post("/query", json={
+        "question": "What?",
+        "sources": ["a.pdf"],
+        "page_range": {"start": 1, "end": 3}
+    })
+    assert response.status_code == 200
+    assert calls[-1] == {"$and": [
+        {"source": {"$eq": "a.pdf"}},
+        {"page_num": {"$gte": 1}},
+        {"page_num": {"$lte": 3}},
+    ]}
+
+    assert client.post("/query", json={"question": "What?", "page_range": {"start": 3, "end": 1}}).status_code == 400
+    assert client.post("/query", json={"question": "What?", "metadata": {"$or": "x"}}).status_code == 400
+
+
+def test_mmr_select_prefers_diverse_candidates():
+    """Test a near-duplicate loses to a less relevant but different chunk"""
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]]
+    relevance = [0.95, 0.94, 0.6]
+
+    assert rag_engine.mmr_select(relevance, embeddings, 2, lambda_mult=1.0) == [0, 1]
+    assert rag_engine.mmr_select(relevance, embeddings, 2, lambda_mult=0.5) == [0, 2]
+
+
+def test_retrieve_chunks_mmr_drops_duplicates(memory_collection):
+    """Test MMR retrieval skips chunks that repeat an already chosen one"""
+    memory_collection.add(
+        ids=["a", "b", "c"],
+        documents=[
+            "civil defence protects the population",
+            "civil defence protects the population well",
+            "civil defence means emergency preparedness",
+        ],
+        metadatas=[{"source": "x.pdf", "page_num": 1}] * 3
+    )
+
+    plain = rag_engine.retrieve_chunks("civil defence protects", memory_collection, 2, mmr_lambda=1.0)
+    diverse = rag_engine.retrieve_chunks("civil defence protects", memory_collection, 2, mmr_lambda=0.3)
+
+    assert "civil defence means emergency preparedness" not in plain["documents"]
+    assert "civil defence means emergency preparedness" in diverse["documents"]
+
+
+def test_chunk_store_resolves_query_results(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test retrieval reads text and metadata from the chunk store snapshot"""
+    monkeypatch.setattr(config, "CHUNK_STORE_ENABLED", True)
+    monkeypatch.setattr(config, "CHUNK_STORE_DIR", str(tmp_path / "chunk_store"))
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+
+    store = chunk_store.rebuild(memory_collection)
+    stored = memory_collection.get()
+    assert len(store) == 3
+    for chunk_id, document, meta in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+        row = store.lookup(chunk_id)
+        assert store.text(row) == document
+        assert store.metadata(row) == meta
+    assert store.lookup("not-a-chunk") == -1
+
+    # After a write the snapshot is bypassed until it is rebuilt
+    rebuilds = []
+    monkeypatch.setattr(chunk_store, "rebuild_in_background", rebuilds.append)
+    other = make_pdf(tmp_path / "b.pdf", [["Civil defence drills happen yearly."]])
+    document_processor.process_and_store_pdf(str(other), memory_collection)
+    assert chunk_store.get_store(memory_collection) is None
+    assert rebuilds == [memory_collection]
+
+    retrieved = rag_engine.retrieve_chunks("civil defence", memory_collection, 4, mmr_lambda=1.0)
+    assert "Civil defence drills happen yearly." in retrieved["documents"]
+    assert "Civil defence protects the population." in retrieved["documents"]
+    assert all(meta["source"] in ("sample.pdf", "b.pdf") for meta in retrieved["metadatas"])
+
+    assert len(chunk_store.rebuild(memory_collection)) == 4
+    document_processor.delete_document("b.pdf", memory_collection)
+    assert chunk_store.get_store(memory_collection) is None
+
+
+def test_chunk_store_follows_other_processes(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test a shared write generation retires the store and a rebuilt version is picked up"""
+    monkeypatch.setattr(config, "CHUNK_STORE_ENABLED", True)
+    monkeypatch.setattr(config, "CHUNK_STORE_DIR", str(tmp_path / "chunk_store"))
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(chunk_store, "rebuild_in_background", lambda collection: None)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    chunk_store.rebuild(memory_collection)
+    assert len(chunk_store.get_store(memory_collection)) == 3
+
+    # Another worker writes (bumping the shared generation) and rebuilds
+    memory_collection.add(ids=["other"], documents=["Written by another worker."], metadatas=[{"source": "o.pdf"}])
+    cache.invalidate(memory_collection.name)
+    assert chunk_store.get_store(memory_collection) is None
+
+    path = chunk_store.store_path(memory_collection.name)
+    for _ in range(3):
+        chunk_store.build(memory_collection, path)
+    assert len(chunk_store.get_store(memory_collection)) == 4
+    assert len([name for name in os.listdir(path) if name.startswith("v")]) == chunk_store.KEEP_VERSIONS
+
+
+def test_deleted_chunks_are_dropped_from_results(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test ids a stale local index still returns are dropped, not returned blank"""
+    monkeypatch.setattr(config, "EXACT_SEARCH_MAX_CHUNKS", 100)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    index = exact_index.build(memory_collection)
+    monkeypatch.setattr(exact_index, "get_index", lambda collection: index)
+
+    deleted = memory_collection.get()["ids"][0]
+    memory_collection.delete(ids=[deleted])
+    assert rag_engine.resolve_chunks([deleted], None, memory_collection) == ([None], [None])
+
+    retrieved = rag_engine.retrieve_chunks("civil defence", memory_collection, 3, mmr_lambda=1.0)
+    assert deleted not in retrieved["ids"]
+    assert len(retrieved["ids"]) == len(retrieved["documents"]) == len(retrieved["distances"])
+    assert all(retrieved["documents"])
+
+
+def test_chunk_store_sees_writes_without_shared_cache(memory_collection, sample_pdf, tmp_path, monkeypatch):
+    """Test the write stamp and size check retire the store with CACHE_BACKEND=none"""
+    monkeypatch.setattr(config, "CHUNK_STORE_ENABLED", True)
+    monkeypatch.setattr(config, "CHUNK_STORE_DIR", str(tmp_path / "chunk_store"))
+    monkeypatch.setattr(config, "CACHE_BACKEND", "none")
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(chunk_store, "rebuild_in_background", lambda collection: None)
+    document_processor.process_and_store_pdf(str(sample_pdf), memory_collection)
+    chunk_store.rebuild(memory_collection)
+    assert len(chunk_store.get_store(memory_collection)) == 3
+
+    # Another process's write path replaces the stamp
+    path = chunk_store.store_path(memory_collection.name)
+    chunk_store.record_write(path)
+    assert chunk_store.get_store(memory_collection) is None
+    chunk_store.rebuild(memory_collection)
+    assert chunk_store.get_store(memory_collection) is not None
+
+    # A write that bypassed the stamp is caught by the size check
+    monkeypatch.setattr(config, "CHUNK_STORE_RECHECK_SECONDS", 0)
+    memory_collection.add(ids=["other"], documents=["Written elsewhere."], metadatas=[{"source": "o.pdf"}])
+    assert chunk_store.get_store(memory_collection) is None
+    assert len(chunk_store.rebuild(memory_collection)) == 4
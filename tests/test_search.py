@@ -0,0 +1,87 @@
+"""
+Retrieval-only /search endpoint tests
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api, cache, rag_engine
+
+
+@pytest.fixture
+def search_client(api_collection, monkeypatch):
+    def no_generation(*args, **kwargs):
+        raise AssertionError("/search must not call the LLM pipeline")
+
+    monkeypatch.setattr(rag_engine, "query_rag_system", no_generation)
+    api_collection.add(
+        ids=[f"c{i}" for i in range(7)],
+        documents=[f"civil defence protects the population {word}"
+                   for word in ("north", "south", "east", "west", "centre", "island", "coast")],
+        metadatas=[{"source": f"doc{i % 2}.pdf", "page_num": i + 1} for i in range(7)]
+    )
+    return TestClient(api.app)
+
+
+def test_search_pages_through_ranked_chunks(search_client, api_collection):
+    """Test cursors walk the ranking without gaps or repeats"""
+    pages, cursor = [], None
+    while True:
+        body = {"question": "civil defence protects the population", "page_size": 3}
+        if cursor:
+            body["cursor"] = cursor
+        response = search_client.post("/search", json=body)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page["results"]) for page in pages] == [3, 3, 1]
+    results = [result for page in pages for result in page["results"]]
+    assert sorted(r["id"] for r in results) == [f"c{i}" for i in range(7)]
+    distances = [r["distance"] for r in results]
+    assert distances == sorted(distances)
+    assert pages[0]["sources"]
+    assert results[0]["source"] == f"doc{(results[0]['page'] - 1) % 2}.pdf"
+
+
+def test_search_rejects_foreign_or_bad_cursors(search_client):
+    """Test a cursor only continues the search it came from"""
+    first = search_client.post("/search", json={"question": "civil defence", "page_size": 2}).json()
+
+    other = search_client.post("/search", json={
+        "question": "something else", "page_size": 2, "cursor": first["next_cursor"]
+    })
+    assert other.status_code == 400
+    assert search_client.post("/search", json={"question": "civil defence", "cursor": "!!"}).status_code == 400
+    assert search_client.post("/search", json={"question": "civil defence", "page_size": 0}).status_code == 400
+
+
+def test_search_cursor_expires_after_write(search_client, api_collection, monkeypatch):
+    """Test a cursor is refused once the collection changed under it"""
+    body = {"question": "civil defence", "page_size": 2}
+    cursor = search_client.post("/search", json=body).json()["next_cursor"]
+    assert search_client.post("/search", json={**body, "cursor": cursor}).status_code == 200
+
+    api_collection.add(ids=["new"], documents=["civil defence drills"], metadatas=[{"source": "new.pdf", "page_num": 1}])
+    assert search_client.post("/search", json={**body, "cursor": cursor}).status_code == 400
+
+    # Same count, but another process bumped the write generation
+    cursor = search_client.post("/search", json=body).json()["next_cursor"]
+    monkeypatch.setattr(cache, "generation", lambda name: 1)
+    assert search_client.post("/search", json={**body, "cursor": cursor}).status_code == 400
+
+
+def test_retrieve_chunks_offset(api_collection):
+    """Test an offset skips the best chunks and resolves only the page"""
+    api_collection.add(
+        ids=["a", "b", "c"],
+        documents=["civil defence", "civil defence plan", "civil defence plan review"],
+        metadatas=[{"source": "x.pdf", "page_num": n} for n in (1, 2, 3)]
+    )
+    full = rag_engine.retrieve_chunks("civil defence", api_collection, 3, mmr_lambda=1.0)
+    page = rag_engine.retrieve_chunks("civil defence", api_collection, 2, mmr_lambda=1.0, offset=1)
+
+    assert page["ids"] == full["ids"][1:]
+    assert page["documents"] == full["documents"][1:]
@@ -0,0 +1,137 @@
+"""
+Read-replica snapshot tests
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import api, chunk_store, config, parent_store, snapshot
+from src.registry import CollectionRegistry
+from tests.conftest import HashEmbeddingFunction
+
+
+@pytest.fixture
+def published(tmp_path, memory_client, memory_collection):
+    memory_collection.add(
+        ids=["a", "b"],
+        documents=["Total Defence has six pillars.", "Civil defence protects the population."],
+        metadatas=[{"source": "a.pdf", "page_num": 1}, {"source": "a.pdf", "page_num": 2}]
+    )
+    snapshot_dir = tmp_path / "snapshots"
+    snapshot_id = snapshot.publish(memory_client, [memory_collection.name], str(snapshot_dir), keep=2)
+    return snapshot_dir, snapshot_id
+
+
+@pytest.fixture
+def replica(tmp_path, published):
+    snapshot_dir, _ = published
+    replica = snapshot.SnapshotReplica(str(snapshot_dir), str(tmp_path / "local"),
+                                       embedding_function=HashEmbeddingFunction())
+    yield replica
+    parent_store.use_path(None)
+    for retired in (replica._retired, (replica._client, replica._path)):
+        if retired and retired[0] is not None:
+            snapshot._close_client(retired[0])
+
+
+def test_replica_serves_published_snapshot(published, replica, memory_collection):
+    """Test a replica loads the current snapshot into its own database"""
+    _, snapshot_id = published
+    assert snapshot.current_snapshot(str(published[0])) == snapshot_id
+
+    registry = CollectionRegistry(replica.client, memory_collection.name, allow_create=False,
+                                  embedding_function=HashEmbeddingFunction())
+    entry = registry.get()
+    assert entry.collection.count() == 2
+    assert replica.snapshot_id == snapshot_id
+
+    result = entry.collection.query(query_texts=["civil defence population"], n_results=1)
+    assert result["ids"][0] == ["b"]
+
+
+def test_replica_hot_swaps_to_newer_snapshot(published, replica, memory_client, memory_collection):
+    """Test a newly published snapshot replaces the served one atomically"""
+    snapshot_dir, first = published
+    registry = CollectionRegistry(replica.client, memory_collection.name, allow_create=False,
+                                  embedding_function=HashEmbeddingFunction())
+    old_entry = registry.get()
+    assert replica.refresh(registry) is False
+
+    memory_collection.add(ids=["c"], documents=["Digital defence."], metadatas=[{"source": "b.pdf", "page_num": 1}])
+    second = snapshot.publish(memory_client, [memory_collection.name], str(snapshot_dir), keep=2)
+    snapshot.publish(memory_client, [memory_collection.name], str(snapshot_dir), keep=2)
+
+    chunk_store._stores[memory_collection.name] = object()
+    assert replica.refresh(registry) is True
+    assert memory_collection.name not in chunk_store._stores
+    assert replica.snapshot_id != first
+    assert registry.get().collection.count() == 3
+    assert old_entry.collection.count() == 2
+    assert len(snapshot.list_snapshots(str(snapshot_dir))) == 2
+    assert first not in snapshot.list_snapshots(str(snapshot_dir)) and second in snapshot.list_snapshots(str(snapshot_dir))
+
+
+def test_replica_keeps_parents_in_its_copy(tmp_path, memory_client, memory_collection, monkeypatch):
+    """Test loading a snapshot writes neither the shared parent store nor the embedding store"""
+    monkeypatch.setattr(config, "PARENT_STORE_PATH", str(tmp_path / "publisher-parents.sqlite3"))
+    memory_collection.add(ids=["child"], documents=["Civil defence."],
+                          metadatas=[{"source": "a.pdf", "page_num": 1, "parent_id": "p1"}])
+    parent_store.get_store().put_many(memory_collection.name, {"p1": ("a.pdf", "Civil defence protects the population.")})
+    snapshot_dir = tmp_path / "snapshots"
+    snapshot.publish(memory_client, [memory_collection.name], str(snapshot_dir))
+
+    # The replica's shared stores are configured but must stay untouched
+    monkeypatch.setattr(config, "PARENT_STORE_PATH", str(tmp_path / "replica-parents.sqlite3"))
+    monkeypatch.setattr(config, "EMBEDDING_STORE_ENABLED", True)
+    monkeypatch.setattr(config, "EMBEDDING_STORE_DIR", str(tmp_path / "embeddings"))
+    replica = snapshot.SnapshotReplica(str(snapshot_dir), str(tmp_path / "local"),
+                                       embedding_function=HashEmbeddingFunction())
+    try:
+        replica.client()
+        parents = parent_store.get_store(create=False)
+        assert parents.path.startswith(replica._path)
+        assert parents.get_many(memory_collection.name, ["p1"]) == {"p1": "Civil defence protects the population."}
+    finally:
+        parent_store.use_path(None)
+        snapshot._close_client(replica._client)
+
+    assert not (tmp_path / "replica-parents.sqlite3").exists()
+    assert not (tmp_path / "embeddings").exists()
+
+
+def test_replica_without_snapshot(tmp_path):
+    """Test a replica reports a missing snapshot instead of an empty database"""
+    replica = snapshot.SnapshotReplica(str(tmp_path / "empty"), str(tmp_path / "local"))
+    with pytest.raises(snapshot.SnapshotNotFound):
+        replica.client()
+
+
+def test_read_only_mode_refuses_writes(api_collection, monkeypatch, sample_pdf):
+    """Test write endpoints answer 403 on a read-only instance while queries still work"""
+    monkeypatch.setattr(api, "READ_ONLY", True)
+    client = TestClient(api.app)
+
+    with open(sample_pdf, "rb") as f:
+        response = client.post("/upload", files={"file": ("sample.pdf", f, "application/pdf")})
+    assert response.status_code == 403
+    assert client.delete("/documents/sample.pdf").status_code == 403
+    with open(sample_pdf, "rb") as f:
+        response = client.put("/documents/sample.pdf", files={"file": ("sample.pdf", f, "application/pdf")})
+    assert response.status_code == 403
+
+    assert client.get("/collections").status_code == 200
+
+
+def test_multi_worker_instance_refuses_writes(api_collection, monkeypatch, sample_pdf):
+    """Test writes answer 403 when several workers share the database"""
+    monkeypatch.setattr(config, "API_WORKERS", 4)
+    client = TestClient(api.app)
+
+    with open(sample_pdf, "rb") as f:
+        response = client.post("/upload", files={"file": ("sample.pdf", f, "application/pdf")})
+    assert response.status_code == 403
+    assert "API_WORKERS" in response.json()["detail"]
+    assert client.delete("/documents/sample.pdf").status_code == 403
+    assert api_collection.count() == 0
+
+    assert client.get("/collections").status_code == 200
@@ -0,0 +1,102 @@
+"""
+Collection export/import tests
+"""
+
+import uuid
+import zipfile
+
+import numpy as np
+import pytest
+
+from src import cache, config, document_processor, embeddings, parent_store, transfer
+from src.embeddings import EmbeddingModelMismatch
+from tests.conftest import HashEmbeddingFunction
+
+
+@pytest.fixture
+def exported(tmp_path, monkeypatch, memory_client, sample_pdf):
+    monkeypatch.setattr(config, "PARENT_STORE_PATH", str(tmp_path / "parents.sqlite3"))
+    collection = memory_client.create_collection(
+        name=f"test-{uuid.uuid4().hex[:12]}",
+        embedding_function=HashEmbeddingFunction(),
+        configuration={"hnsw": {"space": "cosine"}}
+    )
+    chunks = document_processor.chunk_pdf_by_pages(str(sample_pdf), child_size=60)
+    document_processor.store_chunks(chunks, collection)
+
+    path = tmp_path / "export.zip"
+    manifest = transfer.export_collection(collection, str(path), page_size=2)
+    yield collection, path, manifest
+    memory_client.delete_collection(collection.name)
+
+
+def test_export_is_paged(exported):
+    """Test every chunk is written across fixed-size pages"""
+    collection, path, manifest = exported
+
+    assert manifest["num_chunks"] == collection.count()
+    assert manifest["num_pages"] == -(-collection.count() // 2)
+    assert manifest["embedding_model"] == "test-hash"
+    assert manifest["hnsw"]["space"] == "cosine"
+    assert manifest["num_parents"] > 0
+    with zipfile.ZipFile(path) as archive:
+        assert "pages/000000.npy" in archive.namelist()
+
+
+def test_import_round_trip(exported, memory_client):
+    """Test an imported collection matches the original without re-embedding"""
+    collection, path, manifest = exported
+    target = f"{collection.name}-copy"
+
+    imported = transfer.import_collection(memory_client, str(path), target,
+                                          embedding_function=HashEmbeddingFunction())
+
+    original = collection.get(include=["embeddings", "documents", "metadatas"])
+    copy = imported.get(ids=original["ids"], include=["embeddings", "documents", "metadatas"])
+    assert copy["documents"] == original["documents"]
+    assert copy["metadatas"] == original["metadatas"]
+    assert np.allclose(copy["embeddings"], original["embeddings"])
+    assert imported.name == target
+    assert embeddings.collection_space(imported) == "cosine"
+
+    from src import parent_store
+    assert parent_store.get_store().count(target) == manifest["num_parents"]
+
+    with pytest.raises(ValueError):
+        transfer.import_collection(memory_client, str(path), target, embedding_function=HashEmbeddingFunction())
+    transfer.import_collection(memory_client, str(path), target, replace=True,
+                               embedding_function=HashEmbeddingFunction())
+    memory_client.delete_collection(target)
+
+
+def test_import_refuses_other_model(exported, memory_client):
+    """Test vectors of one model are not imported under another"""
+    _, path, _ = exported
+
+    class OtherModel(HashEmbeddingFunction):
+        @staticmethod
+        def name():
+            return "other-model"
+
+    with pytest.raises(EmbeddingModelMismatch):
+        transfer.import_collection(memory_client, str(path), "other-copy", embedding_function=OtherModel())
+
+
+def test_import_replace_clears_derived_state(exported, memory_client, monkeypatch):
+    """Test replacing a collection drops its old parents and cached answers"""
+    collection, path, manifest = exported
+    target = f"{collection.name}-copy"
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "_cache", None)
+
+    transfer.import_collection(memory_client, str(path), target, embedding_function=HashEmbeddingFunction())
+    parent_store.get_store().put_many(target, {"stale-parent": ("old.pdf", "Text of a removed document.")})
+    generation = cache.generation(target)
+
+    transfer.import_collection(memory_client, str(path), target, replace=True,
+                               embedding_function=HashEmbeddingFunction())
+
+    assert parent_store.get_store().count(target) == manifest["num_parents"]
+    assert parent_store.get_store().get_many(target, ["stale-parent"]) == {}
+    assert cache.generation(target) > generation
+    memory_client.delete_collection(target)
@@ -0,0 +1,98 @@
+"""
+Upload and ingestion tests
+"""
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from src import api, uploads
+from tests.conftest import make_pdf
+
+
+def test_upload_stores_chunks_with_original_filename(api_collection, sample_pdf):
+    """Test upload chunks in the pool and cites the uploaded file name"""
+    with TestClient(api.app) as client:
+        with open(sample_pdf, "rb") as f:
+            response = client.post("/upload", files={"file": ("defence.pdf", f, "application/pdf")})
+
+    assert response.status_code == 200
+    assert response.json()["num_chunks"] == 3
+
+    metas = api_collection.get(include=["metadatas"])["metadatas"]
+    assert {m["source"] for m in metas} == {"defence.pdf"}
+
+
+def test_health_responsive_during_large_upload(api_collection, tmp_path):
+    """Test /health stays fast while a large PDF is being processed"""
+    paragraph = " ".join(f"word{i}" for i in range(60))
+    large_pdf = make_pdf(tmp_path / "large.pdf", [[paragraph] * 8 for _ in range(400)])
+
+    latencies = []
+    result = {}
+
+    with TestClient(api.app) as client:
+        def upload():
+            with open(large_pdf, "rb") as f:
+                result["response"] = client.post(
+                    "/upload", files={"file": ("large.pdf", f, "application/pdf")}
+                )
+
+        uploader = threading.Thread(target=upload)
+        uploader.start()
+
+        while uploader.is_alive():
+            start = time.perf_counter()
+            assert client.get("/health").status_code == 200
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.02)
+
+        uploader.join()
+
+    assert result["response"].status_code == 200
+    assert len(latencies) >= 5
+    assert max(latencies) < 0.5
+
+
+def test_upload_duplicate_detected_by_hash(api_collection, sample_pdf):
+    """Test re-uploading identical content is skipped using the content hash"""
+    with TestClient(api.app) as client:
+        with open(sample_pdf, "rb") as f:
+            first = client.post("/upload", files={"file": ("a.pdf", f, "application/pdf")})
+        with open(sample_pdf, "rb") as f:
+            second = client.post("/upload", files={"file": ("b.pdf", f, "application/pdf")})
+
+    assert first.json()["status"] == "success"
+    assert second.json()["status"] == "duplicate"
+    assert second.json()["doc_hash"] == first.json()["doc_hash"]
+    assert api_collection.count() == 3
+
+
+def test_upload_too_large_rejected(monkeypatch, api_collection, sample_pdf):
+    """Test uploads over MAX_UPLOAD_BYTES are rejected with 413"""
+    monkeypatch.setattr(api, "MAX_UPLOAD_BYTES", 100)
+
+    client = TestClient(api.app)
+    with open(sample_pdf, "rb") as f:
+        response = client.post("/upload", files={"file": ("a.pdf", f, "application/pdf")})
+
+    assert response.status_code == 413
+
+
+def test_oversized_body_refused_before_parsing(monkeypatch, api_collection, sample_pdf):
+    """Test bodies over the limit get 413 without reaching the endpoint"""
+    monkeypatch.setattr(api, "MAX_UPLOAD_BYTES", 100)
+    monkeypatch.setattr(uploads, "MULTIPART_OVERHEAD_BYTES", 100)
+    monkeypatch.setattr(api.uploads, "stream_upload_to_tempfile", None)
+    body = b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n" + b"%" * 5000 + b"\r\n--x--\r\n"
+    headers = {"Content-Type": "multipart/form-data; boundary=x"}
+
+    client = TestClient(api.app)
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.status_code == 413
+
+    # Without Content-Length the body is counted as it arrives
+    chunked = client.post("/upload", content=iter([body[:1000], body[1000:]]), headers=headers)
+    assert chunked.status_code == 413
+    assert api_collection.count() == 0
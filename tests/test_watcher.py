@@ -0,0 +1,92 @@
+"""
+Directory watcher tests
+"""
+
+import threading
+import time
+
+from watchfiles import Change
+
+from src import config, watcher
+from tests.conftest import make_pdf
+
+
+def sources(collection):
+    return sorted(m["source"] for m in collection.get(include=["metadatas"])["metadatas"])
+
+
+def test_modified_file_replaces_old_chunks(tmp_path, memory_collection):
+    """Test a modified PDF is re-ingested without leaving stale chunks"""
+    path = make_pdf(tmp_path / "notes.pdf", [["Old paragraph one.", "Old paragraph two."]])
+    assert watcher.sync_file(str(path), memory_collection) == "ingested"
+    assert watcher.sync_file(str(path), memory_collection) == "unchanged"
+
+    make_pdf(path, [["New paragraph only."]])
+    actions = watcher.handle_changes([(Change.modified, str(path))], memory_collection)
+
+    assert actions == {str(path): "ingested"}
+    assert memory_collection.get()["documents"] == ["New paragraph only."]
+
+
+def test_deleted_file_removes_chunks(tmp_path, memory_collection):
+    """Test removing a PDF deletes its chunks only"""
+    keep = make_pdf(tmp_path / "keep.pdf", [["Keep me."]])
+    drop = make_pdf(tmp_path / "drop.pdf", [["Drop me.", "And me."]])
+    watcher.initial_sync(str(tmp_path), memory_collection)
+    assert sources(memory_collection) == ["drop.pdf", "drop.pdf", "keep.pdf"]
+
+    drop.unlink()
+    watcher.handle_changes([(Change.modified, str(drop)), (Change.deleted, str(drop))], memory_collection)
+
+    assert sources(memory_collection) == ["keep.pdf"]
+
+
+def test_sources_are_relative_to_watched_directory(tmp_path, memory_collection):
+    """Test equally named files in subfolders are kept apart and pruned by path"""
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        make_pdf(tmp_path / folder / "notes.pdf", [[f"Notes kept in folder {folder}."]])
+    watcher.initial_sync(str(tmp_path), memory_collection)
+    assert sources(memory_collection) == ["a/notes.pdf", "b/notes.pdf"]
+
+    (tmp_path / "a" / "notes.pdf").unlink()
+    watcher.handle_changes([(Change.deleted, str(tmp_path / "a" / "notes.pdf"))], memory_collection, str(tmp_path))
+    assert sources(memory_collection) == ["b/notes.pdf"]
+
+    (tmp_path / "b" / "notes.pdf").rename(tmp_path / "notes.pdf")
+    watcher.initial_sync(str(tmp_path), memory_collection, prune=True)
+    assert sources(memory_collection) == ["notes.pdf"]
+
+
+def test_watch_directory_picks_up_new_files(tmp_path, memory_collection):
+    """Test the watch loop ingests a PDF dropped into the folder"""
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=watcher.watch_directory,
+        args=(str(tmp_path), memory_collection),
+        kwargs={"debounce_ms": 100, "stop_event": stop},
+    )
+    thread.start()
+
+    try:
+        time.sleep(0.5)
+        make_pdf(tmp_path / "new.pdf", [["Freshly dropped file."]])
+
+        deadline = time.time() + 10
+        while memory_collection.count() == 0 and time.time() < deadline:
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join(timeout=10)
+
+    assert sources(memory_collection) == ["new.pdf"]
+
+
+def test_watcher_warns_without_shared_cache(monkeypatch, caplog):
+    """Test startup warns when the API cannot see the watcher's writes"""
+    monkeypatch.setattr(config, "CACHE_BACKEND", "none")
+    assert watcher.check_shared_cache() is False
+    assert "CACHE_BACKEND=none" in caplog.text
+
+    monkeypatch.setattr(config, "CACHE_BACKEND", "sqlite")
+    assert watcher.check_shared_cache() is True